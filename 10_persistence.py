@@ -1,13 +1,6 @@
-from langgraph.graph import StateGraph, START, END
-from typing import TypedDict
-from langchain_openai.chat_models import ChatOpenAI
-from dotenv import load_dotenv
-from langgraph.checkpoint.memory import InMemorySaver
-
-
-load_dotenv()
-
-model = ChatOpenAI()
+from functools import lru_cache
+from typing import TypedDict, Iterable, Iterator, Optional
+from chatbot.model_registry import get_chat_model
 
 
 class JokeState(TypedDict):
@@ -18,36 +11,152 @@ class JokeState(TypedDict):
 
 def generate_joke(state: JokeState):
     prompt = f"generate a joke on the topic {state['topic']}"
-    response = model.invoke(prompt).content
+    response = get_chat_model().invoke(prompt).content
     return {"joke": response}
 
 
 def generate_explanation(state: JokeState):
     prompt = f"write an explanation for the joke - {state['joke']}"
-    response = model.invoke(prompt).content
+    response = get_chat_model().invoke(prompt).content
     return {"explanation": response}
 
 
-graph = StateGraph(JokeState)
-
-graph.add_node("generate_joke", generate_joke)
-graph.add_node("generate_explanation", generate_explanation)
-
-graph.add_edge(START, "generate_joke")
-graph.add_edge("generate_joke", "generate_explanation")
-graph.add_edge("generate_explanation", END)
-
-checkpointer = InMemorySaver()
-
-workflow = graph.compile(checkpointer=checkpointer)
-
-config = {"configurable": {"thread_id": "1"}}
-final_state = workflow.invoke(input={"topic": "pizza"}, config=config)
-
-print(final_state)
-print()
-
-print(workflow.get_state(config=config))
-print()
-
-print(list(workflow.get_state_history(config=config)))
+@lru_cache(maxsize=None)
+def get_workflow():
+    # heavy imports happen on first use, not when the module is imported; the
+    # cache also keeps one checkpointer (and so one history) per process
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
+    from chatbot.bounded_saver import BoundedInMemorySaver
+
+    load_dotenv()
+
+    graph = StateGraph(JokeState)
+
+    graph.add_node("generate_joke", generate_joke)
+    graph.add_node("generate_explanation", generate_explanation)
+
+    graph.add_edge(START, "generate_joke")
+    graph.add_edge("generate_joke", "generate_explanation")
+    graph.add_edge("generate_explanation", END)
+
+    # cold threads are spilled to disk once resident checkpoints pass 256 MB
+    checkpointer = BoundedInMemorySaver(max_bytes=256 * 1024 * 1024)
+
+    return graph.compile(checkpointer=checkpointer)
+
+
+def iter_state_history(
+    workflow,
+    config: dict,
+    page_size: int = 20,
+    channels: Optional[Iterable[str]] = None,
+) -> Iterator[dict]:
+    """
+    Lazily walk a thread's checkpoints, newest first, one page at a time.
+
+    Unlike ``list(workflow.get_state_history(config))`` only ``page_size``
+    checkpoints are read from the checkpointer at once. With ``channels`` only
+    those state keys are kept in the yielded snapshots; on a checkpointer with
+    ``list_values`` (``BoundedInMemorySaver``) the other channels are not even
+    deserialized, elsewhere the full checkpoint is decoded and then trimmed.
+
+    Yields:
+        dict: ``checkpoint_id``, ``step``, ``source`` (input/loop/update) and
+        the (projected) ``values`` of each checkpoint.
+    """
+    checkpointer = workflow.checkpointer
+    projected = channels is not None and hasattr(checkpointer, "list_values")
+    channels = set(channels) if channels is not None else None
+
+    def read_page(before):
+        if projected:
+            return list(
+                checkpointer.list_values(
+                    config, channels, before=before, limit=page_size
+                )
+            )
+        return [
+            (
+                item.config,
+                item.metadata,
+                {
+                    k: v
+                    for k, v in item.checkpoint["channel_values"].items()
+                    if channels is None or k in channels
+                },
+            )
+            for item in checkpointer.list(config, before=before, limit=page_size)
+        ]
+
+    before = None
+    while True:
+        page = read_page(before)
+        for item_config, metadata, values in page:
+            yield {
+                "checkpoint_id": item_config["configurable"]["checkpoint_id"],
+                "step": metadata.get("step"),
+                "source": metadata.get("source"),
+                "values": values,
+            }
+        if len(page) < page_size:
+            return
+        before = page[-1][0]
+
+
+def resume(workflow, config: dict, checkpoint_id: Optional[str] = None):
+    """
+    Continue a thread from a saved checkpoint instead of starting over.
+
+    Nodes that already finished are not executed again: their outputs are
+    part of the checkpoint (or of its pending writes, for parallel nodes that
+    succeeded in the step that failed). Only the remaining nodes run.
+
+    Args:
+        workflow: A graph compiled with a checkpointer.
+        config: Config with the thread id to resume.
+        checkpoint_id: Replay from this checkpoint; defaults to the latest one.
+    """
+    configurable = dict(config["configurable"])
+    if checkpoint_id is not None:
+        configurable["checkpoint_id"] = checkpoint_id
+    return workflow.invoke(None, config={**config, "configurable": configurable})
+
+
+if __name__ == "__main__":
+    workflow = get_workflow()
+
+    config = {"configurable": {"thread_id": "1"}}
+    final_state = workflow.invoke(input={"topic": "pizza"}, config=config)
+
+    print(final_state)
+    print()
+
+    print(workflow.get_state(config=config))
+    print()
+
+    for snapshot in iter_state_history(workflow, config, channels=["joke"]):
+        print(snapshot)
+    print()
+
+    # fault recovery: the explanation call fails (a simulated outage), but
+    # generate_joke's output is already checkpointed, so resuming only re-runs
+    # the explanation
+    real_get_chat_model = get_chat_model
+    model_calls = 0
+
+    def get_chat_model(*args, **kwargs):
+        global model_calls
+        model_calls += 1
+        if model_calls == 2:
+            raise ConnectionError("simulated outage in generate_explanation")
+        return real_get_chat_model(*args, **kwargs)
+
+    config = {"configurable": {"thread_id": "2"}}
+    try:
+        final_state = workflow.invoke(input={"topic": "pasta"}, config=config)
+    except ConnectionError as exc:
+        print(f"run failed ({exc!r}), resuming from the last checkpoint")
+        final_state = resume(workflow, config)
+    print(final_state)
+    print(f"{model_calls} model calls: the joke was not generated again")
@@ -1,9 +1,8 @@
 """simple workflow"""
 
+from functools import lru_cache
 from typing import TypedDict
 
-from langgraph.graph import StateGraph, START, END
-
 
 # state = {}
 class BMIState(TypedDict):
@@ -36,22 +35,28 @@ def bmi_category(state: BMIState) -> BMIState:
     return state
 
 
-# 1. define the graph
-graph = StateGraph(BMIState)
+@lru_cache(maxsize=None)
+def get_workflow():
+    # langgraph is imported on first use so importing this module stays cheap
+    from langgraph.graph import StateGraph, START, END
+
+    # 1. define the graph
+    graph = StateGraph(BMIState)
 
+    # 2. add nodes to the graph
+    graph.add_node("calculate_bmi", calculate_bmi)
+    graph.add_node("bmi_category", bmi_category)
 
-# 2. add nodes to the graph
-graph.add_node("calculate_bmi", calculate_bmi)
-graph.add_node("bmi_category", bmi_category)
+    # 3. add edges to the graph
+    graph.add_edge(START, "calculate_bmi")
+    graph.add_edge("calculate_bmi", "bmi_category")
+    graph.add_edge("bmi_category", END)
 
-# 3. add edges to the graph
-graph.add_edge(START, "calculate_bmi")
-graph.add_edge("calculate_bmi", "bmi_category")
-graph.add_edge("bmi_category", END)
+    # 4. compile the graph
+    return graph.compile()
 
-# 4. compile the graph
-workflow = graph.compile()
 
-# 5. invoke the graph
-final_state = workflow.invoke({"weight_in_kgs": 67, "height_in_meters": 1.72})
-print(final_state)
+if __name__ == "__main__":
+    # 5. invoke the graph
+    final_state = get_workflow().invoke({"weight_in_kgs": 67, "height_in_meters": 1.72})
+    print(final_state)
@@ -1,14 +1,9 @@
 """LLM workflow"""
 
+from functools import lru_cache
 from typing import TypedDict
-from dotenv import load_dotenv
 
-from langgraph.graph import StateGraph, START, END
-from langchain_openai.chat_models import ChatOpenAI
-
-
-load_dotenv()
-model = ChatOpenAI()
+from chatbot.model_registry import get_chat_model
 
 
 class LLMState(TypedDict):
@@ -24,7 +19,7 @@ def llm_qa(state: LLMState) -> LLMState:
     prompt = f"answer the following question: {question}"
 
     # ask that question to the LLM
-    answer = model.invoke(prompt).content
+    answer = get_chat_model().invoke(prompt).content
 
     # update the answer in the state
     state["answer"] = answer
@@ -32,22 +27,32 @@ def llm_qa(state: LLMState) -> LLMState:
     return state
 
 
-# create graph
-graph = StateGraph(LLMState)
+@lru_cache(maxsize=None)
+def get_workflow():
+    # heavy imports happen on first use, not when the module is imported
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
+
+    load_dotenv()
+
+    # create graph
+    graph = StateGraph(LLMState)
+
+    # add nodes
+    graph.add_node("llm_qa", llm_qa)
 
-# add nodes
-graph.add_node("llm_qa", llm_qa)
+    # add edges
+    graph.add_edge(START, "llm_qa")
+    graph.add_edge("llm_qa", END)
 
-# add edges
-graph.add_edge(START, "llm_qa")
-graph.add_edge("llm_qa", END)
+    # compile graph
+    return graph.compile()
 
-# compile graph
-workflow = graph.compile()
 
-# invoke graph
-initial_state = {
-    "question": "yesterday i ate maida naan and a 100gm piece of cheese cake please provide me my today's schedule to neutralize the effect of these on my body i live in delhi, india and this august month and i am 30 years old boy please suggest me according to my details"
-}
-final_state = workflow.invoke(initial_state)
-print(final_state)
+if __name__ == "__main__":
+    # invoke graph
+    initial_state = {
+        "question": "yesterday i ate maida naan and a 100gm piece of cheese cake please provide me my today's schedule to neutralize the effect of these on my body i live in delhi, india and this august month and i am 30 years old boy please suggest me according to my details"
+    }
+    final_state = get_workflow().invoke(initial_state)
+    print(final_state)
@@ -1,14 +1,9 @@
 """Prompt chaining: START -> generate_outline -> generate_blog -> END"""
 
+from functools import lru_cache
 from typing import TypedDict
-from dotenv import load_dotenv
 
-from langgraph.graph import StateGraph, START, END
-from langchain_openai.chat_models import ChatOpenAI
-
-
-load_dotenv()
-model = ChatOpenAI()
+from chatbot.model_registry import get_chat_model
 
 
 class BlogState(TypedDict):
@@ -21,7 +16,7 @@ def create_outline(state: BlogState) -> BlogState:
     title = state["title"]
 
     prompt = f"generate a detailed outline for the blog on the topic: {title}"
-    state["outline"] = model.invoke(prompt).content
+    state["outline"] = get_chat_model().invoke(prompt).content
     return state
 
 
@@ -29,24 +24,34 @@ def create_blog(state: BlogState) -> BlogState:
     title = state["title"]
     outline = state["outline"]
     prompt = f"write a detailed blog on the title: {title} using the following outline: {outline}"
-    state["content"] = model.invoke(prompt).content
+    state["content"] = get_chat_model().invoke(prompt).content
     return state
 
 
-graph = StateGraph(BlogState)
+@lru_cache(maxsize=None)
+def get_workflow():
+    # heavy imports happen on first use, not when the module is imported
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
+
+    load_dotenv()
+
+    graph = StateGraph(BlogState)
+
+    graph.add_node("create_outline", create_outline)
+    graph.add_node("create_blog", create_blog)
 
-graph.add_node("create_outline", create_outline)
-graph.add_node("create_blog", create_blog)
+    graph.add_edge(START, "create_outline")
+    graph.add_edge("create_outline", "create_blog")
+    graph.add_edge("create_blog", END)
 
-graph.add_edge(START, "create_outline")
-graph.add_edge("create_outline", "create_blog")
-graph.add_edge("create_blog", END)
+    return graph.compile()
 
-workflow = graph.compile()
 
-initial_state = {"title": "rise of ai in india"}
+if __name__ == "__main__":
+    initial_state = {"title": "rise of ai in india"}
 
-final_state = workflow.invoke(initial_state)
-print(final_state["title"])
-print(final_state["outline"])
-print(final_state["content"])
+    final_state = get_workflow().invoke(initial_state)
+    print(final_state["title"])
+    print(final_state["outline"])
+    print(final_state["content"])
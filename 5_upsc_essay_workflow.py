@@ -7,20 +7,56 @@ This script evaluates a UPSC essay on three independent dimensions:
 
 It runs these evaluations in parallel using LangGraph, collects individual scores,
 and then generates a final average score along with a summarized feedback.
+
+    python 5_upsc_essay_workflow.py                 # print the final state
+    python 5_upsc_essay_workflow.py --stream        # each branch as it finishes
+    python 5_upsc_essay_workflow.py --stream --essay-file my_essay.txt
+    streamlit run essay_frontend.py                 # the same stream in a UI
 """
 
+import argparse
 import operator
-from typing import TypedDict, Annotated, List
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import TypedDict, Annotated, Iterator, List
 
 
-from langgraph.graph import StateGraph, START, END
-from langchain_openai.chat_models import ChatOpenAI
+from model_routing import ModelRouter, Route, batch_mode
+from prompt_cache import CACHE_MIN_TOKENS, prompt_tokens, shared_prefix_prompt
 from pydantic import BaseModel, Field
 
 
-load_dotenv()
-model = ChatOpenAI(model="gpt-4o-mini")
+# the three scoring calls run in parallel, so the slowest one sets the pace;
+# give them a tight budget and fall back to a faster model when they blow it
+ROUTES = {
+    # same model as the evaluators: the prompt cache is per model
+    "warm_prompt_cache": Route("gpt-4o-mini", timeout=15.0),
+    "evaluate_language": Route("gpt-4o-mini", timeout=15.0, fallback="gpt-4.1-nano"),
+    "evaluate_analysis": Route("gpt-4o-mini", timeout=15.0, fallback="gpt-4.1-nano"),
+    "evaluate_clarity": Route("gpt-4o-mini", timeout=15.0, fallback="gpt-4.1-nano"),
+    "final_evaluation": Route("gpt-4o-mini", timeout=30.0, fallback="gpt-4.1-nano"),
+}
+router = ModelRouter(ROUTES)
+
+# The three evaluators send the same system prompt and essay first and their
+# own instruction last, so they share one long prompt prefix. The provider
+# only caches a prefix (automatically, from 1024 prompt tokens) once a request
+# carrying it has been processed, so three calls sent in parallel would all
+# miss. warm_prompt_cache sends the prefix once before the fan-out, then all
+# three evaluators read the essay from the cache: one short extra round trip
+# for three cached prompts. Keep anything call-specific out of the shared
+# part; see prompt_cache.py for the benchmark.
+EXAMINER_PROMPT = (
+    "You are a UPSC examiner. The candidate's essay follows. You will then be "
+    "asked to evaluate one aspect of it, give detailed feedback and assign a "
+    "score out of 10."
+)
+INSTRUCTIONS = {
+    "evaluate_language": "Evaluate the language quality of the essay above. Provide feedback and assign a score out of 10.",
+    "evaluate_analysis": "Evaluate the depth of analysis of the essay above. Provide feedback and assign a score out of 10.",
+    "evaluate_clarity": "Evaluate the clarity of thought of the essay above. Provide feedback and assign a score out of 10.",
+}
+# asks for as little output as the schema allows
+WARM_UP_INSTRUCTION = "Reply with empty feedback and a score of 0."
 
 
 class EvaluationSchema(BaseModel):
@@ -36,9 +72,6 @@ class EvaluationSchema(BaseModel):
     score: Annotated[int, Field(description="Score out of 10", ge=0, le=10)]
 
 
-model_with_structured_output = model.with_structured_output(EvaluationSchema)
-
-
 class UPSCState(TypedDict):
     """
     State structure for the UPSC essay evaluation workflow.
@@ -62,6 +95,20 @@ class UPSCState(TypedDict):
     avg_score: float
 
 
+def warm_prompt_cache(state: UPSCState):
+    """
+    Send the evaluators' shared prefix once, so their parallel calls hit the cache.
+
+    Skipped for essays too short to be cached, and in batch mode, where it
+    would cost a batch round of its own.
+    """
+    prompt = shared_prefix_prompt(EXAMINER_PROMPT, state["essay"], WARM_UP_INSTRUCTION)
+    if batch_mode() or prompt_tokens(prompt) < CACHE_MIN_TOKENS:
+        return {}
+    router.invoke("warm_prompt_cache", prompt, schema=EvaluationSchema)
+    return {}
+
+
 def evaluate_language(state: UPSCState):
     """
     Evaluate the language quality of the essay.
@@ -72,8 +119,10 @@ def evaluate_language(state: UPSCState):
     Returns:
         dict: Contains 'language_feedback' and a list with the language score.
     """
-    prompt = f"Evaluate the language quality of the following essay and provide a feedback and assign a score out of 10 \n {state['essay']}"
-    output = model_with_structured_output.invoke(prompt)
+    prompt = shared_prefix_prompt(
+        EXAMINER_PROMPT, state["essay"], INSTRUCTIONS["evaluate_language"]
+    )
+    output = router.invoke("evaluate_language", prompt, schema=EvaluationSchema)
     return {"language_feedback": output.feedback, "individual_scores": [output.score]}
 
 
@@ -87,8 +136,10 @@ def evaluate_analysis(state: UPSCState):
     Returns:
         dict: Contains 'analysis_feedback' and a list with the analysis score.
     """
-    prompt = f"Evaluate the depth of analysis of the following essay and provide a feedback and assign a score out of 10 \n {state['essay']}"
-    output = model_with_structured_output.invoke(prompt)
+    prompt = shared_prefix_prompt(
+        EXAMINER_PROMPT, state["essay"], INSTRUCTIONS["evaluate_analysis"]
+    )
+    output = router.invoke("evaluate_analysis", prompt, schema=EvaluationSchema)
     return {"analysis_feedback": output.feedback, "individual_scores": [output.score]}
 
 
@@ -102,8 +153,10 @@ def evaluate_clarity(state: UPSCState):
     Returns:
         dict: Contains 'clarity_feedback' and a list with the clarity score.
     """
-    prompt = f"Evaluate the clarity of though of the following essay and provide a feedback and assign a score out of 10 \n {state['essay']}"
-    output = model_with_structured_output.invoke(prompt)
+    prompt = shared_prefix_prompt(
+        EXAMINER_PROMPT, state["essay"], INSTRUCTIONS["evaluate_clarity"]
+    )
+    output = router.invoke("evaluate_clarity", prompt, schema=EvaluationSchema)
     return {"clarity_feedback": output.feedback, "individual_scores": [output.score]}
 
 
@@ -124,7 +177,7 @@ def final_evaluation(state: UPSCState):
         f"Clarity of thought feedback - {state.get('clarity_feedback', '')}"
     )
     # prompt = f'Based on the following feedbacks create a summarized feedback \n language feedback - {state["language_feedback"]} \n depth of analysis feedback - {state["analysis_feedback"]} \n clarity of thought feedback - {state["clarity_feedback"]}'
-    overall_feedback = model.invoke(prompt).content
+    overall_feedback = router.invoke("final_evaluation", prompt).content
 
     avg_score = sum(state["individual_scores"]) / len(state["individual_scores"])
     return {"avg_score": avg_score, "overall_feedback": overall_feedback}
@@ -148,25 +201,108 @@ India’s demographic dividend, when paired with responsible AI adoption, can un
 In conclusion, India in the age of AI is a story in the making — one of opportunity, responsibility, and transformation. The decisions we make today will not just determine India’s AI trajectory, but also its future as an inclusive, equitable, and innovation-driven society."""
 
 
-graph = StateGraph(UPSCState)
-graph.add_node("evaluate_language", evaluate_language)
-graph.add_node("evaluate_analysis", evaluate_analysis)
-graph.add_node("evaluate_clarity", evaluate_clarity)
-graph.add_node("final_evaluation", final_evaluation)
+@lru_cache(maxsize=None)
+def get_workflow():
+    """
+    Build and compile the evaluation graph (once per process).
+
+    langgraph, dotenv and the OpenAI client are imported here or on first
+    model call, so importing this module to reuse its nodes or schemas is cheap.
+    """
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
+
+    load_dotenv()
+
+    graph = StateGraph(UPSCState)
+    graph.add_node("warm_prompt_cache", warm_prompt_cache)
+    graph.add_node("evaluate_language", evaluate_language)
+    graph.add_node("evaluate_analysis", evaluate_analysis)
+    graph.add_node("evaluate_clarity", evaluate_clarity)
+    graph.add_node("final_evaluation", final_evaluation)
 
+    graph.add_edge(START, "warm_prompt_cache")
+    graph.add_edge("warm_prompt_cache", "evaluate_language")
+    graph.add_edge("warm_prompt_cache", "evaluate_analysis")
+    graph.add_edge("warm_prompt_cache", "evaluate_clarity")
 
-graph.add_edge(START, "evaluate_language")
-graph.add_edge(START, "evaluate_analysis")
-graph.add_edge(START, "evaluate_clarity")
+    graph.add_edge("evaluate_language", "final_evaluation")
+    graph.add_edge("evaluate_analysis", "final_evaluation")
+    graph.add_edge("evaluate_clarity", "final_evaluation")
 
-graph.add_edge("evaluate_language", "final_evaluation")
-graph.add_edge("evaluate_analysis", "final_evaluation")
-graph.add_edge("evaluate_clarity", "final_evaluation")
+    graph.add_edge("final_evaluation", END)
 
-graph.add_edge("final_evaluation", END)
+    return graph.compile()
 
-workflow = graph.compile()
 
-initial_State = {"essay": ESSAY}
-final_State = workflow.invoke(initial_State)
-print(final_State)
+# evaluator node -> (dimension, feedback key in the state)
+BRANCHES = {
+    "evaluate_language": ("language", "language_feedback"),
+    "evaluate_analysis": ("analysis", "analysis_feedback"),
+    "evaluate_clarity": ("clarity", "clarity_feedback"),
+}
+
+
+def stream_evaluation(essay: str) -> Iterator[dict]:
+    """
+    Evaluate ``essay`` and yield results as soon as they exist.
+
+    Yields, in order of arrival:
+        {"type": "branch", "dimension", "feedback", "score"}: once per
+            evaluator, as soon as that branch finishes (fastest first).
+        {"type": "token", "content"}: the summary, token by token, while
+            ``final_evaluation`` is still generating it.
+        {"type": "final", "avg_score", "overall_feedback"}: once, at the end.
+    """
+    for mode, payload in get_workflow().stream(
+        {"essay": essay}, stream_mode=["updates", "messages"]
+    ):
+        if mode == "messages":
+            chunk, metadata = payload
+            # evaluators stream too (their structured output), only the
+            # summary is meant for the reader
+            if metadata.get("langgraph_node") == "final_evaluation" and chunk.content:
+                yield {"type": "token", "content": chunk.content}
+            continue
+        for node, update in payload.items():
+            if node in BRANCHES:
+                dimension, feedback_key = BRANCHES[node]
+                yield {
+                    "type": "branch",
+                    "dimension": dimension,
+                    "feedback": update[feedback_key],
+                    "score": update["individual_scores"][0],
+                }
+            elif node == "final_evaluation":
+                yield {"type": "final", **update}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UPSC essay evaluation")
+    parser.add_argument(
+        "--stream", action="store_true", help="print each result as it arrives"
+    )
+    parser.add_argument("--essay-file", help="evaluate this file instead of the demo")
+    args = parser.parse_args()
+
+    essay = ESSAY
+    if args.essay_file:
+        with open(args.essay_file, encoding="utf-8") as f:
+            essay = f.read()
+
+    if args.stream:
+        for event in stream_evaluation(essay):
+            if event["type"] == "branch":
+                print(f"[{event['dimension']}] {event['score']}/10")
+                print(event["feedback"])
+                print()
+            elif event["type"] == "token":
+                print(event["content"], end="", flush=True)
+            else:
+                print(f"\n\nAverage score: {event['avg_score']:.2f}/10")
+    else:
+        initial_State = {"essay": essay}
+        final_State = get_workflow().invoke(initial_State)
+        print(final_State)
+    print()
+    router.report()
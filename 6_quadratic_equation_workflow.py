@@ -2,8 +2,8 @@
 Conditional Workflows without LLM
 """
 
+from functools import lru_cache
 from typing import TypedDict, Literal
-from langgraph.graph import StateGraph, START, END
 
 
 class QuadState(TypedDict):
@@ -72,25 +72,30 @@ def check_condition(
         return "no_real_roots"
 
 
-graph = StateGraph(QuadState)
+@lru_cache(maxsize=None)
+def get_workflow():
+    # langgraph is imported on first use so importing this module stays cheap
+    from langgraph.graph import StateGraph, START, END
 
-graph.add_node("show_equation", show_equation)
-graph.add_node("calc_discriminant", calc_discriminant)
-graph.add_node("real_roots", real_roots)
-graph.add_node("no_real_roots", no_real_roots)
-graph.add_node("repeated_roots", repeated_roots)
+    graph = StateGraph(QuadState)
 
+    graph.add_node("show_equation", show_equation)
+    graph.add_node("calc_discriminant", calc_discriminant)
+    graph.add_node("real_roots", real_roots)
+    graph.add_node("no_real_roots", no_real_roots)
+    graph.add_node("repeated_roots", repeated_roots)
 
-graph.add_edge(START, "show_equation")
-graph.add_edge("show_equation", "calc_discriminant")
-graph.add_conditional_edges("calc_discriminant", check_condition)
-graph.add_edge("real_roots", END)
-graph.add_edge("no_real_roots", END)
-graph.add_edge("repeated_roots", END)
+    graph.add_edge(START, "show_equation")
+    graph.add_edge("show_equation", "calc_discriminant")
+    graph.add_conditional_edges("calc_discriminant", check_condition)
+    graph.add_edge("real_roots", END)
+    graph.add_edge("no_real_roots", END)
+    graph.add_edge("repeated_roots", END)
 
+    return graph.compile()
 
-workflow = graph.compile()
 
-initial_state = {"a": 4, "b": -5, "c": -4}
-final_State = workflow.invoke(initial_state)
-print(final_State)
+if __name__ == "__main__":
+    initial_state = {"a": 4, "b": -5, "c": -4}
+    final_State = get_workflow().invoke(initial_state)
+    print(final_State)
@@ -1,14 +1,58 @@
+import argparse
 import operator
-from typing import TypedDict, Annotated, List, Literal, Dict
-from dotenv import load_dotenv
-
-from langgraph.graph import StateGraph, START, END
-from langchain_openai.chat_models import ChatOpenAI
+from functools import lru_cache
+from time import perf_counter
+from typing import TYPE_CHECKING, TypedDict, Annotated, List, Literal, Dict
+
+from model_routing import (
+    DeadlineExceeded,
+    ModelRouter,
+    Route,
+    deadline_in,
+    time_left,
+)
 from pydantic import BaseModel, Field
+from reply_cache import ReplyCache
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableConfig
 
 
-load_dotenv()
-model = ChatOpenAI(model="gpt-4o-mini")
+# classification is a short structured answer: keep it on a tight budget so a
+# slow provider doesn't hold up the reply; the replies themselves get longer
+ROUTES = {
+    "find_sentiment": Route("gpt-4o-mini", timeout=4.0, fallback="gpt-4.1-nano"),
+    "run_diagnosis": Route("gpt-4o-mini", timeout=6.0, fallback="gpt-4.1-nano"),
+    "positive_response": Route("gpt-4o-mini", timeout=20.0, fallback="gpt-4.1-nano"),
+    "negative_response": Route("gpt-4o-mini", timeout=30.0, fallback="gpt-4.1-nano"),
+}
+router = ModelRouter(ROUTES)
+
+# negative reviews that are near-duplicates of one already answered reuse its
+# diagnosis and reply (the reply is written from the diagnosis alone, so it
+# fits any review with the same diagnosis); check reply_cache.report() before
+# lowering the threshold
+REUSE_THRESHOLD = 0.8
+reply_cache = ReplyCache(threshold=REUSE_THRESHOLD, capacity=2048)
+
+# Every reply has to go out within REPLY_DEADLINE seconds (support SLA). The
+# deadline travels in the run config and caps every model call; when time
+# runs short the pipeline degrades instead of waiting:
+#   - no time to diagnose and still write a reply -> reply without diagnosis
+#   - no time (or a timeout) for a written reply -> the canned reply below
+#   - sentiment unknown in time -> treated as negative (the safer reply)
+# The nodes taken, and how, are recorded in the state's ``path``.
+REPLY_DEADLINE = 8.0
+# time a reply needs, kept back when deciding whether to diagnose first
+REPLY_RESERVE = 3.0
+GENERIC_NEGATIVE_REPLY = (
+    "We're sorry about the trouble you've had. Our support team is looking "
+    "into it and will follow up with you shortly."
+)
+GENERIC_POSITIVE_REPLY = (
+    "Thank you so much for your kind review! We'd love to hear more, please "
+    "leave your feedback on our website."
+)
 
 
 class SentimentSchema(BaseModel):
@@ -35,10 +79,6 @@ class DiagnosisSchema(BaseModel):
     )
 
 
-model_with_structured_output = model.with_structured_output(SentimentSchema)
-diagnosis_model_with_structured_output = model.with_structured_output(DiagnosisSchema)
-
-
 class ReviewState(TypedDict):
     """
     Defines the state dictionary structure passed between workflow nodes.
@@ -48,97 +88,234 @@ class ReviewState(TypedDict):
         sentiment (str): The sentiment of the review ('Positive' or 'Negative').
         diagnosis (dict): Any additional diagnostic info for analysis.
         response (str): A response message or processed output.
+        model_seconds (float): Model time spent diagnosing and replying.
+        reused_score (float): Similarity to the cached review whose diagnosis
+            and reply were reused, only set on a cache hit.
+        path (List[str]): Nodes run, each with how it ended, e.g.
+            "run_diagnosis:skipped" or "negative_response:generic".
     """
 
     review: Annotated[str, Field(description="Customer review text")]
     sentiment: Annotated[str, Field(Literal["Positive", "Negative"])]
     diagnosis: dict
     response: str
+    model_seconds: float
+    reused_score: float
+    path: Annotated[List[str], operator.add]
+
+
+def _deadline(config: "RunnableConfig"):
+    return config.get("configurable", {}).get("deadline")
 
 
-def find_sentiment(state: ReviewState):
+def find_sentiment(state: ReviewState, config: "RunnableConfig"):
     """
     Node function to determine the sentiment of a given review.
 
     Args:
         state (ReviewState): The current state of the workflow containing the 'review' text.
+        config (RunnableConfig): Run config, may carry the run's ``deadline``.
 
     Returns:
         dict: A dictionary with the detected sentiment as {'sentiment': value}.
     """
     prompt = f'For the following review find out the sentiment \n {state["review"]}'
-    sentiment = model_with_structured_output.invoke(prompt).sentiment
-    return {"sentiment": sentiment}
-
-
-def positive_response(state: ReviewState):
+    try:
+        sentiment = router.invoke(
+            "find_sentiment",
+            prompt,
+            schema=SentimentSchema,
+            deadline=_deadline(config),
+        ).sentiment
+    except DeadlineExceeded:
+        return {"sentiment": "Negative", "path": ["find_sentiment:assumed_negative"]}
+    return {"sentiment": sentiment, "path": ["find_sentiment"]}
+
+
+def positive_response(state: ReviewState, config: "RunnableConfig"):
     prompt = f"""Write a warm thank-you message in response to this review:
     \n\n\"{state['review']}\"\n
     Also, kindly ask the user to leave feedback on our website."""
 
-    response = model.invoke(prompt).content
-
-    return {"response": response}
-
-
-def run_diagnosis(state: ReviewState):
+    try:
+        response = router.invoke(
+            "positive_response", prompt, deadline=_deadline(config)
+        ).content
+    except DeadlineExceeded:
+        return {
+            "response": GENERIC_POSITIVE_REPLY,
+            "path": ["positive_response:generic"],
+        }
+
+    return {"response": response, "path": ["positive_response"]}
+
+
+def reuse_reply(state: ReviewState):
+    # a node of its own: a deferred (batch) diagnosis reruns its node on
+    # resume, and must not be dropped for a reply cached in the meantime
+    hit = reply_cache.lookup(state["review"])
+    if hit is None:
+        return {"path": ["reuse_reply:miss"]}
+    return {
+        "diagnosis": hit.diagnosis,
+        "response": hit.reply,
+        "reused_score": hit.score,
+        "path": ["reuse_reply"],
+    }
+
+
+def run_diagnosis(state: ReviewState, config: "RunnableConfig"):
+    # diagnose only if a reply can still be written afterwards
+    deadline = _deadline(config)
+    if time_left(deadline) < REPLY_RESERVE:
+        return {"diagnosis": {}, "path": ["run_diagnosis:skipped"]}
+
+    start = perf_counter()
     prompt = f"""Diagnose this negative review:\n\n{state['review']}\n"
     "Return issue_type, tone, and urgency.
 """
-    response = diagnosis_model_with_structured_output.invoke(prompt)
-    return {"diagnosis": response.model_dump()}
-
-
-def negative_response(state: ReviewState):
+    try:
+        response = router.invoke(
+            "run_diagnosis",
+            prompt,
+            schema=DiagnosisSchema,
+            deadline=None if deadline is None else deadline - REPLY_RESERVE,
+        )
+    except DeadlineExceeded:
+        return {"diagnosis": {}, "path": ["run_diagnosis:skipped"]}
+    return {
+        "path": ["run_diagnosis"],
+        "diagnosis": response.model_dump(),
+        "model_seconds": perf_counter() - start,
+    }
+
+
+def negative_response(state: ReviewState, config: "RunnableConfig"):
     diagnosis = state["diagnosis"]
+    start = perf_counter()
 
-    prompt = f"""You are a support assistant.
+    if diagnosis:
+        prompt = f"""You are a support assistant.
     The user had a '{diagnosis['issue_type']}' issue, sounded '{diagnosis['tone']}', and marked urgency as '{diagnosis['urgency']}'.
     Write an empathetic, helpful resolution message.
     """
-    response = model.invoke(prompt).content
-
-    return {"response": response}
+    else:
+        # no time was left to diagnose: answer the review itself, briefly
+        prompt = f"""You are a support assistant.
+    Write a short, empathetic reply to this negative review and promise a follow-up:
+    \n\n\"{state['review']}\"\n
+    """
+    try:
+        response = router.invoke(
+            "negative_response", prompt, deadline=_deadline(config)
+        ).content
+    except DeadlineExceeded:
+        return {
+            "response": GENERIC_NEGATIVE_REPLY,
+            "path": ["negative_response:generic"],
+        }
+
+    seconds = state.get("model_seconds", 0.0) + perf_counter() - start
+    if diagnosis:
+        # an undiagnosed reply is specific to its review, not a template
+        reply_cache.store(state["review"], diagnosis, response, seconds)
+        return {
+            "response": response,
+            "model_seconds": seconds,
+            "path": ["negative_response"],
+        }
+    return {
+        "response": response,
+        "model_seconds": seconds,
+        "path": ["negative_response:undiagnosed"],
+    }
 
 
 def check_sentiment(
     state: ReviewState,
-) -> Literal["positive_response", "run_diagnosis"]:
+) -> Literal["positive_response", "reuse_reply"]:
     if str(state["sentiment"]).lower() == "positive":
         return "positive_response"
     else:
-        return "run_diagnosis"
+        return "reuse_reply"
 
 
-# Build a StateGraph workflow
-graph = StateGraph(ReviewState)
+def check_reuse(state: ReviewState) -> Literal["reuse", "run_diagnosis"]:
+    return "reuse" if state.get("reused_score") is not None else "run_diagnosis"
 
-# Add the sentiment analysis node to the graph
-graph.add_node("find_sentiment", find_sentiment)
-graph.add_node("positive_response", positive_response)
-graph.add_node("run_diagnosis", run_diagnosis)
-graph.add_node("negative_response", negative_response)
 
-# Define the graph edges (execution order)
-graph.add_edge(START, "find_sentiment")
-graph.add_conditional_edges("find_sentiment", check_sentiment)
+@lru_cache(maxsize=None)
+def get_workflow():
+    """Build and compile the review reply graph (once per process)."""
+    # heavy imports happen on first use, not when the module is imported
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
 
-graph.add_edge("positive_response", END)
+    load_dotenv()
 
-graph.add_edge("run_diagnosis", "negative_response")
-graph.add_edge("negative_response", END)
+    # Build a StateGraph workflow
+    graph = StateGraph(ReviewState)
 
+    # Add the sentiment analysis node to the graph
+    graph.add_node("find_sentiment", find_sentiment)
+    graph.add_node("positive_response", positive_response)
+    graph.add_node("reuse_reply", reuse_reply)
+    graph.add_node("run_diagnosis", run_diagnosis)
+    graph.add_node("negative_response", negative_response)
 
-# Compile the workflow
-workflow = graph.compile()
+    # Define the graph edges (execution order)
+    graph.add_edge(START, "find_sentiment")
+    graph.add_conditional_edges("find_sentiment", check_sentiment)
 
-# Initial input to the workflow
-initial_state = {
-    "review": "I’ve been trying to log in for over an hour now, and the app keeps freezing on the authentication screen. I even tried reinstalling it, but no luck. This kind of bug is unacceptable, especially when it affects basic functionality."
-}
+    graph.add_edge("positive_response", END)
+
+    graph.add_conditional_edges(
+        "reuse_reply",
+        check_reuse,
+        {"reuse": END, "run_diagnosis": "run_diagnosis"},
+    )
+    graph.add_edge("run_diagnosis", "negative_response")
+    graph.add_edge("negative_response", END)
+
+    # Compile the workflow
+    return graph.compile()
 
-# Run the workflow
-final_state = workflow.invoke(initial_state)
 
-# Output the result
-print(final_state)
+def reply(review: str, deadline: float = REPLY_DEADLINE) -> ReviewState:
+    """Run the pipeline for ``review`` within ``deadline`` seconds (``None``: no limit)."""
+    config = {"configurable": {"deadline": deadline_in(deadline)}}
+    return get_workflow().invoke({"review": review}, config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="review reply workflow demo")
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=REPLY_DEADLINE,
+        help="seconds each reply must be ready in (0: no deadline)",
+    )
+    args = parser.parse_args()
+    deadline = args.deadline or None
+
+    # Initial input to the workflow
+    review = "I’ve been trying to log in for over an hour now, and the app keeps freezing on the authentication screen. I even tried reinstalling it, but no luck. This kind of bug is unacceptable, especially when it affects basic functionality."
+
+    # Run the workflow
+    final_state = reply(review, deadline)
+
+    # Output the result
+    print(final_state)
+
+    # the same complaint again in other words: reused when similar enough, see
+    # "hit rate by threshold" below for how close the misses were
+    for review in [
+        "I have been trying to log in for over an hour and the app keeps freezing on the authentication screen. Reinstalled it, no luck. Unacceptable bug for basic functionality!",
+        "Been trying to login for an hour now, app keeps freezing on the authentication screen... even tried reinstalling it. This bug is unacceptable.",
+    ]:
+        state = reply(review, deadline)
+        print(f"\nreused (score {state.get('reused_score')}): {state['response'][:80]}")
+        print(f"path: {' -> '.join(state['path'])}")
+    print()
+    router.report()
+    reply_cache.report()
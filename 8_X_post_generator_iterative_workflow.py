@@ -1,17 +1,16 @@
-from langgraph.graph import StateGraph, START, END
+from functools import lru_cache
 from typing import TypedDict, Literal, Annotated, List
-from langchain_openai import ChatOpenAI
+from chatbot.model_registry import get_chat_model
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
 import operator
 
 
-load_dotenv()
-
-generator_llm = ChatOpenAI(model="gpt-4o-mini")
-evaluator_llm = ChatOpenAI(model="gpt-4o-mini")
-optimizer_llm = ChatOpenAI(model="gpt-4o-mini")
+# all three roles share one client (and one connection pool), created on the
+# first call, see model_registry
+GENERATOR_MODEL = "gpt-4o-mini"
+EVALUATOR_MODEL = "gpt-4o-mini"
+OPTIMIZER_MODEL = "gpt-4o-mini"
 
 
 class TweetState(TypedDict):
@@ -32,7 +31,9 @@ class TweetEvaluator(BaseModel):
     feedback: str = Field(..., description="feedback for the tweet.")
 
 
-structured_evaluator_llm = evaluator_llm.with_structured_output(TweetEvaluator)
+@lru_cache(maxsize=None)
+def structured_evaluator_llm():
+    return get_chat_model(EVALUATOR_MODEL).with_structured_output(TweetEvaluator)
 
 
 def generate_tweet(state: TweetState):
@@ -51,7 +52,7 @@ def generate_tweet(state: TweetState):
     """
         ),
     ]
-    response = generator_llm.invoke(messages).content
+    response = get_chat_model(GENERATOR_MODEL).invoke(messages).content
     return {"tweet": response, "tweet_history": [response]}
 
 
@@ -86,7 +87,7 @@ Auto-reject if:
 """
         ),
     ]
-    response = structured_evaluator_llm.invoke(messages)
+    response = structured_evaluator_llm().invoke(messages)
     return {
         "evaluation": response.evaluation,
         "feedback": response.feedback,
@@ -112,7 +113,7 @@ Re-write it as a short, viral-worthy tweet. Avoid Q&A style and stay under 280 c
 """
         ),
     ]
-    response = optimizer_llm.invoke(messages).content
+    response = get_chat_model(OPTIMIZER_MODEL).invoke(messages).content
     iteration = state["iteration"] + 1
 
     return {"tweet": response, "iteration": iteration, "tweet_history": [response]}
@@ -126,24 +127,34 @@ def evaluation_feedback(state: TweetState):
         return "needs_improvement"
 
 
-graph = StateGraph(TweetState)
+@lru_cache(maxsize=None)
+def get_workflow():
+    # heavy imports happen on first use, not when the module is imported
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
+
+    load_dotenv()
+
+    graph = StateGraph(TweetState)
 
-graph.add_node("generate_tweet", generate_tweet)
-graph.add_node("evaluate_tweet", evaluate_tweet)
-graph.add_node("optimize_tweet", optimize_tweet)
+    graph.add_node("generate_tweet", generate_tweet)
+    graph.add_node("evaluate_tweet", evaluate_tweet)
+    graph.add_node("optimize_tweet", optimize_tweet)
+
+    graph.add_edge(START, "generate_tweet")
+    graph.add_edge("generate_tweet", "evaluate_tweet")
+    graph.add_conditional_edges(
+        "evaluate_tweet",
+        evaluation_feedback,
+        {"approved": END, "needs_improvement": "optimize_tweet"},
+    )
+    graph.add_edge("optimize_tweet", "evaluate_tweet")
 
-graph.add_edge(START, "generate_tweet")
-graph.add_edge("generate_tweet", "evaluate_tweet")
-graph.add_conditional_edges(
-    "evaluate_tweet",
-    evaluation_feedback,
-    {"approved": END, "needs_improvement": "optimize_tweet"},
-)
-graph.add_edge("optimize_tweet", "evaluate_tweet")
+    return graph.compile()
 
-workflow = graph.compile()
 
-initial_state = {"topic": "Indian railways", "iteration": 1, "max_iteration": 5}
+if __name__ == "__main__":
+    initial_state = {"topic": "Indian railways", "iteration": 1, "max_iteration": 5}
 
-final_state = workflow.invoke(initial_state)
-print(final_state)
+    final_state = get_workflow().invoke(initial_state)
+    print(final_state)
@@ -1,15 +1,9 @@
-from langgraph.graph import StateGraph, START, END
+from functools import lru_cache
 from typing import TypedDict, Annotated, List
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_openai.chat_models import ChatOpenAI
-from dotenv import load_dotenv
+from chatbot.model_registry import get_chat_model
 from pydantic import Field
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
-
-
-load_dotenv()
-model = ChatOpenAI()
 
 
 class ChatState(TypedDict):
@@ -18,29 +12,42 @@ class ChatState(TypedDict):
 
 def chat_node(state: ChatState):
     messages = state["messages"]
-    response = model.invoke(messages)
+    response = get_chat_model().invoke(messages)
 
     return {"messages": [response]}
 
 
-checkpointer = MemorySaver()
-graph = StateGraph(ChatState)
+@lru_cache(maxsize=None)
+def get_chatbot():
+    # the OpenAI client is only created by the first chat_node call
+    from dotenv import load_dotenv
+    from langgraph.graph import StateGraph, START, END
+    from chatbot.bounded_saver import BoundedInMemorySaver
+
+    load_dotenv()
+
+    # cold threads are spilled to disk once resident checkpoints pass 256 MB
+    checkpointer = BoundedInMemorySaver(max_bytes=256 * 1024 * 1024)
+    graph = StateGraph(ChatState)
+
+    graph.add_node("chat_node", chat_node)
 
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
 
-graph.add_node("chat_node", chat_node)
+    return graph.compile(checkpointer=checkpointer)
 
-graph.add_edge(START, "chat_node")
-graph.add_edge("chat_node", END)
 
-chatbot = graph.compile(checkpointer=checkpointer)
+if __name__ == "__main__":
+    chatbot = get_chatbot()
 
-thread_id = 1
-while 1:
-    user_msg = input("Type here: ")
-    print(f"User: {user_msg}")
+    thread_id = 1
+    while 1:
+        user_msg = input("Type here: ")
+        print(f"User: {user_msg}")
 
-    if user_msg.strip().lower() in ["exit", "quit", "bye"]:
-        break
-    config = {"configurable": {"thread_id": thread_id}}
-    response = chatbot.invoke({"messages": [HumanMessage(user_msg)]}, config=config)
-    print(f"AI: {response["messages"][-1].content}")
+        if user_msg.strip().lower() in ["exit", "quit", "bye"]:
+            break
+        config = {"configurable": {"thread_id": thread_id}}
+        response = chatbot.invoke({"messages": [HumanMessage(user_msg)]}, config=config)
+        print(f"AI: {response['messages'][-1].content}")
@@ -0,0 +1,543 @@
+"""Deferred execution of the graphs through the provider's batch API, for nightly runs.
+
+    python batch_api.py submit review --input-file reviews.jsonl
+    python batch_api.py run --poll 60            # until every item is done
+    python batch_api.py results --graph review > replies.jsonl
+
+    python batch_api.py stub --port 8099 &       # local stand-in for the provider
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python batch_api.py run --poll 1
+
+Each input is one item: a graph run in batch mode (see model_routing), with
+a SQLite checkpoint per item (thread ``batch-<id>``). Its model calls don't
+go out one by one: every call pauses its graph with the request, all pending
+requests across all items go into one JSONL batch file, which is submitted
+once and polled, and when the results are in every item resumes from its
+checkpoint with its responses. That is one batch per graph step (two for the
+essay graph, three for review replies), however many items there are.
+
+Batch requests cost half the realtime price and count against a separate,
+much larger queue limit instead of the per-minute rate limits, so a nightly
+run is bounded by the batch turnaround (up to 24h), not by requests/minute.
+
+The run is resumable: submitted batch ids are stored before polling, so a
+restarted ``run`` picks up the batches in flight instead of submitting again,
+and results are only applied to items still waiting on them. Requests whose
+batch failed, expired or was cancelled go into the next batch; per-request
+errors fail their item.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import importlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# graphs whose model calls go through a ModelRouter, which can defer them
+GRAPHS = {
+    "upsc": "5_upsc_essay_workflow",
+    "review": "7_review_reply_workflow",
+}
+DATABASE = "batch.db"
+ENDPOINT = "/v1/chat/completions"
+# provider limit on requests per batch file
+MAX_REQUESTS = 50_000
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+# give up after this many rounds whose batches all failed (e.g. invalid file)
+MAX_FAILED_ROUNDS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    graph TEXT NOT NULL,
+    input TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'submitted',
+    requests INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    finished_at REAL
+);
+"""
+
+
+def connect(path: str = DATABASE) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def submit(conn: sqlite3.Connection, graph: str, inputs: Iterable[dict]) -> List[int]:
+    """Add one item per input; returns the item ids."""
+    if graph not in GRAPHS:
+        raise ValueError(f"unknown graph {graph!r}, expected one of {sorted(GRAPHS)}")
+    now = time.time()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        return [
+            conn.execute(
+                "INSERT INTO items (graph, input, created_at) VALUES (?, ?, ?)",
+                (graph, json.dumps(input), now),
+            ).lastrowid
+            for input in inputs
+        ]
+
+
+@lru_cache(maxsize=None)
+def _compiled(graph: str, checkpointer):
+    module = importlib.import_module(GRAPHS[graph])
+    return module.get_workflow().builder.compile(checkpointer=checkpointer)
+
+
+def _config(item_id: int) -> dict:
+    return {"configurable": {"thread_id": f"batch-{item_id}", "batch": True}}
+
+
+def _custom_id(item_id: int, interrupt_id: str) -> str:
+    return f"{item_id}:{interrupt_id}"
+
+
+# ******************************** batch API client ***********************************
+class BatchClient:
+    """Upload, create, poll and download batch jobs with the OpenAI SDK."""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        from openai import OpenAI
+
+        self.client = OpenAI(
+            base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+            api_key=api_key or os.getenv("OPENAI_API_KEY", "unused"),
+        )
+
+    def create(self, requests: List[dict]) -> str:
+        """Submit ``requests`` (batch file lines) as one batch; returns its id."""
+        data = "".join(json.dumps(r) + "\n" for r in requests).encode()
+        file = self.client.files.create(file=("requests.jsonl", data), purpose="batch")
+        return self.client.batches.create(
+            input_file_id=file.id, endpoint=ENDPOINT, completion_window="24h"
+        ).id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, dict]:
+        """``{custom_id: output line}`` of a finished batch, errors included."""
+        batch = self.client.batches.retrieve(batch_id)
+        lines = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        record = json.loads(line)
+                        lines[record["custom_id"]] = record
+        return lines
+
+
+# ******************************** runner *********************************************
+class BatchRunner:
+    """Drives all pending items forward, one batch round per graph step."""
+
+    def __init__(self, conn: sqlite3.Connection, checkpointer, client: BatchClient):
+        self.conn = conn
+        self.checkpointer = checkpointer
+        self.client = client
+
+    def _items(self):
+        return self.conn.execute(
+            "SELECT id, graph, input FROM items WHERE status = 'pending' ORDER BY id"
+        ).fetchall()
+
+    def _finish(self, item_id: int, **columns) -> None:
+        sets = ", ".join(f"{name} = ?" for name in columns)
+        self.conn.execute(
+            f"UPDATE items SET {sets}, finished_at = ? WHERE id = ?",
+            (*columns.values(), time.time(), item_id),
+        )
+        self.checkpointer.delete_thread(f"batch-{item_id}")
+
+    def _advance(self, item_id: int, graph: str, input, resume=None):
+        # runs the item until its graph ends or every branch waits on a
+        # request; returns its state while it's still waiting, else None
+        from langgraph.types import Command
+
+        workflow = _compiled(graph, self.checkpointer)
+        config = _config(item_id)
+        try:
+            if resume is not None:
+                workflow.invoke(Command(resume=resume), config, durability="sync")
+            elif not workflow.get_state(config).values:
+                workflow.invoke(input, config, durability="sync")
+            state = workflow.get_state(config)
+        except Exception as exc:
+            self._finish(item_id, status="failed", error=f"{type(exc).__name__}: {exc}")
+            return None
+        if not state.next:
+            self._finish(
+                item_id, status="done", result=json.dumps(state.values, default=str)
+            )
+            return None
+        return state
+
+    def _pending_requests(self) -> List[dict]:
+        requests = []
+        for item_id, graph, input in self._items():
+            state = self._advance(item_id, graph, json.loads(input))
+            for pending in state.interrupts if state else ():
+                requests.append(
+                    {
+                        "custom_id": _custom_id(item_id, pending.id),
+                        "method": "POST",
+                        "url": ENDPOINT,
+                        "body": pending.value["body"],
+                    }
+                )
+        return requests
+
+    def _apply(self, results: Dict[str, dict]) -> int:
+        """Resume every item whose pending requests all have results; returns how many."""
+        resumed = 0
+        for item_id, graph, input in self._items():
+            state = _compiled(graph, self.checkpointer).get_state(_config(item_id))
+            ids = [p.id for p in state.interrupts]
+            keys = [_custom_id(item_id, i) for i in ids]
+            # items already resumed by an earlier, interrupted _apply have new ids
+            if ids and all(k in results for k in keys):
+                resume = {i: results[k] for i, k in zip(ids, keys)}
+                self._advance(item_id, graph, json.loads(input), resume)
+                resumed += 1
+        return resumed
+
+    def _wait(self, batch_id: str, poll: float) -> str:
+        while (status := self.client.status(batch_id)) not in TERMINAL:
+            time.sleep(poll)
+        return status
+
+    def run(self, poll: float = 60.0, log=print) -> None:
+        """Submit, poll and resume until no item is pending."""
+        rounds = failures = 0
+        while True:
+            in_flight = [
+                b
+                for (b,) in self.conn.execute(
+                    "SELECT id FROM batches WHERE status = 'submitted' ORDER BY submitted_at"
+                )
+            ]
+            if not in_flight:
+                requests = self._pending_requests()
+                if not requests:
+                    return
+                rounds += 1
+                for start in range(0, len(requests), MAX_REQUESTS):
+                    chunk = requests[start : start + MAX_REQUESTS]
+                    batch_id = self.client.create(chunk)
+                    # stored before waiting: a restarted run polls it again
+                    self.conn.execute(
+                        "INSERT INTO batches (id, requests, submitted_at) VALUES (?, ?, ?)",
+                        (batch_id, len(chunk), time.time()),
+                    )
+                    in_flight.append(batch_id)
+                log(
+                    f"round {rounds}: {len(requests)} requests in {len(in_flight)} batches"
+                )
+            results, failed = {}, []
+            for batch_id in in_flight:
+                if self._wait(batch_id, poll) == "failed":
+                    failed.append(batch_id)
+                    continue
+                # expired or cancelled batches still return what finished
+                results.update(self.client.results(batch_id))
+            resumed = self._apply(results)
+            # a failed batch's requests are still pending: the next round
+            # submits them again
+            self.conn.executemany(
+                "UPDATE batches SET status = ?, finished_at = ? WHERE id = ?",
+                [
+                    ("failed" if b in failed else "applied", time.time(), b)
+                    for b in in_flight
+                ],
+            )
+            log(f"  {len(results)} results, {resumed} items resumed")
+            failures = failures + 1 if failed and not results else 0
+            if failures >= MAX_FAILED_ROUNDS:
+                raise RuntimeError(
+                    f"{failures} rounds in a row failed, last: {', '.join(failed)}"
+                )
+
+
+def run(path: str = DATABASE, poll: float = 60.0, client: Optional[BatchClient] = None):
+    """Run every pending item in ``path`` to completion through the batch API."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from chatbot.compact_serde import CompactSerializer
+
+    checkpointer = SqliteSaver(
+        sqlite3.connect(path, timeout=30.0, check_same_thread=False),
+        serde=CompactSerializer(),
+    )
+    BatchRunner(connect(path), checkpointer, client or BatchClient()).run(poll)
+
+
+# ******************************** stub server ****************************************
+def _sample(schema: dict, defs: Dict[str, dict]) -> Any:
+    # a value matching a JSON schema, enough for structured output parsing
+    if "$ref" in schema:
+        return _sample(defs[schema["$ref"].split("/")[-1]], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "anyOf" in schema:
+        return _sample(schema["anyOf"][0], defs)
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: _sample(field, defs)
+            for name, field in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [_sample(schema.get("items", {}), defs)]
+    return {"integer": 7, "number": 7.0, "boolean": True}.get(kind, "stub answer")
+
+
+def stub_completion(body: dict) -> dict:
+    """A ``chat.completion`` for a request body: schema-shaped JSON or canned text."""
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        content = json.dumps(_sample(schema, schema.get("$defs", {})))
+    else:
+        content = "Thank you for your patience. This is a stub reply."
+    prompt_tokens = sum(
+        len(re.findall(r"\w+|[^\w\s]", str(m.get("content")))) for m in body["messages"]
+    )
+    completion_tokens = len(re.findall(r"\w+|[^\w\s]", content))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body["model"],
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class StubBatchServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the files and batches endpoints of the batch API.
+
+    A batch completes ``delay`` seconds after it is created; every request is
+    answered by ``stub_completion``. ``calls`` counts HTTP requests received.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, delay: float = 0.5):
+        super().__init__(address, _StubHandler)
+        self.delay = delay
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, dict] = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def add_file(self, data: bytes, filename: str, purpose: str) -> dict:
+        file_id = f"file-{uuid.uuid4().hex}"
+        self.files[file_id] = data
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def add_batch(self, request: dict) -> dict:
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request["completion_window"],
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self.batches[batch["id"]] = batch
+        threading.Timer(self.delay, self._complete, [batch["id"]]).start()
+        return batch
+
+    def _complete(self, batch_id: str) -> None:
+        with self.lock:
+            batch = self.batches[batch_id]
+            lines = self.files[batch["input_file_id"]].decode().splitlines()
+            output = []
+            for line in filter(None, lines):
+                request = json.loads(line)
+                output.append(
+                    {
+                        "id": f"batch_req_{uuid.uuid4().hex}",
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "request_id": uuid.uuid4().hex,
+                            "body": stub_completion(request["body"]),
+                        },
+                        "error": None,
+                    }
+                )
+            data = "".join(json.dumps(o) + "\n" for o in output).encode()
+            batch["output_file_id"] = self.add_file(
+                data, "output.jsonl", "batch_output"
+            )["id"]
+            batch["request_counts"] = {
+                "total": len(output),
+                "completed": len(output),
+                "failed": 0,
+            }
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: StubBatchServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, payload, status: int = 200, raw: bytes = None) -> None:
+        data = raw if raw is not None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header(
+            "Content-Type", "application/octet-stream" if raw else "application/json"
+        )
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        self.server.calls += 1
+        if self.path.endswith("/files"):
+            # multipart/form-data with "purpose" and "file" fields
+            message = email.parser.BytesParser(policy=email.policy.default).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                + self._body()
+            )
+            fields = {
+                part.get_param("name", header="content-disposition"): part
+                for part in message.iter_parts()
+            }
+            file = fields["file"]
+            self._reply(
+                self.server.add_file(
+                    file.get_payload(decode=True),
+                    file.get_filename(),
+                    fields["purpose"].get_content().strip(),
+                )
+            )
+        elif self.path.endswith("/batches"):
+            self._reply(self.server.add_batch(json.loads(self._body())))
+        else:
+            self._reply({"error": {"message": "not found"}}, 404)
+
+    def do_GET(self):
+        self.server.calls += 1
+        parts = self.path.rstrip("/").split("/")
+        with self.server.lock:
+            if parts[-2] == "batches" and parts[-1] in self.server.batches:
+                self._reply(self.server.batches[parts[-1]])
+            elif parts[-1] == "content" and parts[-2] in self.server.files:
+                self._reply(None, raw=self.server.files[parts[-2]])
+            else:
+                self._reply({"error": {"message": "not found"}}, 404)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="run the graphs through the batch API")
+    parser.add_argument("--db", default=DATABASE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_cmd = commands.add_parser("submit", help="add items")
+    submit_cmd.add_argument("graph", choices=sorted(GRAPHS))
+    source = submit_cmd.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="one input state as JSON")
+    source.add_argument("--input-file", help="JSONL file, one input state per line")
+
+    run_cmd = commands.add_parser("run", help="batch, poll and resume until done")
+    run_cmd.add_argument(
+        "--poll", type=float, default=60.0, help="seconds between polls"
+    )
+
+    results_cmd = commands.add_parser("results", help="finished items as JSONL")
+    results_cmd.add_argument("--graph", choices=sorted(GRAPHS))
+    results_cmd.add_argument(
+        "--failed", action="store_true", help="failed items instead"
+    )
+
+    stub_cmd = commands.add_parser("stub", help="serve a local stub batch API")
+    stub_cmd.add_argument("--port", type=int, default=8099)
+    stub_cmd.add_argument("--delay", type=float, default=0.5)
+
+    args = parser.parse_args()
+    if args.command == "submit":
+        if args.input:
+            inputs = [json.loads(args.input)]
+        else:
+            with open(args.input_file, encoding="utf-8") as f:
+                inputs = [json.loads(line) for line in f if line.strip()]
+        ids = submit(connect(args.db), args.graph, inputs)
+        print(f"added {len(ids)} {args.graph} items ({ids[0]}..{ids[-1]})")
+    elif args.command == "run":
+        run(args.db, args.poll)
+        for graph, module in GRAPHS.items():
+            if module in sys.modules:
+                sys.modules[module].router.report()
+    elif args.command == "results":
+        query = "SELECT id, graph, input, result, error FROM items WHERE status = ?"
+        params = ["failed" if args.failed else "done"]
+        if args.graph:
+            query += " AND graph = ?"
+            params.append(args.graph)
+        for item_id, graph, input, result, error in connect(args.db).execute(
+            query + " ORDER BY id", params
+        ):
+            record = {"id": item_id, "graph": graph, "input": json.loads(input)}
+            if args.failed:
+                record["error"] = error
+            else:
+                record["result"] = json.loads(result)
+            print(json.dumps(record))
+    else:
+        server = StubBatchServer(("127.0.0.1", args.port), args.delay)
+        print(f"stub batch API on http://127.0.0.1:{args.port}/v1")
+        server.serve_forever()
@@ -1,15 +1,11 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated, List
+from functools import lru_cache
+import os
 from langchain_core.messages import BaseMessage
-from langchain_openai.chat_models import ChatOpenAI
+from model_registry import get_chat_model
 
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.graph.message import add_messages  # reducer
-from dotenv import load_dotenv
-
-
-load_dotenv()
-model = ChatOpenAI()
 
 
 class ChatState(TypedDict):
@@ -18,19 +14,54 @@ class ChatState(TypedDict):
 
 def chat_node(state: ChatState):
     messages = state["messages"]
-    response = model.invoke(messages)
+    response = get_chat_model().invoke(messages)
     return {"messages": [response]}
 
 
-checkpointer = InMemorySaver()
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    from bounded_saver import BoundedInMemorySaver
+
+    socket_path = os.getenv("CHATBOT_CHECKPOINT_SOCKET")
+    if socket_path:
+        # threads shared with other processes, see checkpoint_daemon.py
+        from checkpoint_daemon import DaemonCheckpointSaver
+
+        return DaemonCheckpointSaver(socket_path)
+
+    # cold threads are spilled to disk once resident checkpoints pass 256 MB
+    return BoundedInMemorySaver(max_bytes=256 * 1024 * 1024)
+
+
+@lru_cache(maxsize=None)
+def get_chatbot():
+    # the OpenAI client is only created by the first chat_node call
+    from dotenv import load_dotenv
 
-graph = StateGraph(ChatState)
+    load_dotenv()
 
-graph.add_node("chat_node", chat_node)
+    graph = StateGraph(ChatState)
 
-graph.add_edge(START, "chat_node")
-graph.add_edge("chat_node", END)
+    graph.add_node("chat_node", chat_node)
+
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+
+    return graph.compile(checkpointer=get_checkpointer())
+
+
+def __getattr__(name):
+    # `from backend import chatbot` keeps working; the graph is built on first access
+    if name == "chatbot":
+        return get_chatbot()
+    if name == "checkpointer":
+        return get_checkpointer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-chatbot = graph.compile(checkpointer=checkpointer)
 
 # thread_id = 1
+
+
+def latest_checkpoint_id(thread_id):
+    # cheap lookup (no deserialization) used by the frontends as a cache key
+    return get_checkpointer().latest_checkpoint_id(thread_id)
@@ -1,39 +1,164 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated, List
-from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_openai.chat_models import ChatOpenAI
+from functools import lru_cache
+from langchain_core.messages import BaseMessage, HumanMessage, message_chunk_to_message
+from langchain_core.runnables import RunnableConfig
+from model_registry import abort_response, capture_responses, get_chat_model
 
-from langgraph.checkpoint.sqlite import SqliteSaver
 from langgraph.graph.message import add_messages  # reducer
-from dotenv import load_dotenv
+import contextvars
+import os
+import queue
 import sqlite3
+import threading
+import uuid
 
 
-load_dotenv()
-model = ChatOpenAI()
+DATABASE = "chatbot.db"
+# > 1 spreads threads over chatbot-0.db ... chatbot-<N-1>.db, see sharded_saver.py
+SHARDS = int(os.getenv("CHATBOT_SHARDS", "1"))
+# set to share one checkpointer between processes, see checkpoint_daemon.py
+CHECKPOINT_SOCKET = os.getenv("CHATBOT_CHECKPOINT_SOCKET")
+# how often a cancellable reply checks for Stop while the model is silent
+CANCEL_POLL = 0.1
 
 
 class ChatState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
 
 
-def chat_node(state: ChatState):
+def chat_node(state: ChatState, config: RunnableConfig):
+    # the history goes out as is, oldest first: each turn's prompt starts with
+    # the previous turn's prompt, so the provider's prompt cache serves it.
+    # Anything added per call (instructions, retrieved context) belongs after
+    # the history, never ahead of it, see prompt_cache.py
     messages = state["messages"]
-    response = model.invoke(messages)
+    # stream_usage: streamed replies also record their token usage, including
+    # input_token_details["cache_read"]
+    model = get_chat_model(stream_usage=True)
+    cancel_event = config["configurable"].get("cancel_event")
+    if cancel_event is None:
+        response = model.invoke(messages)
+        return {"messages": [response]}
+
+    # cancellable run: the model is read on its own thread so a stalled
+    # stream can't keep Stop waiting for the next token
+    response = None
+    chunks = queue.Queue()
+    opened = []  # httpx responses of this call, to cut off on Stop
+
+    def read_model():
+        with capture_responses(opened):
+            stream = model.stream(messages)
+            try:
+                for chunk in stream:
+                    chunks.put(chunk)
+                    if cancel_event.is_set():
+                        break
+            except Exception as exc:
+                chunks.put(exc)
+            finally:
+                # closing the generator closes the HTTP stream, so the
+                # provider stops generating (and billing) right away
+                stream.close()
+                chunks.put(None)
+
+    # copy the context: it carries the callbacks stream_mode="messages" uses
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(read_model,), daemon=True).start()
+    while True:
+        try:
+            item = chunks.get(timeout=CANCEL_POLL)
+        except queue.Empty:
+            if cancel_event.is_set():
+                # stalled mid-stream: wake the reader, keep what we have
+                for http_response in opened:
+                    abort_response(http_response)
+                break
+            continue
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            if cancel_event.is_set():
+                break  # the aborted read failing, not a provider error
+            raise item
+        response = item if response is None else response + item
+        if cancel_event.is_set():
+            for http_response in opened:
+                abort_response(http_response)
+            break
+    if response is None:
+        return {"messages": []}
+    response = message_chunk_to_message(response)
+    if cancel_event.is_set():
+        response.response_metadata["finish_reason"] = "cancelled"
     return {"messages": [response]}
 
 
-conn = sqlite3.connect(database="chatbot.db", check_same_thread=False)
-checkpointer = SqliteSaver(conn=conn)
+def preload():
+    """
+    Import everything the chatbot needs without opening the database.
+
+    Called before forking service workers so they share the imported modules
+    copy-on-write instead of each importing them on their first request.
+    """
+    import langchain_openai.chat_models  # noqa: F401
+    import dotenv  # noqa: F401
+    import forks  # noqa: F401
+    import compact_serde  # noqa: F401
+
+
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    from forks import ForkableSqliteSaver
+    from compact_serde import CompactSerializer
+
+    if CHECKPOINT_SOCKET:
+        from checkpoint_daemon import DaemonCheckpointSaver
+
+        return DaemonCheckpointSaver(CHECKPOINT_SOCKET)
+
+    if SHARDS > 1:
+        from sharded_saver import ShardedSqliteSaver
+
+        # one file, connection and writer per shard, same features as below
+        return ShardedSqliteSaver.from_path(DATABASE, SHARDS, serde=CompactSerializer())
+
+    conn = sqlite3.connect(database=DATABASE, check_same_thread=False)
+    # reads rows written by the default serializer too, see compact_serde.py
+    # also keeps the full-text index (message_fts) up to date, see search.py,
+    # and supports copy-on-write thread forks, see forks.py
+    return ForkableSqliteSaver(conn=conn, serde=CompactSerializer())
+
+
+@lru_cache(maxsize=None)
+def get_chatbot():
+    # the OpenAI client is only created by the first chat_node call
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    graph = StateGraph(ChatState)
+
+    graph.add_node("chat_node", chat_node)
 
-graph = StateGraph(ChatState)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
 
-graph.add_node("chat_node", chat_node)
+    return graph.compile(checkpointer=get_checkpointer())
 
-graph.add_edge(START, "chat_node")
-graph.add_edge("chat_node", END)
 
-chatbot = graph.compile(checkpointer=checkpointer)
+def __getattr__(name):
+    # `from backend_db import chatbot` keeps working; the database is opened
+    # and the graph built on first access, not at import
+    if name == "chatbot":
+        return get_chatbot()
+    if name == "checkpointer":
+        return get_checkpointer()
+    if name == "conn":
+        return get_checkpointer().conn
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # *************************** Testing code ****************************************
 # thread_id = 1
@@ -44,6 +169,7 @@ chatbot = graph.compile(checkpointer=checkpointer)
 # "messages": [HumanMessage(content="what is my name")]}, config=CONFIG)
 # print(response)'
 def retrieve_all_threads():
+    checkpointer = get_checkpointer()
     all_threads = dict()
     for checkpoint in checkpointer.list(None):
         thread_id = checkpoint.config["configurable"]["thread_id"]
@@ -54,5 +180,90 @@ def retrieve_all_threads():
                     :30
                 ],
             }
+    # forks without a message of their own yet share the parent's checkpoints
+    for thread_id, fork in checkpointer.list_forks().items():
+        if thread_id not in all_threads:
+            parent = all_threads.get(fork["parent_thread_id"])
+            all_threads[thread_id] = {
+                "id": thread_id,
+                "title": (parent["title"] if parent else "New Chat") + " (fork)",
+            }
     # return as list of dicts with default titles
     return [all_threads[thread] for thread in all_threads]
+
+
+def fork_before_message(thread_id, message_index):
+    """
+    Fork ``thread_id`` right before its ``message_index``-th message, e.g. to
+    edit that message and regenerate. The prefix is shared, not copied.
+    """
+    if message_index == 0:
+        return str(uuid.uuid4())
+    checkpointer = get_checkpointer()
+    fork_point = None
+    # SqliteSaver.list holds the connection lock while it yields, so find the
+    # fork point first and fork once the iteration is finished
+    for checkpoint in checkpointer.list(
+        {"configurable": {"thread_id": str(thread_id)}}
+    ):
+        messages = checkpoint.checkpoint["channel_values"].get("messages", [])
+        if len(messages) == message_index:
+            fork_point = checkpoint.config["configurable"]["checkpoint_id"]
+            break
+    if fork_point is not None:
+        return checkpointer.fork(thread_id, fork_point)
+    raise ValueError(
+        f"thread {thread_id!r} has no checkpoint with {message_index} messages"
+    )
+
+
+def search_threads(query, limit=20):
+    # ranked [{"thread_id", "snippet", "score"}] from the full-text index
+    return get_checkpointer().search(query, limit=limit)
+
+
+def latest_checkpoint_id(thread_id):
+    # cheap lookup (no deserialization) used by the frontends as a cache key
+    return get_checkpointer().latest_checkpoint_id(thread_id)
+
+
+def stream_cancellable(user_input, thread_id, cancel_event=None, join_timeout=5.0):
+    """
+    Stream a reply like ``chatbot.stream(..., stream_mode="messages")``, but
+    stop the model as soon as the consumer goes away.
+
+    The graph runs on a worker thread. When this generator is closed early
+    (stop button, Streamlit rerun, closed tab) or ``cancel_event`` is set,
+    ``chat_node`` stops reading the model stream, and the partial reply is
+    checkpointed like a normal one so the thread stays consistent.
+    """
+    cancel_event = cancel_event or threading.Event()
+    events = queue.Queue()
+    config = {"configurable": {"thread_id": thread_id, "cancel_event": cancel_event}}
+
+    chatbot = get_chatbot()
+
+    def run():
+        try:
+            for item in chatbot.stream(
+                input={"messages": HumanMessage(user_input)},
+                config=config,
+                stream_mode="messages",
+            ):
+                events.put(item)
+        except Exception as exc:
+            events.put(exc)
+        finally:
+            events.put(None)
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    try:
+        while (item := events.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancel_event.set()
+        # let the graph write the partial message before the caller reloads it
+        worker.join(timeout=join_timeout)
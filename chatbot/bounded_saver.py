@@ -0,0 +1,322 @@
+"""In-memory checkpointer with a memory ceiling.
+
+``InMemorySaver`` keeps every checkpoint of every thread for the life of the
+process. ``BoundedInMemorySaver`` tracks how many serialized bytes each thread
+holds, and when the total goes over ``max_bytes`` it spills the least recently
+used threads to one file per thread under ``spill_dir``. A spilled thread is
+loaded back transparently the next time it is read or written (``get_state``,
+``stream``, ``get_state_history`` ...), so hot threads stay in RAM and cold
+ones cost nothing but disk. Sizes are the serialized bytes actually held:
+a channel blob is stored (and counted) once per version, however many
+checkpoints of the thread point at it.
+
+    checkpointer = BoundedInMemorySaver(max_bytes=256 * 1024 * 1024)
+    checkpointer.resident_bytes()  # {"thread-1": 18234, ...}
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """
+    ``InMemorySaver`` that evicts cold threads to disk above a memory ceiling.
+
+    Args:
+        max_bytes: Ceiling for the serialized checkpoint bytes kept in memory.
+            The thread being written is never evicted, so a single thread
+            larger than the ceiling stays resident.
+        spill_dir: Directory for evicted threads. Defaults to a fresh
+            temporary directory.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int = 256 * 1024 * 1024,
+        spill_dir: Optional[str] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="checkpoints-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        # thread id -> resident bytes, least recently used first
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._write_sizes: Dict[tuple, int] = {}
+        self._blob_sizes: Dict[tuple, int] = {}
+        # per-thread index into self.writes / self.blobs so eviction is O(thread)
+        self._write_keys: Dict[str, set] = {}
+        self._blob_keys: Dict[str, set] = {}
+        self._spilled: set = set()
+        self._lock = RLock()
+
+    # **************************************** bookkeeping ****************************
+    def _spill_path(self, thread_id: str) -> str:
+        digest = hashlib.sha1(str(thread_id).encode()).hexdigest()
+        return os.path.join(self.spill_dir, f"{digest}.pkl")
+
+    def _touch(self, thread_id: str, delta: int = 0) -> None:
+        self._sizes[thread_id] = self._sizes.get(thread_id, 0) + delta
+        self._sizes.move_to_end(thread_id)
+
+    def _ensure_resident(self, thread_id: str) -> None:
+        if thread_id not in self._spilled:
+            return
+        path = self._spill_path(thread_id)
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        for checkpoint_ns, checkpoints in data["storage"].items():
+            self.storage[thread_id][checkpoint_ns].update(checkpoints)
+        self.writes.update(data["writes"])
+        self.blobs.update(data["blobs"])
+        self._write_keys[thread_id] = set(data["writes"])
+        self._blob_keys[thread_id] = set(data["blobs"])
+        self._write_sizes.update(data["write_sizes"])
+        self._blob_sizes.update((k, len(v[1])) for k, v in data["blobs"].items())
+        self._spilled.discard(thread_id)
+        os.remove(path)
+        self._touch(thread_id, data["size"])
+
+    def _evict(self, thread_id: str) -> None:
+        write_keys = self._write_keys.pop(thread_id, set())
+        blob_keys = self._blob_keys.pop(thread_id, set())
+        data = {
+            "storage": dict(self.storage.pop(thread_id, {})),
+            "writes": {k: self.writes.pop(k) for k in write_keys if k in self.writes},
+            "blobs": {k: self.blobs.pop(k) for k in blob_keys if k in self.blobs},
+            "write_sizes": {
+                k: self._write_sizes.pop(k)
+                for k in write_keys
+                if k in self._write_sizes
+            },
+            "size": self._sizes.pop(thread_id, 0),
+        }
+        for key in blob_keys:
+            self._blob_sizes.pop(key, None)
+        path = self._spill_path(thread_id)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        self._spilled.add(thread_id)
+
+    def _enforce_limit(self, keep: str) -> None:
+        total = sum(self._sizes.values())
+        for thread_id in list(self._sizes):
+            if total <= self.max_bytes:
+                break
+            if thread_id == keep:
+                continue
+            total -= self._sizes[thread_id]
+            self._evict(thread_id)
+
+    def resident_bytes(self, thread_id: Optional[str] = None) -> Dict[str, int]:
+        """Serialized bytes held in memory, per resident thread."""
+        with self._lock:
+            if thread_id is not None:
+                return {thread_id: self._sizes.get(thread_id, 0)}
+            return dict(self._sizes)
+
+    def spilled_threads(self) -> list:
+        with self._lock:
+            return sorted(self._spilled, key=str)
+
+    def latest_checkpoint_id(
+        self, thread_id: str, checkpoint_ns: str = ""
+    ) -> Optional[str]:
+        """Id of the newest checkpoint of a thread, without deserializing it."""
+        thread_id = str(thread_id)
+        with self._lock:
+            if thread_id not in self._sizes and thread_id not in self._spilled:
+                return None
+            self._ensure_resident(thread_id)
+            self._touch(thread_id)
+            checkpoints = self.storage[thread_id].get(checkpoint_ns)
+            return max(checkpoints) if checkpoints else None
+
+    def list_values(
+        self,
+        config: RunnableConfig,
+        channels: Iterable[str],
+        *,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Tuple[RunnableConfig, CheckpointMetadata, Dict[str, Any]]]:
+        """
+        Like ``list``, newest first, but only ``channels`` are deserialized.
+
+        Each channel is stored as its own blob, so skipping the others skips
+        their decoding entirely (``list`` decodes every channel of every
+        checkpoint).
+
+        Yields:
+            tuple: ``(config, metadata, {channel: value})`` per checkpoint.
+        """
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        channels = tuple(channels)
+        before_id = get_checkpoint_id(before) if before else None
+        with self._lock:
+            if thread_id not in self._sizes and thread_id not in self._spilled:
+                return
+            self._ensure_resident(thread_id)
+            self._touch(thread_id)
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            ids = sorted(
+                (i for i in checkpoints if before_id is None or i < before_id),
+                reverse=True,
+            )[:limit]
+            rows = []
+            for checkpoint_id in ids:
+                saved, metadata, _ = checkpoints[checkpoint_id]
+                versions = self.serde.loads_typed(saved)["channel_versions"]
+                blobs = {
+                    channel: self.blobs.get(
+                        (thread_id, checkpoint_ns, channel, versions[channel])
+                    )
+                    for channel in channels
+                    if channel in versions
+                }
+                rows.append((checkpoint_id, metadata, blobs))
+        # decode outside the lock, the stored tuples are immutable
+        for checkpoint_id, metadata, blobs in rows:
+            yield (
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": checkpoint_id,
+                    }
+                },
+                self.serde.loads_typed(metadata),
+                {
+                    channel: self.serde.loads_typed(blob)
+                    for channel, blob in blobs.items()
+                    if blob is not None and blob[0] != "empty"
+                },
+            )
+
+    # **************************************** saver API ******************************
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id not in self._sizes and thread_id not in self._spilled:
+                return None
+            self._ensure_resident(thread_id)
+            self._touch(thread_id)
+            tuple_ = super().get_tuple(config)
+            self._enforce_limit(keep=thread_id)
+            return tuple_
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            thread_ids = [config["configurable"]["thread_id"]]
+        else:
+            with self._lock:
+                thread_ids = [*self._sizes, *self._spilled]
+        for thread_id in thread_ids:
+            if limit is not None and limit <= 0:
+                return
+            with self._lock:
+                if thread_id not in self._sizes and thread_id not in self._spilled:
+                    continue
+                self._ensure_resident(thread_id)
+                self._touch(thread_id)
+                # read the thread under the lock: a concurrent put would
+                # otherwise change its dicts mid-iteration, or evict it
+                thread_config = config or {"configurable": {"thread_id": thread_id}}
+                tuples = list(
+                    super().list(
+                        thread_config, filter=filter, before=before, limit=limit
+                    )
+                )
+                self._enforce_limit(keep=thread_id)
+            if limit is not None:
+                limit -= len(tuples)
+            yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            self._ensure_resident(thread_id)
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            # the same checkpoint can be put again (replays, forks): count the
+            # new bytes instead of adding them to the old ones
+            previous = checkpoints.get(checkpoint["id"])
+            added = -(len(previous[0][1]) + len(previous[1][1])) if previous else 0
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            saved, metadata_b, _ = checkpoints[checkpoint["id"]]
+            added += len(saved[1]) + len(metadata_b[1])
+            blob_keys = self._blob_keys.setdefault(thread_id, set())
+            for key in (
+                (thread_id, checkpoint_ns, k, v) for k, v in new_versions.items()
+            ):
+                size = len(self.blobs[key][1])
+                added += size - self._blob_sizes.get(key, 0)
+                self._blob_sizes[key] = size
+                blob_keys.add(key)
+            self._touch(thread_id, added)
+            self._enforce_limit(keep=thread_id)
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        outer_key = (thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"])
+        with self._lock:
+            self._ensure_resident(thread_id)
+            super().put_writes(config, writes, task_id, task_path)
+            size = sum(len(w[2][1]) for w in self.writes[outer_key].values())
+            delta = size - self._write_sizes.get(outer_key, 0)
+            self._write_sizes[outer_key] = size
+            self._write_keys.setdefault(thread_id, set()).add(outer_key)
+            self._touch(thread_id, delta)
+            self._enforce_limit(keep=thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            if thread_id in self._spilled:
+                os.remove(self._spill_path(thread_id))
+                self._spilled.discard(thread_id)
+            for key in self._blob_keys.pop(thread_id, set()):
+                self.blobs.pop(key, None)
+                self._blob_sizes.pop(key, None)
+            for key in self._write_keys.pop(thread_id, set()):
+                self._write_sizes.pop(key, None)
+            self._sizes.pop(thread_id, None)
+            super().delete_thread(thread_id)
@@ -0,0 +1,339 @@
+"""Streaming bulk export / import of chatbot.db conversations.
+
+    python chatbot/bulk.py export chatbot.db conversations.jsonl.gz
+    python chatbot/bulk.py export chatbot.db conversations.parquet --batch-size 1000
+    python chatbot/bulk.py import conversations.jsonl.gz other.db
+
+Export reads only the latest checkpoint of each thread, ``batch_size``
+threads at a time over its own read connection, and writes each batch
+before reading the next, so memory stays bounded by the batch and not the
+database. One record per thread:
+
+    {"thread_id", "title", "updated_at",
+     "messages": [{"role", "type", "content", "id", "timestamp", "data"}]}
+
+``data`` is the full serialized message (JSON) so import is lossless.
+``timestamp`` is only filled with ``--message-timestamps``. It is the time of
+the checkpoint a message first appeared in, which the search index records
+as messages are written (one indexed lookup per batch, messages a fork
+inherits included). Only threads with messages the index has no time for
+(written before it recorded them, or backfilled) fall back to decoding
+their whole history. Forks that have no
+checkpoint of their own yet (see forks.py) are not exported.
+
+Import writes one checkpoint per thread straight into the checkpoints table
+(and the search index, if the checkpointer keeps one), ``batch_size``
+threads per transaction.
+"""
+
+import argparse
+import gzip
+import json
+import sqlite3
+import time
+from typing import Iterator, List
+
+from langchain_core.messages import (
+    AIMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+from langgraph.checkpoint.base import empty_checkpoint, get_checkpoint_metadata
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from compact_serde import CompactSerializer
+from forks import inherited_messages
+
+
+ROLES = {HumanMessage: "user", AIMessage: "assistant", SystemMessage: "system"}
+
+
+def _role(msg) -> str:
+    for cls, role in ROLES.items():
+        if isinstance(msg, cls):
+            return role
+    return "tool" if isinstance(msg, ToolMessage) else msg.type
+
+
+# message ids per lookup, under SQLite's bound-parameter limit
+ID_CHUNK = 500
+
+
+def _indexed_timestamps(conn, message_ids: list) -> dict:
+    # message id -> first_seen, as recorded by the search index when the
+    # message was written (see search.py); ids are global, so the messages a
+    # fork inherits resolve to when they were written in the parent
+    first_seen = {}
+    for start in range(0, len(message_ids), ID_CHUNK):
+        chunk = message_ids[start : start + ID_CHUNK]
+        try:
+            rows = conn.execute(
+                f"SELECT message_id, first_seen FROM message_fts_indexed WHERE first_seen IS NOT NULL AND message_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+        except sqlite3.OperationalError:
+            # no search index, or one from before first_seen
+            return first_seen
+        first_seen.update(rows)
+    return first_seen
+
+
+def _message_timestamps(conn, serde, thread_id, upto=None) -> dict:
+    # fallback for messages the index has no time for: message id -> ts of
+    # the first checkpoint (up to ``upto``) that contains it, walking the
+    # whole history. A fork's own checkpoints only hold what it added, so
+    # the inherited messages are looked up in the parent up to the fork point
+    try:
+        parent = conn.execute(
+            "SELECT parent_thread_id, parent_checkpoint_id FROM thread_forks WHERE thread_id = ?",
+            (thread_id,),
+        ).fetchone()
+    except sqlite3.OperationalError:
+        parent = None  # database from before forks
+    first_seen = _message_timestamps(conn, serde, *parent) if parent else {}
+    for type_, data in conn.execute(
+        "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+        "AND checkpoint_id <= COALESCE(?, checkpoint_id) ORDER BY checkpoint_id",
+        (thread_id, upto),
+    ):
+        checkpoint = serde.loads_typed((type_, data))
+        for msg in checkpoint["channel_values"].get("messages", []):
+            first_seen.setdefault(msg.id, checkpoint["ts"])
+    return first_seen
+
+
+def iter_conversations(
+    path: str,
+    batch_size: int = 500,
+    message_timestamps: bool = False,
+    serde=None,
+) -> Iterator[List[dict]]:
+    """Yield batches of exported thread records from a chatbot database."""
+    serde = serde or CompactSerializer()
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    threads = conn.execute(
+        "SELECT DISTINCT thread_id FROM checkpoints WHERE checkpoint_ns = ''"
+    )
+    while thread_ids := [row[0] for row in threads.fetchmany(batch_size)]:
+        placeholders = ",".join("?" * len(thread_ids))
+        rows = conn.execute(
+            f"""
+            SELECT thread_id, checkpoint_id, type, checkpoint FROM checkpoints AS c
+            WHERE checkpoint_ns = '' AND thread_id IN ({placeholders})
+              AND checkpoint_id = (
+                  SELECT MAX(checkpoint_id) FROM checkpoints
+                  WHERE thread_id = c.thread_id AND checkpoint_ns = ''
+              )
+            """,
+            thread_ids,
+        ).fetchall()
+        batch = []
+        for thread_id, checkpoint_id, type_, data in rows:
+            checkpoint = serde.loads_typed((type_, data))
+            # forks store only what they added after the fork point
+            messages = inherited_messages(
+                conn, serde, thread_id, checkpoint_id
+            ) + checkpoint["channel_values"].get("messages", [])
+            seen = {}
+            if message_timestamps:
+                ids = [msg.id for msg in messages if msg.id is not None]
+                seen = _indexed_timestamps(conn, ids)
+                if len(seen) < len(ids):
+                    seen = {**_message_timestamps(conn, serde, thread_id), **seen}
+            batch.append(
+                {
+                    "thread_id": thread_id,
+                    "title": messages[0].content[:30] if messages else "",
+                    "updated_at": checkpoint["ts"],
+                    "messages": [
+                        {
+                            "role": _role(msg),
+                            "type": msg.type,
+                            "content": (
+                                msg.content
+                                if isinstance(msg.content, str)
+                                else json.dumps(msg.content)
+                            ),
+                            "id": msg.id,
+                            "timestamp": seen.get(msg.id),
+                            "data": json.dumps(message_to_dict(msg)),
+                        }
+                        for msg in messages
+                    ],
+                }
+            )
+        yield batch
+    conn.close()
+
+
+def _parquet():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "pyarrow is not installed. Please install it with `pip install pyarrow`."
+        ) from None
+    return pa, pq
+
+
+def _parquet_schema(pa):
+    message = pa.struct(
+        [
+            ("role", pa.string()),
+            ("type", pa.string()),
+            ("content", pa.string()),
+            ("id", pa.string()),
+            ("timestamp", pa.string()),
+            ("data", pa.string()),
+        ]
+    )
+    return pa.schema(
+        [
+            ("thread_id", pa.string()),
+            ("title", pa.string()),
+            ("updated_at", pa.string()),
+            ("messages", pa.list_(message)),
+        ]
+    )
+
+
+def export(
+    path: str,
+    out: str,
+    batch_size: int = 500,
+    message_timestamps: bool = False,
+) -> int:
+    """
+    Export the latest state of every thread to ``out``.
+
+    The format follows the extension: ``.parquet`` (one row group per batch)
+    or JSON lines, gzip-compressed when the name ends in ``.gz``.
+
+    Returns:
+        int: Number of exported threads.
+    """
+    batches = iter_conversations(path, batch_size, message_timestamps)
+    count = 0
+    if out.endswith(".parquet"):
+        pa, pq = _parquet()
+        schema = _parquet_schema(pa)
+        with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+            for batch in batches:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                count += len(batch)
+        return count
+
+    opener = gzip.open if out.endswith(".gz") else open
+    with opener(out, "wt", encoding="utf-8") as f:
+        for batch in batches:
+            f.writelines(json.dumps(record) + "\n" for record in batch)
+            count += len(batch)
+    return count
+
+
+def _read_records(path: str, batch_size: int) -> Iterator[List[dict]]:
+    if path.endswith(".parquet"):
+        _, pq = _parquet()
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield record_batch.to_pylist()
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def import_conversations(
+    path: str, checkpointer: SqliteSaver, batch_size: int = 500
+) -> int:
+    """
+    Load exported conversations into ``checkpointer``.
+
+    Each thread gets one checkpoint holding its messages, which is all the
+    chatbot graph needs to continue the conversation. Existing threads with
+    the same id get the imported checkpoint as their newest one.
+
+    Returns:
+        int: Number of imported threads.
+    """
+    from search import IndexedSqliteSaver, index_messages
+
+    count = 0
+    for batch in _read_records(path, batch_size):
+        rows = []
+        indexed = []
+        for record in batch:
+            messages = messages_from_dict(
+                [json.loads(message["data"]) for message in record["messages"]]
+            )
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = {"messages": messages}
+            checkpoint["channel_versions"] = {
+                "messages": checkpointer.get_next_version(None, None)
+            }
+            config = {"configurable": {"thread_id": record["thread_id"]}}
+            metadata = get_checkpoint_metadata(
+                config, {"source": "update", "step": 0, "parents": {}}
+            )
+            rows.append(
+                (
+                    record["thread_id"],
+                    "",
+                    checkpoint["id"],
+                    None,
+                    *checkpointer.serde.dumps_typed(checkpoint),
+                    checkpointer.jsonplus_serde.dumps(metadata),
+                )
+            )
+            indexed.append((record["thread_id"], messages, checkpoint["ts"]))
+        # one transaction per batch
+        with checkpointer.cursor() as cur:
+            cur.executemany(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if isinstance(checkpointer, IndexedSqliteSaver):
+                for thread_id, messages, ts in indexed:
+                    index_messages(cur, thread_id, messages, ts)
+        count += len(batch)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bulk export/import of chatbot.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="db -> .jsonl[.gz] / .parquet")
+    export_cmd.add_argument("db")
+    export_cmd.add_argument("out")
+    export_cmd.add_argument("--batch-size", type=int, default=500)
+    export_cmd.add_argument("--message-timestamps", action="store_true")
+
+    import_cmd = commands.add_parser("import", help=".jsonl[.gz] / .parquet -> db")
+    import_cmd.add_argument("src")
+    import_cmd.add_argument("db")
+    import_cmd.add_argument("--batch-size", type=int, default=500)
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.command == "export":
+        count = export(args.db, args.out, args.batch_size, args.message_timestamps)
+    else:
+        from forks import ForkableSqliteSaver
+
+        conn = sqlite3.connect(args.db, check_same_thread=False)
+        saver = ForkableSqliteSaver(conn, serde=CompactSerializer())
+        count = import_conversations(args.src, saver, args.batch_size)
+        conn.close()
+    print(f"{args.command}ed {count} threads in {time.perf_counter() - start:.1f}s")
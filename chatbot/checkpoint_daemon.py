@@ -0,0 +1,669 @@
+"""Checkpointer daemon shared by several frontend processes over a Unix socket.
+
+    python chatbot/checkpoint_daemon.py serve --socket /tmp/chatbot.sock --db chatbot.db
+    python chatbot/checkpoint_daemon.py serve --socket /tmp/chatbot.sock --memory
+    CHATBOT_CHECKPOINT_SOCKET=/tmp/chatbot.sock streamlit run chatbot/frontend_db.py
+    python chatbot/checkpoint_daemon.py stats --socket /tmp/chatbot.sock
+
+One process owns the storage: a ``ForkableSqliteSaver`` over ``--db``, or a
+``BoundedInMemorySaver`` with ``--memory``, which can now be shared between
+processes. Frontends use ``DaemonCheckpointSaver``, which speaks to it over
+the socket, so there is a single SQLite connection and no file-lock fights.
+
+Protocol: every message is a 4-byte big-endian length followed by a msgpack
+body. Requests are ``[op, args]``, replies ``[ok, result]``. Checkpoints,
+metadata and write values travel as ``serde.dumps_typed`` pairs (compact
+msgpack, see compact_serde.py).
+
+* Writes from all clients go to one writer thread, which applies whatever
+  is queued (up to ``--max-batch``) in a single SQLite transaction and
+  acknowledges each write once the batch is committed (group commit).
+  Reads use a second connection, so they only see committed batches.
+* The latest checkpoint of recently read threads is kept encoded in memory,
+  so the hot path (``get_state`` of an open conversation) is a dict lookup.
+  Entries are invalidated by writes to their thread.
+* ``list`` goes through a server-side cursor: the daemon keeps the store's
+  iterator for each ``list`` call and returns ``page_size`` tuples per round
+  trip, so a long history isn't sent at once and ``list(None)`` sees every
+  thread exactly once. Both stores read in pages without holding their lock
+  between pages, so the caller may use the saver while iterating.
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import random
+import socket
+import socketserver
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import ormsgpack
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_metadata,
+)
+
+from compact_serde import CompactSerializer
+
+
+_HEADER = struct.Struct(">I")
+WRITE_OPS = {"put", "put_writes", "delete_thread", "fork"}
+# open list cursors; beyond this the least recently used (most likely
+# abandoned by a client that stopped iterating) are dropped
+MAX_CURSORS = 1024
+
+
+class DaemonError(Exception):
+    """An operation failed inside the daemon."""
+
+
+# ******************************** wire format ****************************************
+def _send(sock: socket.socket, obj: Any) -> None:
+    body = ormsgpack.packb(obj)
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> Optional[bytes]:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            return None
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv(sock: socket.socket) -> Any:
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    return ormsgpack.unpackb(_recv_exact(sock, size))
+
+
+def _plain(config: Optional[RunnableConfig]) -> Optional[dict]:
+    # only the addressing keys travel; callers also put things like
+    # cancel_event (see backend_db.stream_cancellable) into configurable
+    if config is None:
+        return None
+    return {
+        "configurable": {
+            k: v
+            for k, v in config.get("configurable", {}).items()
+            if isinstance(v, (str, int, float, bool)) or v is None
+        }
+    }
+
+
+def _typed(value: tuple) -> tuple:
+    type_, data = value
+    return type_, data
+
+
+def encode_tuple(item: Optional[CheckpointTuple], serde) -> Optional[bytes]:
+    if item is None:
+        return None
+    return ormsgpack.packb(
+        {
+            "config": _plain(item.config),
+            "checkpoint": serde.dumps_typed(item.checkpoint),
+            "metadata": serde.dumps_typed(item.metadata),
+            "parent_config": _plain(item.parent_config),
+            "pending_writes": [
+                (task_id, channel, serde.dumps_typed(value))
+                for task_id, channel, value in item.pending_writes or []
+            ],
+        }
+    )
+
+
+def decode_tuple(data: Optional[bytes], serde) -> Optional[CheckpointTuple]:
+    if data is None:
+        return None
+    item = ormsgpack.unpackb(data)
+    return CheckpointTuple(
+        config=item["config"],
+        checkpoint=serde.loads_typed(_typed(item["checkpoint"])),
+        metadata=serde.loads_typed(_typed(item["metadata"])),
+        parent_config=item["parent_config"],
+        pending_writes=[
+            (task_id, channel, serde.loads_typed(_typed(value)))
+            for task_id, channel, value in item["pending_writes"]
+        ],
+    )
+
+
+# ******************************** server *********************************************
+class _LatestCache:
+    """Encoded latest checkpoint per thread, LRU, refilled or invalidated by writes."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        # bumped on every invalidation, so a read that raced a write can't
+        # put a stale value back
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, thread_id: str) -> tuple:
+        with self._lock:
+            if thread_id in self._entries:
+                self._entries.move_to_end(thread_id)
+                self.hits += 1
+                return self._entries[thread_id], None
+            self.misses += 1
+            return None, self._versions.get(thread_id, 0)
+
+    def fill(self, thread_id: str, version: int, data: bytes) -> None:
+        with self._lock:
+            if self._versions.get(thread_id, 0) != version:
+                return
+            self._entries[thread_id] = data
+            self._entries.move_to_end(thread_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, thread_id: str) -> None:
+        with self._lock:
+            self._entries.pop(thread_id, None)
+            self._versions[thread_id] = self._versions.get(thread_id, 0) + 1
+
+    def replace(self, thread_id: str, data: bytes) -> None:
+        """The thread's new latest checkpoint, written by the caller."""
+        with self._lock:
+            self._versions[thread_id] = self._versions.get(thread_id, 0) + 1
+            self._entries[thread_id] = data
+            self._entries.move_to_end(thread_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _group_commit_store(conn, serde):
+    from forks import ForkableSqliteSaver
+
+    class GroupCommitSaver(ForkableSqliteSaver):
+        # only the daemon's writer thread writes, so a plain flag is enough
+        _deferred = False
+
+        @contextmanager
+        def cursor(self, transaction: bool = True):
+            with super().cursor(transaction=transaction and not self._deferred) as cur:
+                yield cur
+
+        @contextmanager
+        def group(self):
+            self._deferred = True
+            try:
+                yield
+            except BaseException:
+                with self.lock:
+                    self.conn.rollback()
+                raise
+            else:
+                with self.lock:
+                    self.conn.commit()
+            finally:
+                self._deferred = False
+
+    return GroupCommitSaver(conn, serde=serde)
+
+
+def sqlite_stores(path: str, serde=None) -> tuple:
+    """
+    ``(store, reader)`` for serving the SQLite database at ``path``.
+
+    ``store`` batches the writer thread's writes into one transaction; the
+    handler threads read through ``reader``, a second connection, so they
+    never see a batch that is still being written (and may be rolled back).
+    """
+    from forks import ForkableSqliteSaver
+
+    serde = serde or CompactSerializer()
+    store = _group_commit_store(sqlite3.connect(path, check_same_thread=False), serde)
+    # tables (and WAL mode, so reads don't wait for the writer) come first
+    store.setup()
+    reader = ForkableSqliteSaver(
+        sqlite3.connect(path, check_same_thread=False), serde=serde
+    )
+    return store, reader
+
+
+class CheckpointDaemon:
+    """
+    Serves ``store`` (any checkpointer) to ``DaemonCheckpointSaver`` clients.
+
+    Reads go to ``reader`` when given: the same data over another
+    connection, see ``sqlite_stores``.
+    """
+
+    def __init__(
+        self, store, max_batch: int = 64, cache_entries: int = 4096, reader=None
+    ):
+        self.store = store
+        self.reader = reader if reader is not None else store
+        self.wire = CompactSerializer(compression=None)
+        self.max_batch = max_batch
+        self.cache = _LatestCache(cache_entries)
+        self._cursors: "OrderedDict[int, Iterator[CheckpointTuple]]" = OrderedDict()
+        self._cursor_ids = itertools.count(1)
+        self._cursors_lock = threading.Lock()
+        self._writes: "queue.Queue" = queue.Queue()
+        self.batches = self.batched_writes = 0
+        threading.Thread(target=self._writer, daemon=True).start()
+
+    # reads run on the connection's handler thread
+    def get_tuple(self, config):
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        cacheable = not configurable.get("checkpoint_id") and not configurable.get(
+            "checkpoint_ns"
+        )
+        if cacheable:
+            data, version = self.cache.get(thread_id)
+            if data is not None:
+                return data
+        data = encode_tuple(self.reader.get_tuple(config), self.wire)
+        if cacheable and data is not None:
+            self.cache.fill(thread_id, version, data)
+        return data
+
+    def list(self, config, filter, before, limit, page_size):
+        """Open a cursor over ``store.list(...)``: ``[cursor id, first page]``."""
+        items = self.reader.list(config, filter=filter, before=before, limit=limit)
+        with self._cursors_lock:
+            cursor_id = next(self._cursor_ids)
+            self._cursors[cursor_id] = items
+            while len(self._cursors) > MAX_CURSORS:
+                self._cursors.popitem(last=False)
+        return self.list_next(cursor_id, page_size)
+
+    def list_next(self, cursor_id, page_size):
+        """The next page of a cursor; the cursor id is None after the last one."""
+        with self._cursors_lock:
+            items = self._cursors.get(cursor_id)
+            if items is None:
+                raise KeyError(f"list cursor {cursor_id} is closed or expired")
+            self._cursors.move_to_end(cursor_id)
+        page = [
+            encode_tuple(item, self.wire) for item in itertools.islice(items, page_size)
+        ]
+        if len(page) < page_size:
+            self.list_close(cursor_id)
+            cursor_id = None
+        return [cursor_id, page]
+
+    def list_close(self, cursor_id):
+        with self._cursors_lock:
+            self._cursors.pop(cursor_id, None)
+
+    def latest_checkpoint_id(self, thread_id):
+        return self.reader.latest_checkpoint_id(thread_id)
+
+    # stores without forks or a search index (--memory) have none to report
+    def fork_parent(self, thread_id):
+        if not hasattr(self.reader, "fork_parent"):
+            return None
+        parent = self.reader.fork_parent(thread_id)
+        return list(parent) if parent else None
+
+    def list_forks(self):
+        if not hasattr(self.reader, "list_forks"):
+            return {}
+        return self.reader.list_forks()
+
+    def search(self, query, limit):
+        if not hasattr(self.reader, "search"):
+            return []
+        return self.reader.search(query, limit=limit)
+
+    def thread_stats(self, trace_memory):
+        from checkpoint_stats import thread_stats
+
+        return thread_stats(self.reader, trace_memory)
+
+    def stats(self):
+        return {
+            "cache_entries": len(self.cache._entries),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "batches": self.batches,
+            "batched_writes": self.batched_writes,
+        }
+
+    # writes are applied by the writer thread
+    def _apply(self, op, args):
+        if op == "put":
+            config, checkpoint, metadata, new_versions = args
+            return self.store.put(
+                config,
+                self.wire.loads_typed(_typed(checkpoint)),
+                self.wire.loads_typed(_typed(metadata)),
+                new_versions,
+            )
+        if op == "put_writes":
+            config, writes, task_id, task_path = args
+            writes = [
+                (channel, self.wire.loads_typed(_typed(value)))
+                for channel, value in writes
+            ]
+            return self.store.put_writes(config, writes, task_id, task_path)
+        if op == "delete_thread":
+            return self.store.delete_thread(*args)
+        if op == "fork":
+            if not hasattr(self.store, "fork"):
+                raise NotImplementedError(
+                    f"{type(self.store).__name__} has no forks, serve a --db"
+                )
+            return self.store.fork(*args)
+        raise ValueError(f"unknown write op {op!r}")
+
+    def _put_tuple(self, args, next_config) -> bytes:
+        # what get_tuple returns for a checkpoint just put: the checkpoint as
+        # sent, its stored metadata, and no pending writes yet
+        config, checkpoint, metadata, _ = args
+        metadata = get_checkpoint_metadata(
+            config, self.wire.loads_typed(_typed(metadata))
+        )
+        parent_id = config["configurable"].get("checkpoint_id")
+        return ormsgpack.packb(
+            {
+                "config": _plain(next_config),
+                "checkpoint": checkpoint,
+                "metadata": self.wire.dumps_typed(metadata),
+                "parent_config": (
+                    {
+                        "configurable": {
+                            "thread_id": config["configurable"]["thread_id"],
+                            "checkpoint_ns": "",
+                            "checkpoint_id": parent_id,
+                        }
+                    }
+                    if parent_id
+                    else None
+                ),
+                "pending_writes": [],
+            }
+        )
+
+    def _writer(self):
+        while True:
+            batch = [self._writes.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            results = []
+            group = getattr(self.store, "group", nullcontext)
+            try:
+                with group():
+                    for op, args, _ in batch:
+                        try:
+                            results.append((True, self._apply(op, args)))
+                        except Exception as exc:
+                            results.append((False, exc))
+            except Exception as exc:
+                # the commit itself failed: nothing in the batch was stored
+                results = [(False, exc)] * len(batch)
+            self.batches += 1
+            self.batched_writes += len(batch)
+            for (op, args, future), (ok, result) in zip(batch, results):
+                thread_id = str(
+                    args[0]["configurable"]["thread_id"]
+                    if op.startswith("put")
+                    else args[0]
+                )
+                if (
+                    op == "put"
+                    and ok
+                    and not args[0]["configurable"].get("checkpoint_ns")
+                ):
+                    # the next turn reads exactly this back: keep it hot
+                    self.cache.replace(thread_id, self._put_tuple(args, result))
+                else:
+                    self.cache.invalidate(thread_id)
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+
+    def handle(self, op: str, args: list):
+        if op in WRITE_OPS:
+            future = Future()
+            self._writes.put((op, args, future))
+            return future.result()
+        if op not in (
+            "get_tuple",
+            "list",
+            "list_next",
+            "list_close",
+            "latest_checkpoint_id",
+            "fork_parent",
+            "list_forks",
+            "search",
+            "stats",
+            "thread_stats",
+        ):
+            raise ValueError(f"unknown op {op!r}")
+        return getattr(self, op)(*args)
+
+    def server(self, path: str) -> socketserver.ThreadingUnixStreamServer:
+        """A server for this daemon on the Unix socket ``path``, not started."""
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while (request := _recv(self.request)) is not None:
+                    op, args = request
+                    try:
+                        reply = [True, daemon.handle(op, args)]
+                    except Exception as exc:
+                        reply = [False, f"{type(exc).__name__}: {exc}"]
+                    _send(self.request, reply)
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        server.daemon_threads = True
+        os.chmod(path, 0o600)
+        return server
+
+    def serve(self, path: str) -> None:
+        server = self.server(path)
+        print(f"checkpoint daemon listening on {path}")
+        server.serve_forever()
+
+
+# ******************************** client *********************************************
+class DaemonCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer backed by a ``CheckpointDaemon`` on ``socket_path``.
+
+    Supports the same extras as the daemon's store (``fork``, ``search``,
+    ``latest_checkpoint_id`` ...). Each calling thread gets its own socket.
+    """
+
+    def __init__(self, socket_path: str, page_size: int = 50, timeout: float = 60.0):
+        super().__init__()
+        self.socket_path = socket_path
+        self.page_size = page_size
+        self.timeout = timeout
+        self.wire = CompactSerializer(compression=None)
+        self._local = threading.local()
+
+    def _socket(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _call(self, op: str, *args):
+        sock = self._socket()
+        try:
+            _send(sock, [op, list(args)])
+            reply = _recv(sock)
+        except OSError:
+            # don't reuse a socket that may be out of sync
+            self._local.sock = None
+            sock.close()
+            raise
+        if reply is None:
+            self._local.sock = None
+            raise ConnectionError("checkpoint daemon closed the connection")
+        ok, result = reply
+        if not ok:
+            raise DaemonError(result)
+        return result
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return decode_tuple(self._call("get_tuple", _plain(config)), self.wire)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        cursor, page = self._call(
+            "list", _plain(config), filter, _plain(before), limit, self.page_size
+        )
+        try:
+            while True:
+                for data in page:
+                    yield decode_tuple(data, self.wire)
+                if cursor is None:
+                    return
+                cursor, page = self._call("list_next", cursor, self.page_size)
+        finally:
+            # stopped early: let the daemon drop the iterator now
+            if cursor is not None:
+                try:
+                    self._call("list_close", cursor)
+                except (OSError, DaemonError):
+                    pass
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._call(
+            "put",
+            _plain(config),
+            self.wire.dumps_typed(checkpoint),
+            self.wire.dumps_typed(metadata),
+            dict(new_versions),
+        )
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._call(
+            "put_writes",
+            _plain(config),
+            [(channel, self.wire.dumps_typed(value)) for channel, value in writes],
+            task_id,
+            task_path,
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._call("delete_thread", str(thread_id))
+
+    def get_next_version(self, current, channel) -> str:
+        # same format as SqliteSaver / InMemorySaver
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # extras, served by stores that have them
+    def latest_checkpoint_id(self, thread_id: str) -> Optional[str]:
+        return self._call("latest_checkpoint_id", str(thread_id))
+
+    def fork(
+        self,
+        thread_id: str,
+        checkpoint_id: Optional[str] = None,
+        new_thread_id: Optional[str] = None,
+    ) -> str:
+        return self._call(
+            "fork",
+            str(thread_id),
+            checkpoint_id,
+            None if new_thread_id is None else str(new_thread_id),
+        )
+
+    def fork_parent(self, thread_id: str) -> Optional[tuple]:
+        parent = self._call("fork_parent", str(thread_id))
+        return tuple(parent) if parent else None
+
+    def list_forks(self) -> Dict[str, Dict[str, Any]]:
+        return self._call("list_forks")
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return self._call("search", query, limit)
+
+    def thread_stats(self, trace_memory: bool = False) -> List[Dict[str, Any]]:
+        # measured inside the daemon, see checkpoint_stats.py
+        return self._call("thread_stats", trace_memory)
+
+    def stats(self) -> Dict[str, int]:
+        return self._call("stats")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="shared checkpointer daemon")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = commands.add_parser("serve", help="run the daemon")
+    serve_cmd.add_argument("--socket", required=True)
+    store = serve_cmd.add_mutually_exclusive_group(required=True)
+    store.add_argument("--db", help="SQLite database to own")
+    store.add_argument("--memory", action="store_true", help="in-memory store")
+    serve_cmd.add_argument("--max-batch", type=int, default=64)
+    serve_cmd.add_argument("--cache-entries", type=int, default=4096)
+
+    stats_cmd = commands.add_parser("stats", help="cache and batching counters")
+    stats_cmd.add_argument("--socket", required=True)
+
+    args = parser.parse_args()
+    if args.command == "stats":
+        print(DaemonCheckpointSaver(args.socket).stats())
+    else:
+        if args.memory:
+            from bounded_saver import BoundedInMemorySaver
+
+            store = BoundedInMemorySaver(max_bytes=256 * 1024 * 1024)
+            reader = None
+        else:
+            store, reader = sqlite_stores(args.db)
+        CheckpointDaemon(
+            store, args.max_batch, args.cache_entries, reader=reader
+        ).serve(args.socket)
@@ -0,0 +1,419 @@
+"""Checkpoint size and memory analytics, per thread.
+
+    python chatbot/checkpoint_stats.py chatbot.db                    # largest threads first
+    python chatbot/checkpoint_stats.py chatbot.db --sort turn --top 20
+    python chatbot/checkpoint_stats.py chatbot.db --shards 4 --json  # see sharded_saver.py
+    python chatbot/checkpoint_stats.py --socket /tmp/chatbot.sock    # see checkpoint_daemon.py
+
+    from checkpoint_stats import thread_stats, print_table
+    print_table(thread_stats(backend.get_checkpointer(), trace_memory=True))
+
+One row per thread (root namespace):
+
+    checkpoints     checkpoints stored
+    turns           checkpoints created from user input (``source == "input"``)
+    messages        messages in the latest checkpoint
+    stored_bytes    serialized bytes kept for the thread: checkpoints, metadata,
+                    channel blobs and pending writes
+    latest_bytes    serialized size of the latest state alone
+    turn_bytes      bytes the most recent turn added, i.e. what one more turn
+                    costs now (SqliteSaver stores the whole state at every
+                    step, so this grows with the conversation)
+    resident_bytes  in-memory savers only: RAM held by the saver's entries for
+                    the thread (``None`` for spilled threads, see bounded_saver.py)
+    loaded_bytes    with ``trace_memory``: RAM the latest state takes once
+                    deserialized, measured with tracemalloc, i.e. what a graph
+                    run on the thread holds
+
+Forks (forks.py) only count the checkpoints they wrote themselves, and in
+those only the messages added after the fork point, as that is what they store.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import tracemalloc
+from contextlib import nullcontext
+from itertools import groupby
+from typing import Any, Dict, Iterator, List, Optional
+
+
+SORT_KEYS = {
+    "stored": "stored_bytes",
+    "latest": "latest_bytes",
+    "turn": "turn_bytes",
+    "messages": "messages",
+    "checkpoints": "checkpoints",
+    "resident": "resident_bytes",
+    "loaded": "loaded_bytes",
+}
+
+
+def _message_count(channel_values: dict) -> int:
+    return len(channel_values.get("messages") or [])
+
+
+def _row(thread_id: str, sizes: List[tuple], **extra) -> Dict[str, Any]:
+    # sizes: (bytes, is_input) per checkpoint, oldest first
+    inputs = [i for i, (_, is_input) in enumerate(sizes) if is_input]
+    last_turn = sizes[inputs[-1] :] if inputs else sizes
+    return {
+        "thread_id": thread_id,
+        "checkpoints": len(sizes),
+        "turns": len(inputs),
+        "stored_bytes": sum(size for size, _ in sizes),
+        "turn_bytes": sum(size for size, _ in last_turn),
+        **extra,
+    }
+
+
+class _Tracer:
+    """Traced bytes allocated inside ``with tracer:`` and still alive."""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started = enabled and not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+
+    def __enter__(self):
+        if self.enabled:
+            self.before = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self.bytes = tracemalloc.get_traced_memory()[0] - self.before
+
+    def result(self) -> Optional[int]:
+        return self.bytes if self.enabled else None
+
+    def stop(self) -> None:
+        if self.started:
+            tracemalloc.stop()
+
+
+# ******************************** SQLite savers **************************************
+def _sqlite_path(conn: sqlite3.Connection) -> Optional[str]:
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return path or None
+
+
+def sqlite_stats(
+    conn: sqlite3.Connection, serde, trace_memory: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Per-thread rows for a ``SqliteSaver`` database, one thread at a time.
+
+    Sizes come from SQL (``length()``); only each thread's latest checkpoint
+    is deserialized, to count its messages.
+    """
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    metadata_serde = JsonPlusSerializer()
+    writes = {}
+    for thread_id, checkpoint_id, size in conn.execute(
+        "SELECT thread_id, checkpoint_id, SUM(length(value)) FROM writes "
+        "WHERE checkpoint_ns = '' GROUP BY thread_id, checkpoint_id"
+    ):
+        writes[(thread_id, checkpoint_id)] = size
+    rows = conn.execute(
+        "SELECT thread_id, checkpoint_id, length(checkpoint) + length(metadata), metadata "
+        "FROM checkpoints WHERE checkpoint_ns = '' ORDER BY thread_id, checkpoint_id"
+    )
+    tracer = _Tracer(trace_memory)
+    try:
+        for thread_id, group in groupby(rows, key=lambda row: row[0]):
+            sizes = []
+            for _, checkpoint_id, size, metadata in group:
+                source = (
+                    metadata_serde.loads(metadata).get("source") if metadata else None
+                )
+                sizes.append(
+                    (
+                        size + writes.get((thread_id, checkpoint_id), 0),
+                        source == "input",
+                    )
+                )
+            type_, checkpoint = conn.execute(
+                "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                "AND checkpoint_id = ?",
+                (thread_id, checkpoint_id),
+            ).fetchone()
+            with tracer:
+                state = serde.loads_typed((type_, checkpoint))
+            yield _row(
+                thread_id,
+                sizes,
+                messages=_message_count(state["channel_values"]),
+                latest_bytes=len(checkpoint),
+                resident_bytes=None,
+                loaded_bytes=tracer.result(),
+            )
+            del state
+    finally:
+        tracer.stop()
+
+
+def _saver_sqlite_stats(saver, trace_memory: bool) -> Iterator[Dict[str, Any]]:
+    with saver.lock:
+        path = _sqlite_path(saver.conn)
+    if path is None:
+        # an in-memory database can only be read through the saver's own
+        # connection, which blocks writers for the duration of the scan
+        with saver.cursor(transaction=False) as cur:
+            rows = list(sqlite_stats(cur.connection, saver.serde, trace_memory))
+        yield from rows
+        return
+    # a separate read-only connection, so the saver keeps writing meanwhile
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        yield from sqlite_stats(conn, saver.serde, trace_memory)
+    finally:
+        conn.close()
+
+
+# ******************************** in-memory savers ***********************************
+def _deep_size(obj: Any, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
+
+
+def _memory_thread(
+    thread_id: str,
+    checkpoints: dict,
+    blobs: dict,
+    writes: dict,
+    serde,
+    tracer: _Tracer,
+    resident: bool,
+) -> Dict[str, Any]:
+    # checkpoints: {checkpoint_id: (checkpoint, metadata, parent_id)} as stored
+    # by InMemorySaver, with channel values in ``blobs`` keyed by version
+    sizes = []
+    previous = {}
+    for checkpoint_id in sorted(checkpoints):
+        checkpoint, metadata, _ = checkpoints[checkpoint_id]
+        versions = serde.loads_typed(checkpoint)["channel_versions"]
+        size = len(checkpoint[1]) + len(metadata[1])
+        for channel, version in versions.items():
+            blob = blobs.get((thread_id, "", channel, version))
+            if previous.get(channel) != version and blob is not None:
+                size += len(blob[1])
+        for write in writes.get((thread_id, "", checkpoint_id), {}).values():
+            size += len(write[2][1])
+        source = serde.loads_typed(metadata).get("source")
+        sizes.append((size, source == "input"))
+        previous = versions
+
+    latest = checkpoints[max(checkpoints)]
+    latest_blobs = {
+        channel: blobs[(thread_id, "", channel, version)]
+        for channel, version in previous.items()
+        if (thread_id, "", channel, version) in blobs
+    }
+    with tracer:
+        # InMemorySaver keeps all channel values in blobs
+        values = serde.loads_typed(latest[0]).get("channel_values", {})
+        for channel, blob in latest_blobs.items():
+            if blob[0] != "empty":
+                values[channel] = serde.loads_typed(blob)
+    return _row(
+        thread_id,
+        sizes,
+        messages=_message_count(values),
+        latest_bytes=len(latest[0][1])
+        + sum(len(blob[1]) for blob in latest_blobs.values()),
+        resident_bytes=(
+            _deep_size((checkpoints, blobs, writes), set()) if resident else None
+        ),
+        loaded_bytes=tracer.result(),
+    )
+
+
+def memory_stats(saver, trace_memory: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Per-thread rows for an ``InMemorySaver`` (or ``BoundedInMemorySaver``).
+
+    ``resident_bytes`` walks the saver's own dicts with ``sys.getsizeof``, so
+    it is the RAM the saver holds for the thread, serialized bytes plus
+    container overhead. Spilled threads are read from their spill file and
+    are not made resident.
+    """
+    lock = getattr(saver, "_lock", None) or nullcontext()
+    # one pass under the lock, references only (the stored values are
+    # immutable bytes tuples); sizes are computed with the lock released so
+    # live chat writes aren't held up
+    with lock:
+        checkpoints = {
+            thread_id: dict(namespaces[""])
+            for thread_id, namespaces in saver.storage.items()
+            if namespaces.get("")
+        }
+        blobs: Dict[str, dict] = {}
+        for key, value in saver.blobs.items():
+            blobs.setdefault(key[0], {})[key] = value
+        writes: Dict[str, dict] = {}
+        for key, value in saver.writes.items():
+            writes.setdefault(key[0], {})[key] = value
+        spilled = list(getattr(saver, "_spilled", ()))
+    tracer = _Tracer(trace_memory)
+    try:
+        for thread_id, thread_checkpoints in checkpoints.items():
+            yield _memory_thread(
+                thread_id,
+                thread_checkpoints,
+                blobs.get(thread_id, {}),
+                writes.get(thread_id, {}),
+                saver.serde,
+                tracer,
+                True,
+            )
+        for thread_id in spilled:
+            try:
+                with open(saver._spill_path(thread_id), "rb") as f:
+                    data = pickle.load(f)
+            except FileNotFoundError:
+                # loaded back (or deleted) since we listed it
+                continue
+            spilled_checkpoints = data["storage"].get("", {})
+            if spilled_checkpoints:
+                yield _memory_thread(
+                    thread_id,
+                    spilled_checkpoints,
+                    data["blobs"],
+                    data["writes"],
+                    saver.serde,
+                    tracer,
+                    False,
+                )
+    finally:
+        tracer.stop()
+
+
+# ******************************** any checkpointer ***********************************
+def thread_stats(checkpointer, trace_memory: bool = False) -> List[Dict[str, Any]]:
+    """
+    Per-thread size rows for any of the chatbot's checkpointers.
+
+    Args:
+        checkpointer: A SQLite saver (incl. forks/search), ``ShardedSqliteSaver``,
+            ``InMemorySaver``/``BoundedInMemorySaver`` or ``DaemonCheckpointSaver``.
+        trace_memory: Also measure ``loaded_bytes`` with tracemalloc
+            (started for the call if it is not already tracing).
+
+    Returns:
+        list: One dict per thread, see the module docstring for the fields.
+    """
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    if hasattr(checkpointer, "shards"):
+        return [
+            row
+            for shard in checkpointer.shards
+            for row in thread_stats(shard, trace_memory)
+        ]
+    if hasattr(checkpointer, "socket_path"):
+        return checkpointer.thread_stats(trace_memory)
+    if isinstance(checkpointer, SqliteSaver):
+        return list(_saver_sqlite_stats(checkpointer, trace_memory))
+    if isinstance(checkpointer, InMemorySaver):
+        return list(memory_stats(checkpointer, trace_memory))
+    raise TypeError(f"no stats for {type(checkpointer).__name__}")
+
+
+def totals(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total = {"threads": len(rows)}
+    for key in ["checkpoints", "turns", "messages", "stored_bytes", "latest_bytes"]:
+        total[key] = sum(row[key] for row in rows)
+    for key in ["resident_bytes", "loaded_bytes"]:
+        values = [row[key] for row in rows if row[key] is not None]
+        total[key] = sum(values) if values else None
+    if rows:
+        per_turn = sorted(row["turn_bytes"] for row in rows)
+        total["turn_bytes_p50"] = per_turn[len(per_turn) // 2]
+        total["turn_bytes_max"] = per_turn[-1]
+    return total
+
+
+def _size(value: Optional[int]) -> str:
+    if value is None:
+        return "-"
+    for unit in ["B", "KB", "MB"]:
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+def print_table(rows: List[Dict[str, Any]], top: Optional[int] = None) -> None:
+    """Print ``rows`` (already sorted) and the totals over all of them."""
+    print(
+        f"{'thread':<38} {'ckpts':>6} {'turns':>5} {'msgs':>5} {'stored':>10} "
+        f"{'latest':>10} {'turn':>10} {'resident':>10} {'loaded':>10}"
+    )
+    for row in rows[:top]:
+        print(
+            f"{str(row['thread_id'])[:38]:<38} {row['checkpoints']:>6} {row['turns']:>5} "
+            f"{row['messages']:>5} {_size(row['stored_bytes']):>10} "
+            f"{_size(row['latest_bytes']):>10} {_size(row['turn_bytes']):>10} "
+            f"{_size(row['resident_bytes']):>10} {_size(row['loaded_bytes']):>10}"
+        )
+    total = totals(rows)
+    print(
+        f"\n{total['threads']} threads, {total['checkpoints']} checkpoints, "
+        f"{_size(total['stored_bytes'])} stored, "
+        f"resident {_size(total['resident_bytes'])}, loaded {_size(total['loaded_bytes'])}"
+    )
+    if rows:
+        print(
+            f"bytes per turn now: p50 {_size(total['turn_bytes_p50'])}, "
+            f"max {_size(total['turn_bytes_max'])}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="checkpoint size analytics")
+    parser.add_argument("db", nargs="?", default="chatbot.db")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--socket", help="ask a checkpoint daemon instead")
+    parser.add_argument("--sort", choices=sorted(SORT_KEYS), default="stored")
+    parser.add_argument("--top", type=int, default=20, help="rows in the table")
+    parser.add_argument("--json", action="store_true", help="all rows as JSON")
+    parser.add_argument(
+        "--trace-memory", action="store_true", help="measure loaded_bytes"
+    )
+    args = parser.parse_args()
+
+    if args.socket:
+        from checkpoint_daemon import DaemonCheckpointSaver
+
+        rows = thread_stats(DaemonCheckpointSaver(args.socket), args.trace_memory)
+    else:
+        from compact_serde import CompactSerializer
+        from sharded_saver import shard_paths
+
+        rows = []
+        for path in shard_paths(args.db, args.shards):
+            if not os.path.exists(path):
+                parser.error(f"{path} does not exist")
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            rows.extend(sqlite_stats(conn, CompactSerializer(), args.trace_memory))
+            conn.close()
+    key = SORT_KEYS[args.sort]
+    rows.sort(key=lambda row: row[key] or 0, reverse=True)
+    if args.json:
+        print(json.dumps({"threads": rows, "totals": totals(rows)}, indent=2))
+    else:
+        print_table(rows, args.top)
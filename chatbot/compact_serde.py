@@ -0,0 +1,331 @@
+"""Compact, compressed checkpoint serializer.
+
+``CompactSerializer`` is a drop-in ``serde`` for any checkpointer:
+
+    checkpointer = SqliteSaver(conn=conn, serde=CompactSerializer())
+
+* Messages are packed as ``[type, fields]`` with default-valued fields left
+  out, instead of LangChain's full constructor payload (module path, class
+  name and every empty ``additional_kwargs``/``response_metadata``).
+* Payloads of at least ``threshold`` bytes are compressed with zstd when the
+  ``zstandard`` package is installed, zlib otherwise.
+
+Rows written by the default ``JsonPlusSerializer`` are still readable, so an
+existing ``chatbot.db`` keeps working and can be rewritten in place with
+
+    python chatbot/compact_serde.py migrate chatbot.db
+    python chatbot/compact_serde.py bench [--db chatbot.db]
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Optional, Tuple
+
+import ormsgpack
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    FunctionMessage,
+    HumanMessage,
+    HumanMessageChunk,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+
+COMPACT_TYPE = "cmsgpack"
+EXT_COMPACT_MESSAGE = 64
+
+MESSAGE_CLASSES = {
+    cls.model_fields["type"].default: cls
+    for cls in (
+        HumanMessage,
+        HumanMessageChunk,
+        AIMessage,
+        AIMessageChunk,
+        SystemMessage,
+        ToolMessage,
+        FunctionMessage,
+        RemoveMessage,
+    )
+}
+
+
+# same flags as JsonPlusSerializer: leave these types to the default hook
+OPTION = (
+    ormsgpack.OPT_NON_STR_KEYS
+    | ormsgpack.OPT_PASSTHROUGH_DATACLASS
+    | ormsgpack.OPT_PASSTHROUGH_DATETIME
+    | ormsgpack.OPT_PASSTHROUGH_ENUM
+    | ormsgpack.OPT_PASSTHROUGH_UUID
+)
+
+
+class CompactSerializer(SerializerProtocol):
+    """
+    Serializer with a compact message encoding and threshold compression.
+
+    Everything that isn't a message or a msgpack native goes through
+    ``JsonPlusSerializer``'s public ``dumps_typed``/``loads_typed``; its ext
+    is embedded as is, so the payload is the same as JsonPlus would write for
+    that object.
+
+    Args:
+        compression: ``"zstd"``, ``"zlib"`` or ``None``. Defaults to zstd when
+            available.
+        threshold: Only payloads of at least this many bytes are compressed;
+            small writes aren't worth the CPU.
+        level: Compression level passed to the codec.
+    """
+
+    def __init__(
+        self,
+        compression: Optional[str] = "auto",
+        threshold: int = 512,
+        level: int = 3,
+    ) -> None:
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else "zlib"
+        if compression == "zstd" and zstandard is None:
+            raise ImportError(
+                "zstandard is not installed. Please install it with `pip install zstandard`."
+            )
+        if compression not in ("zstd", "zlib", None):
+            raise ValueError(f"Unknown compression: {compression}")
+        self.compression = compression
+        self.threshold = threshold
+        self.level = level
+        self.fallback = JsonPlusSerializer()
+        # zstd (de)compressor objects must not be shared between threads
+        self._local = threading.local()
+
+    def _zstd(self):
+        local = self._local
+        if not hasattr(local, "compressor"):
+            local.compressor = zstandard.ZstdCompressor(level=self.level)
+            local.decompressor = zstandard.ZstdDecompressor()
+        return local.compressor, local.decompressor
+
+    def _default(self, obj: Any) -> Any:
+        if isinstance(obj, BaseMessage) and MESSAGE_CLASSES.get(obj.type) is type(obj):
+            fields = obj.model_dump(exclude_defaults=True, exclude={"type"})
+            return ormsgpack.Ext(
+                EXT_COMPACT_MESSAGE,
+                ormsgpack.packb(
+                    [obj.type, fields], default=self._default, option=OPTION
+                ),
+            )
+        type_, data = self.fallback.dumps_typed(obj)
+        if type_ != "msgpack":
+            raise TypeError(f"{type(obj).__name__} is not msgpack serializable")
+        # unwrap JsonPlus's document back to its ext, keeping it undecoded
+        return ormsgpack.unpackb(
+            data, ext_hook=ormsgpack.Ext, option=ormsgpack.OPT_NON_STR_KEYS
+        )
+
+    def _ext_hook(self, code: int, data: bytes) -> Any:
+        if code == EXT_COMPACT_MESSAGE:
+            type_, fields = ormsgpack.unpackb(
+                data, ext_hook=self._ext_hook, option=ormsgpack.OPT_NON_STR_KEYS
+            )
+            return MESSAGE_CLASSES[type_](**fields)
+        return self.fallback.loads_typed(
+            ("msgpack", ormsgpack.packb(ormsgpack.Ext(code, data)))
+        )
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.fallback.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.fallback.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            return self.fallback.dumps_typed(obj)
+        try:
+            type_, data = COMPACT_TYPE, ormsgpack.packb(
+                obj, default=self._default, option=OPTION
+            )
+        except ormsgpack.MsgpackEncodeError:
+            type_, data = self.fallback.dumps_typed(obj)
+        if self.compression and len(data) >= self.threshold:
+            if self.compression == "zstd":
+                data = self._zstd()[0].compress(data)
+            else:
+                data = zlib.compress(data, self.level)
+            type_ = f"{type_}+{self.compression}"
+        return type_, data
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, data_ = data
+        if "+" in type_:
+            type_, codec = type_.split("+", 1)
+            if codec == "zstd":
+                if zstandard is None:
+                    raise ImportError(
+                        "zstandard is not installed. Please install it with `pip install zstandard`."
+                    )
+                data_ = self._zstd()[1].decompress(data_)
+            elif codec == "zlib":
+                data_ = zlib.decompress(data_)
+            else:
+                raise NotImplementedError(f"Unknown compression: {codec}")
+        if type_ == COMPACT_TYPE:
+            return ormsgpack.unpackb(
+                data_, ext_hook=self._ext_hook, option=ormsgpack.OPT_NON_STR_KEYS
+            )
+        return self.fallback.loads_typed((type_, data_))
+
+
+# **************************************** migration **********************************
+def migrate(
+    path: str,
+    serde: Optional[SerializerProtocol] = None,
+    batch_size: int = 500,
+    vacuum: bool = True,
+) -> dict:
+    """
+    Re-encode every checkpoint and pending write of a ``SqliteSaver`` database.
+
+    Rows are rewritten in batches of ``batch_size`` per transaction, so the
+    migration can run on a live database; a crash midway leaves a mix of old
+    and new rows, both of which ``CompactSerializer`` reads.
+
+    Returns:
+        dict: Row count and bytes on disk before and after.
+    """
+    serde = serde or CompactSerializer()
+    old_serde = CompactSerializer()  # reads both formats
+    conn = sqlite3.connect(path)
+    before = _payload_bytes(conn)
+    rows = 0
+    for table, column, key in (
+        ("checkpoints", "checkpoint", "thread_id, checkpoint_ns, checkpoint_id"),
+        ("writes", "value", "thread_id, checkpoint_ns, checkpoint_id, task_id, idx"),
+    ):
+        where = " AND ".join(f"{k.strip()} = ?" for k in key.split(","))
+        cur = conn.execute(f"SELECT {key}, type, {column} FROM {table}")
+        while batch := cur.fetchmany(batch_size):
+            updates = []
+            for *pk, type_, value in batch:
+                if value is None:
+                    continue
+                new_type, new_value = serde.dumps_typed(
+                    old_serde.loads_typed((type_, value))
+                )
+                updates.append((new_type, new_value, *pk))
+            with conn:
+                conn.executemany(
+                    f"UPDATE {table} SET type = ?, {column} = ? WHERE {where}",
+                    updates,
+                )
+            rows += len(updates)
+    if vacuum:
+        conn.execute("VACUUM")
+    after = _payload_bytes(conn)
+    conn.close()
+    return {"rows": rows, "bytes_before": before, "bytes_after": after}
+
+
+def _payload_bytes(conn: sqlite3.Connection) -> int:
+    checkpoints = conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(checkpoint)), 0) FROM checkpoints"
+    ).fetchone()[0]
+    writes = conn.execute(
+        "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes"
+    ).fetchone()[0]
+    return checkpoints + writes
+
+
+# **************************************** benchmark **********************************
+def _synthetic_checkpoint(turns: int) -> dict:
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(f"question {i}: " + "how does this work? " * 5))
+        messages.append(
+            AIMessage(
+                f"answer {i}: " + "here is a fairly long explanation. " * 30,
+                response_metadata={
+                    "model_name": "gpt-4o-mini",
+                    "finish_reason": "stop",
+                },
+            )
+        )
+    return {"v": 4, "id": "bench", "channel_values": {"messages": messages}}
+
+
+def benchmark(objs: list, repeat: int = 5) -> None:
+    """Print bytes and encode/decode latency for the default and compact serdes."""
+    candidates = {
+        "jsonplus (default)": JsonPlusSerializer(),
+        "compact": CompactSerializer(compression=None),
+        "compact+zlib": CompactSerializer(compression="zlib"),
+    }
+    if zstandard is not None:
+        candidates["compact+zstd"] = CompactSerializer(compression="zstd")
+    print(f"{'serializer':<20}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}")
+    for name, serde in candidates.items():
+        encode = decode = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            encoded = [serde.dumps_typed(obj) for obj in objs]
+            encode = min(encode, time.perf_counter() - start)
+            start = time.perf_counter()
+            for item in encoded:
+                serde.loads_typed(item)
+            decode = min(decode, time.perf_counter() - start)
+        size = sum(len(data) for _, data in encoded)
+        print(f"{name:<20}{size:>12}{encode * 1000:>12.2f}{decode * 1000:>12.2f}")
+
+
+def _load_db_checkpoints(path: str, limit: int) -> list:
+    serde = CompactSerializer()
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT type, checkpoint FROM checkpoints ORDER BY rowid DESC LIMIT ?",
+        (limit,),
+    ).fetchall()
+    conn.close()
+    return [serde.loads_typed((type_, data)) for type_, data in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_cmd = commands.add_parser("migrate", help="re-encode a chatbot.db in place")
+    migrate_cmd.add_argument("db")
+    migrate_cmd.add_argument("--compression", default="auto")
+    migrate_cmd.add_argument("--batch-size", type=int, default=500)
+
+    bench_cmd = commands.add_parser("bench", help="compare against the default serde")
+    bench_cmd.add_argument("--db", help="benchmark checkpoints from this database")
+    bench_cmd.add_argument("--limit", type=int, default=200)
+    bench_cmd.add_argument("--turns", type=int, default=100)
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        compression = None if args.compression == "none" else args.compression
+        print(
+            migrate(
+                args.db,
+                CompactSerializer(compression=compression),
+                batch_size=args.batch_size,
+            )
+        )
+    elif args.db:
+        benchmark(_load_db_checkpoints(args.db, args.limit))
+    else:
+        benchmark([_synthetic_checkpoint(args.turns)])
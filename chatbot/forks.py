@@ -0,0 +1,378 @@
+"""Copy-on-write conversation forks for the SQLite checkpointer.
+
+``fork()`` creates a new thread by writing a single row to ``thread_forks``
+that points at ``(parent thread, checkpoint id)``. Until the fork gets its
+first own checkpoint, reads of the fork resolve to the parent's checkpoint,
+and its history continues into the parent's history before the fork point.
+Forks of forks resolve recursively.
+
+The fork's own checkpoints don't repeat the inherited conversation either:
+while a checkpoint's ``messages`` still start with the messages at the fork
+point (same ids), only the messages after them are stored, and a
+``fork_deltas`` row records how many were left out. Reads put the parent's
+messages back in front. So a branch costs what it adds, not a copy of the
+conversation it branched off.
+
+    fork_id = checkpointer.fork("thread-1", checkpoint_id)
+    chatbot.invoke({"messages": [HumanMessage("edited question")]},
+                   config={"configurable": {"thread_id": fork_id}})
+
+A parent thread must not be deleted while forks still point at it.
+
+The fork row lives with the fork; the parent may live in another database
+(see ``saver_for`` and sharded_saver.py).
+"""
+
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from search import IndexedSqliteSaver
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thread_forks (
+    thread_id TEXT PRIMARY KEY,
+    parent_thread_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thread_forks_parent ON thread_forks (parent_thread_id);
+CREATE TABLE IF NOT EXISTS fork_deltas (
+    thread_id TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    base_count INTEGER NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_id)
+);
+"""
+# the channel stored as a delta on top of the fork point
+SHARED_CHANNEL = "messages"
+# own checkpoints read per page in list(); SqliteSaver.list holds the saver's
+# lock while it yields, and resolving a delta needs the saver again
+LIST_PAGE = 100
+
+
+def _with_messages(checkpoint: Checkpoint, messages: list) -> Checkpoint:
+    return {
+        **checkpoint,
+        "channel_values": {**checkpoint["channel_values"], SHARED_CHANNEL: messages},
+    }
+
+
+def inherited_messages(
+    conn: sqlite3.Connection, serde, thread_id: str, checkpoint_id: str
+) -> List[Any]:
+    """
+    Messages a stored fork checkpoint leaves out (``[]`` if it isn't a delta).
+
+    Reads the raw tables, for tools that bypass the saver (see bulk.py); the
+    parent must be in the same database.
+    """
+    try:
+        row = conn.execute(
+            "SELECT base_count FROM fork_deltas WHERE thread_id = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_id),
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # database from before fork deltas
+        return []
+    if row is None:
+        return []
+    parent_thread_id, parent_checkpoint_id = conn.execute(
+        "SELECT parent_thread_id, parent_checkpoint_id FROM thread_forks WHERE thread_id = ?",
+        (thread_id,),
+    ).fetchone()
+    type_, data = conn.execute(
+        "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+        "AND checkpoint_id = ?",
+        (parent_thread_id, parent_checkpoint_id),
+    ).fetchone()
+    parent = serde.loads_typed((type_, data))["channel_values"].get(SHARED_CHANNEL, [])
+    base = inherited_messages(conn, serde, parent_thread_id, parent_checkpoint_id)
+    return (base + parent)[: row[0]]
+
+
+class ForkableSqliteSaver(IndexedSqliteSaver):
+    """``IndexedSqliteSaver`` with cheap, structurally shared thread forks."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # fork thread id -> message ids at its fork point (immutable)
+        self._fork_bases: Dict[str, List[str]] = {}
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.executescript(SCHEMA)
+
+    def saver_for(self, thread_id: str) -> "ForkableSqliteSaver":
+        """The saver holding ``thread_id``'s own checkpoints (this one)."""
+        return self
+
+    def fork_parent(self, thread_id: str) -> Optional[tuple]:
+        """``(parent thread id, fork checkpoint id)`` if the thread is a fork."""
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT parent_thread_id, parent_checkpoint_id FROM thread_forks WHERE thread_id = ?",
+                (str(thread_id),),
+            )
+            return cur.fetchone()
+
+    def fork(
+        self,
+        thread_id: str,
+        checkpoint_id: Optional[str] = None,
+        new_thread_id: Optional[str] = None,
+    ) -> str:
+        """
+        Create a thread that starts from ``thread_id`` at ``checkpoint_id``.
+
+        Args:
+            thread_id: Thread to branch off (may itself be a fork).
+            checkpoint_id: Fork point; defaults to the thread's latest checkpoint.
+            new_thread_id: Id for the new thread; a uuid4 by default.
+
+        Returns:
+            str: The new thread id.
+        """
+        configurable = {"thread_id": str(thread_id), "checkpoint_ns": ""}
+        if checkpoint_id is not None:
+            configurable["checkpoint_id"] = checkpoint_id
+        source = self.saver_for(thread_id).get_tuple({"configurable": configurable})
+        if source is None:
+            raise ValueError(f"no checkpoint {checkpoint_id!r} in thread {thread_id!r}")
+        new_thread_id = str(new_thread_id or uuid.uuid4())
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT INTO thread_forks (thread_id, parent_thread_id, parent_checkpoint_id, created_at) VALUES (?, ?, ?, ?)",
+                (
+                    new_thread_id,
+                    str(thread_id),
+                    source.config["configurable"]["checkpoint_id"],
+                    time.time(),
+                ),
+            )
+        return new_thread_id
+
+    def latest_checkpoint_id(self, thread_id: str) -> Optional[str]:
+        """Newest checkpoint id of a thread, without deserializing anything."""
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (str(thread_id),),
+            )
+            row = cur.fetchone()
+        if row:
+            return row[0]
+        # a fork without checkpoints of its own is still at its fork point
+        parent = self.fork_parent(thread_id)
+        return parent[1] if parent else None
+
+    def list_forks(self) -> Dict[str, Dict[str, Any]]:
+        """``{fork thread id: {"parent_thread_id", "parent_checkpoint_id"}}``."""
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT thread_id, parent_thread_id, parent_checkpoint_id FROM thread_forks ORDER BY created_at"
+            )
+            return {
+                thread_id: {
+                    "parent_thread_id": parent_thread_id,
+                    "parent_checkpoint_id": parent_checkpoint_id,
+                }
+                for thread_id, parent_thread_id, parent_checkpoint_id in cur.fetchall()
+            }
+
+    def _fork_base(self, thread_id: str) -> Optional[List[str]]:
+        # message ids at the fork point, None for threads that aren't forks
+        if thread_id in self._fork_bases:
+            return self._fork_bases[thread_id]
+        parent = self.fork_parent(thread_id)
+        if parent is None:
+            return None
+        parent_thread_id, parent_checkpoint_id = parent
+        inherited = self.saver_for(parent_thread_id).get_tuple(
+            {
+                "configurable": {
+                    "thread_id": parent_thread_id,
+                    "checkpoint_ns": "",
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            }
+        )
+        messages = inherited.checkpoint["channel_values"].get(SHARED_CHANNEL) or []
+        ids = [getattr(m, "id", None) for m in messages]
+        # without ids there is no telling whether a prefix is unchanged
+        self._fork_bases[thread_id] = ids if all(ids) else []
+        return self._fork_bases[thread_id]
+
+    def _indexable(self, thread_id: str, messages: list) -> list:
+        # the fork point's messages are indexed under the parent, possibly in
+        # another database (sharded_saver.py) where index_messages can't see
+        # them; leave them out even once the fork is no longer a delta
+        base = self._fork_base(thread_id)
+        if not base:
+            return messages
+        base = set(base)
+        return [m for m in messages or [] if getattr(m, "id", None) not in base]
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        if not config["configurable"].get("checkpoint_ns"):
+            base = self._fork_base(thread_id)
+            messages = checkpoint["channel_values"].get(SHARED_CHANNEL)
+            if (
+                base
+                and isinstance(messages, list)
+                and [getattr(m, "id", None) for m in messages[: len(base)]] == base
+            ):
+                # recorded first: a delta row without its checkpoint is harmless
+                with self.cursor() as cur:
+                    cur.execute(
+                        "INSERT OR REPLACE INTO fork_deltas (thread_id, checkpoint_id, base_count) VALUES (?, ?, ?)",
+                        (thread_id, checkpoint["id"], len(base)),
+                    )
+                checkpoint = _with_messages(checkpoint, messages[len(base) :])
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def _resolve(self, tuple_: CheckpointTuple) -> CheckpointTuple:
+        # a delta-stored fork checkpoint with the fork point's messages put back
+        configurable = tuple_.config["configurable"]
+        if configurable.get("checkpoint_ns"):
+            return tuple_
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT base_count FROM fork_deltas WHERE thread_id = ? AND checkpoint_id = ?",
+                (str(configurable["thread_id"]), configurable["checkpoint_id"]),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return tuple_
+        parent_thread_id, parent_checkpoint_id = self.fork_parent(
+            configurable["thread_id"]
+        )
+        inherited = self.saver_for(parent_thread_id).get_tuple(
+            {
+                "configurable": {
+                    "thread_id": parent_thread_id,
+                    "checkpoint_ns": "",
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            }
+        )
+        base = inherited.checkpoint["channel_values"].get(SHARED_CHANNEL, [])[: row[0]]
+        own = tuple_.checkpoint["channel_values"].get(SHARED_CHANNEL, [])
+        return tuple_._replace(checkpoint=_with_messages(tuple_.checkpoint, base + own))
+
+    def _list_own(self, config, filter, before, limit) -> Iterator[CheckpointTuple]:
+        while limit is None or limit > 0:
+            size = LIST_PAGE if limit is None else min(LIST_PAGE, limit)
+            page = list(super().list(config, filter=filter, before=before, limit=size))
+            for tuple_ in page:
+                yield self._resolve(tuple_)
+            if len(page) < size:
+                return
+            if limit is not None:
+                limit -= len(page)
+            before = page[-1].config
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute(
+                "DELETE FROM fork_deltas WHERE thread_id = ?", (str(thread_id),)
+            )
+            cur.execute(
+                "DELETE FROM thread_forks WHERE thread_id = ?", (str(thread_id),)
+            )
+        self._fork_bases.pop(str(thread_id), None)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        own = super().get_tuple(config)
+        if own is not None:
+            return self._resolve(own)
+        if config["configurable"].get("checkpoint_ns"):
+            return None
+        thread_id = config["configurable"]["thread_id"]
+        parent = self.fork_parent(thread_id)
+        if parent is None:
+            return None
+        parent_thread_id, parent_checkpoint_id = parent
+        # a specific checkpoint id of the fork may live in the parent's history
+        checkpoint_id = get_checkpoint_id(config) or parent_checkpoint_id
+        inherited = self.saver_for(parent_thread_id).get_tuple(
+            {
+                "configurable": {
+                    "thread_id": parent_thread_id,
+                    "checkpoint_ns": "",
+                    "checkpoint_id": checkpoint_id,
+                }
+            }
+        )
+        if inherited is None:
+            return None
+        # seen from the fork: same values, but under the fork's thread id and
+        # without the parent's pending writes (those belong to the parent's run)
+        return inherited._replace(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": "",
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            pending_writes=[],
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        for tuple_ in self._list_own(config, filter, before, limit):
+            if limit is not None:
+                limit -= 1
+            yield tuple_
+        if config is None or (limit is not None and limit <= 0):
+            return
+        if config["configurable"].get("checkpoint_ns"):
+            return
+        parent = self.fork_parent(config["configurable"]["thread_id"])
+        if parent is None:
+            return
+        # continue into the parent's history, up to and including the fork point
+        parent_thread_id, parent_checkpoint_id = parent
+        before_id = get_checkpoint_id(before) if before else None
+        for tuple_ in self.saver_for(parent_thread_id).list(
+            {"configurable": {"thread_id": parent_thread_id}}, filter=filter
+        ):
+            checkpoint_id = tuple_.config["configurable"]["checkpoint_id"]
+            if checkpoint_id > parent_checkpoint_id:
+                continue
+            if before_id is not None and checkpoint_id >= before_id:
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield tuple_
@@ -0,0 +1,78 @@
+"""streamlit run chatbot\frontend_client.py  (needs chatbot/service.py running)"""
+
+import streamlit as st
+from service_client import create_thread, list_threads, get_history, send_message
+
+
+# number of messages rendered per page of history
+PAGE_SIZE = 20
+
+
+# **************************************** utility functions *************************
+def reset_chat():
+    st.session_state["thread_id"] = create_thread()
+    add_thread(st.session_state["thread_id"], title="New Chat")
+    st.session_state["history_window"] = PAGE_SIZE
+
+
+def add_thread(thread_id, title="New Chat"):
+    if thread_id not in [t["id"] for t in st.session_state["chat_threads"]]:
+        st.session_state["chat_threads"].append({"id": thread_id, "title": title})
+
+
+def load_earlier():
+    st.session_state["history_window"] += PAGE_SIZE
+
+
+# **************************************** Session Setup ******************************
+
+if "thread_id" not in st.session_state:
+    st.session_state["thread_id"] = create_thread()
+
+if "history_window" not in st.session_state:
+    st.session_state["history_window"] = PAGE_SIZE
+
+if "chat_threads" not in st.session_state:
+    st.session_state["chat_threads"] = list_threads()
+
+add_thread(st.session_state["thread_id"])
+
+# **************************************** Sidebar UI *********************************
+st.sidebar.title("Chatbot")
+if st.sidebar.button("New Chat"):
+    reset_chat()
+st.sidebar.header("My Conversations")
+
+for idx, thread in enumerate(reversed(st.session_state["chat_threads"])):
+    if st.sidebar.button(thread["title"], key=f"btn_{idx}"):
+        st.session_state["thread_id"] = thread["id"]
+        st.session_state["history_window"] = PAGE_SIZE
+
+# **************************************** Main UI ************************************
+window = st.session_state["history_window"]
+# fetch one extra message to know whether there is anything earlier
+history = get_history(st.session_state["thread_id"], limit=window + 1)
+
+if len(history) > window:
+    st.button("Load earlier messages", on_click=load_earlier)
+
+for message in history[-window:]:
+    with st.chat_message(message["role"]):
+        st.text(message["content"])
+
+user_input = st.chat_input("Type here")
+
+if user_input:
+    for thread in st.session_state["chat_threads"]:
+        if (
+            thread["id"] == st.session_state["thread_id"]
+            and thread["title"] == "New Chat"
+        ):
+            thread["title"] = user_input[:30] + ("..." if len(user_input) > 30 else "")
+    with st.chat_message("user", avatar=None):
+        st.text(user_input)
+
+    # a rerun closes the stream, which makes the service cancel the reply
+    st.button("Stop generating", key="stop_generating")
+    with st.chat_message("assistant"):
+        st.write_stream(send_message(st.session_state["thread_id"], user_input))
@@ -1,14 +1,27 @@
 """streamlit run chatbot\frontend.py"""
 
 import streamlit as st
-from backend_db import chatbot, retrieve_all_threads
+from backend_db import (
+    retrieve_all_threads,
+    search_threads,
+    fork_before_message,
+    latest_checkpoint_id,
+    stream_cancellable,
+)
 from langchain_core.messages import HumanMessage
+from streaming import coalesce_stream
 import uuid
 
 
+# number of messages rendered per page of history
+PAGE_SIZE = 20
+
+
 # **************************************** utility functions *************************
+# thread ids are kept as str everywhere: that is what the checkpointer, search
+# and forks hand back, so session state compares equal to them
 def generate_thread_id():
-    thread_id = uuid.uuid4()
+    thread_id = str(uuid.uuid4())
     return thread_id
 
 
@@ -16,31 +29,70 @@ def reset_chat():
     thread_id = generate_thread_id()
     st.session_state["thread_id"] = thread_id
     add_thread(st.session_state["thread_id"], title="New Chat")
-    st.session_state["message_history"] = []
+    st.session_state["history_window"] = PAGE_SIZE
 
 
 def add_thread(thread_id, title="New Chat"):
+    thread_id = str(thread_id)
     if thread_id not in [t["id"] for t in st.session_state["chat_threads"]]:
         st.session_state["chat_threads"].append({"id": thread_id, "title": title})
 
 
-def load_conversation(thread_id):
-    return chatbot.get_state(
-        config={"configurable": {"thread_id": thread_id}}
-    ).values.get("messages")
+def load_conversation(thread_id, checkpoint_id=None):
+    # imported here: backend_db builds the graph on first access of `chatbot`
+    from backend_db import chatbot
 
+    configurable = {"thread_id": thread_id}
+    if checkpoint_id is not None:
+        configurable["checkpoint_id"] = checkpoint_id
+    return chatbot.get_state(config={"configurable": configurable}).values.get(
+        "messages"
+    )
 
-# **************************************** Session Setup ******************************
 
-if "message_history" not in st.session_state:
-    st.session_state["message_history"] = []
+@st.cache_data(max_entries=64, show_spinner=False)
+def conversation_view(thread_id, checkpoint_id):
+    # a checkpoint never changes once written, so (thread, checkpoint) is a
+    # stable key: switching back to a thread is a cache hit, not a deserialize
+    if checkpoint_id is None:
+        return []
+    messages = load_conversation(thread_id, checkpoint_id) or []
+    return [
+        {
+            "role": "user" if isinstance(msg, HumanMessage) else "assistant",
+            "content": msg.content,
+        }
+        for msg in messages
+    ]
+
+
+def load_earlier():
+    st.session_state["history_window"] += PAGE_SIZE
+
+
+def edit_message(message_index):
+    # branch off right before the edited message and send the new text there;
+    # the original conversation is kept as it was
+    thread_id = str(fork_before_message(st.session_state["thread_id"], message_index))
+    add_thread(thread_id, title="New Chat")
+    st.session_state["thread_id"] = thread_id
+    st.session_state["history_window"] = PAGE_SIZE
+    st.session_state["pending_input"] = st.session_state[f"edit_{message_index}"]
+
+
+# **************************************** Session Setup ******************************
 
 if "thread_id" not in st.session_state:
     st.session_state["thread_id"] = generate_thread_id()
 
+if "history_window" not in st.session_state:
+    st.session_state["history_window"] = PAGE_SIZE
+
 if "chat_threads" not in st.session_state:
     all_threads = retrieve_all_threads()
-    st.session_state["chat_threads"] = all_threads
+    st.session_state["chat_threads"] = [
+        {**thread, "id": str(thread["id"])} for thread in all_threads
+    ]
 
 add_thread(st.session_state["thread_id"])
 
@@ -48,27 +100,55 @@ add_thread(st.session_state["thread_id"])
 st.sidebar.title("Chatbot")
 if st.sidebar.button("New Chat"):
     reset_chat()
+
+query = st.sidebar.text_input("Search conversations")
+if query:
+    titles = {t["id"]: t["title"] for t in st.session_state["chat_threads"]}
+    for result in search_threads(query):
+        thread_id = str(result["thread_id"])
+        label = titles.get(thread_id, thread_id[:30])
+        if st.sidebar.button(label, key=f"search_{thread_id}", help=result["snippet"]):
+            add_thread(thread_id, title=label)
+            st.session_state["thread_id"] = thread_id
+            st.session_state["history_window"] = PAGE_SIZE
+        st.sidebar.caption(result["snippet"])
+
 st.sidebar.header("My Conversations")
 
 for idx, thread in enumerate(reversed(st.session_state["chat_threads"])):
     if st.sidebar.button(thread["title"], key=f"btn_{idx}"):
         st.session_state["thread_id"] = thread["id"]
-        messages = load_conversation(thread_id=thread["id"])
-
-        temp_msgs = []
-        if messages:
-            for msg in messages:
-                role = "user" if isinstance(msg, HumanMessage) else "assistant"
-                temp_msgs.append({"role": role, "content": msg.content})
-        st.session_state["message_history"] = temp_msgs
+        st.session_state["history_window"] = PAGE_SIZE
 
 # **************************************** Main UI ************************************
-# loading the conversation history
-for message in st.session_state["message_history"]:
+# loading the conversation history: only the most recent window is rendered
+thread_id = st.session_state["thread_id"]
+history = conversation_view(thread_id, latest_checkpoint_id(thread_id))
+window = st.session_state["history_window"]
+
+if len(history) > window:
+    st.button(
+        f"Load earlier messages ({len(history) - window} more)",
+        on_click=load_earlier,
+    )
+
+first_shown = max(len(history) - window, 0)
+for message_index, message in enumerate(history[first_shown:], start=first_shown):
     with st.chat_message(message["role"]):
         st.text(message["content"])
-
-user_input = st.chat_input("Type here")
+        if message["role"] == "user":
+            with st.popover("Edit"):
+                st.text_area(
+                    "Edit message", message["content"], key=f"edit_{message_index}"
+                )
+                st.button(
+                    "Regenerate from here",
+                    key=f"regenerate_{message_index}",
+                    on_click=edit_message,
+                    args=(message_index,),
+                )
+
+user_input = st.chat_input("Type here") or st.session_state.pop("pending_input", None)
 
 if user_input:
     for thread in st.session_state["chat_threads"]:
@@ -77,22 +157,17 @@ if user_input:
             and thread["title"] == "New Chat"
         ):
             thread["title"] = user_input[:30] + ("..." if len(user_input) > 30 else "")
-    # add the message to message_history
-    st.session_state["message_history"].append({"role": "user", "content": user_input})
+    # the new turn is persisted by the checkpointer and picked up by
+    # conversation_view on the next rerun
     with st.chat_message("user", avatar=None):
         st.text(user_input)
 
-    CONFIG = {"configurable": {"thread_id": st.session_state["thread_id"]}}
-    # add the message to message_history
+    # clicking stop reruns the script, which closes the stream below; the
+    # model is cancelled and the partial reply is kept in the checkpoint
+    st.button("Stop generating", key="stop_generating")
     with st.chat_message("assistant"):
-        ai_message = st.write_stream(
-            message_chunk.content
-            for message_chunk, metadata in chatbot.stream(
-                input={"messages": HumanMessage(user_input)},
-                config=CONFIG,
-                stream_mode="messages",
+        st.write_stream(
+            coalesce_stream(
+                stream_cancellable(user_input, st.session_state["thread_id"])
             )
         )
-    st.session_state["message_history"].append(
-        {"role": "assistant", "content": ai_message}
-    )
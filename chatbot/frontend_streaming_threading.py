@@ -1,11 +1,16 @@
 """streamlit run chatbot\frontend.py"""
 
 import streamlit as st
-from backend import chatbot
+from backend import chatbot, latest_checkpoint_id
 from langchain_core.messages import HumanMessage
+from streaming import coalesce_stream
 import uuid
 
 
+# number of messages rendered per page of history
+PAGE_SIZE = 20
+
+
 # **************************************** utility functions *************************
 def generate_thread_id():
     thread_id = uuid.uuid4()
@@ -16,7 +21,7 @@ def reset_chat():
     thread_id = generate_thread_id()
     st.session_state["thread_id"] = thread_id
     add_thread(st.session_state["thread_id"], title="New Chat")
-    st.session_state["message_history"] = []
+    st.session_state["history_window"] = PAGE_SIZE
 
 
 def add_thread(thread_id, title="New Chat"):
@@ -24,19 +29,43 @@ def add_thread(thread_id, title="New Chat"):
         st.session_state["chat_threads"].append({"id": thread_id, "title": title})
 
 
-def load_conversation(thread_id):
-    return chatbot.get_state(
-        config={"configurable": {"thread_id": thread_id}}
-    ).values.get("messages")
+def load_conversation(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id}
+    if checkpoint_id is not None:
+        configurable["checkpoint_id"] = checkpoint_id
+    return chatbot.get_state(config={"configurable": configurable}).values.get(
+        "messages"
+    )
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def conversation_view(thread_id, checkpoint_id):
+    # a checkpoint never changes once written, so (thread, checkpoint) is a
+    # stable key: switching back to a thread is a cache hit, not a deserialize
+    if checkpoint_id is None:
+        return []
+    messages = load_conversation(thread_id, checkpoint_id) or []
+    return [
+        {
+            "role": "user" if isinstance(msg, HumanMessage) else "assistant",
+            "content": msg.content,
+        }
+        for msg in messages
+    ]
+
+
+def load_earlier():
+    st.session_state["history_window"] += PAGE_SIZE
 
 
 # **************************************** Session Setup ******************************
 
-if "message_history" not in st.session_state:
-    st.session_state["message_history"] = []
 if "thread_id" not in st.session_state:
     st.session_state["thread_id"] = generate_thread_id()
 
+if "history_window" not in st.session_state:
+    st.session_state["history_window"] = PAGE_SIZE
+
 if "chat_threads" not in st.session_state:
     st.session_state["chat_threads"] = []
 
@@ -51,18 +80,21 @@ st.sidebar.header("My Conversations")
 for idx, thread in enumerate(reversed(st.session_state["chat_threads"])):
     if st.sidebar.button(thread["title"], key=f"btn_{idx}"):
         st.session_state["thread_id"] = thread["id"]
-        messages = load_conversation(thread_id=thread["id"])
-
-        temp_msgs = []
-        if messages:
-            for msg in messages:
-                role = "user" if isinstance(msg, HumanMessage) else "assistant"
-                temp_msgs.append({"role": role, "content": msg.content})
-        st.session_state["message_history"] = temp_msgs
+        st.session_state["history_window"] = PAGE_SIZE
 
 # **************************************** Main UI ************************************
-# loading the conversation history
-for message in st.session_state["message_history"]:
+# loading the conversation history: only the most recent window is rendered
+thread_id = st.session_state["thread_id"]
+history = conversation_view(thread_id, latest_checkpoint_id(thread_id))
+window = st.session_state["history_window"]
+
+if len(history) > window:
+    st.button(
+        f"Load earlier messages ({len(history) - window} more)",
+        on_click=load_earlier,
+    )
+
+for message in history[-window:]:
     with st.chat_message(message["role"]):
         st.text(message["content"])
 
@@ -75,22 +107,19 @@ if user_input:
             and thread["title"] == "New Chat"
         ):
             thread["title"] = user_input[:30] + ("..." if len(user_input) > 30 else "")
-    # add the message to message_history
-    st.session_state["message_history"].append({"role": "user", "content": user_input})
+    # the new turn is persisted by the checkpointer and picked up by
+    # conversation_view on the next rerun
     with st.chat_message("user", avatar=None):
         st.text(user_input)
 
     CONFIG = {"configurable": {"thread_id": st.session_state["thread_id"]}}
-    # add the message to message_history
     with st.chat_message("assistant"):
-        ai_message = st.write_stream(
-            message_chunk.content
-            for message_chunk, metadata in chatbot.stream(
-                input={"messages": HumanMessage(user_input)},
-                config=CONFIG,
-                stream_mode="messages",
+        st.write_stream(
+            coalesce_stream(
+                chatbot.stream(
+                    input={"messages": HumanMessage(user_input)},
+                    config=CONFIG,
+                    stream_mode="messages",
+                )
             )
         )
-    st.session_state["message_history"].append(
-        {"role": "assistant", "content": ai_message}
-    )
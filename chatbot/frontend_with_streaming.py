@@ -3,6 +3,7 @@
 import streamlit as st
 from backend import chatbot
 from langchain_core.messages import HumanMessage
+from streaming import coalesce_stream
 
 
 CONFIG = {"configurable": {"thread_id": "thread-1"}}
@@ -25,11 +26,12 @@ if user_input:
     # add the message to message_history
     with st.chat_message("assistant"):
         ai_message = st.write_stream(
-            message_chunk.content
-            for message_chunk, metadata in chatbot.stream(
-                input={"messages": HumanMessage(user_input)},
-                config=CONFIG,
-                stream_mode="messages",
+            coalesce_stream(
+                chatbot.stream(
+                    input={"messages": HumanMessage(user_input)},
+                    config=CONFIG,
+                    stream_mode="messages",
+                )
             )
         )
     st.session_state["message_history"].append(
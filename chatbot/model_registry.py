@@ -0,0 +1,195 @@
+"""Shared, lazily constructed chat model clients.
+
+    from chatbot.model_registry import get_chat_model   # numbered scripts
+    from model_registry import get_chat_model           # inside chatbot/
+
+Both imports return the same module object (it registers itself under both
+names), so a process has one model cache and one set of connection pools
+however it reached the registry.
+
+    model = get_chat_model("gpt-4o-mini")
+
+Every call with the same model config returns the same ``ChatOpenAI``
+instance, built on first use. All instances share one keep-alive HTTP
+connection pool for sync calls, and one per event loop for async calls
+(pooled connections are bound to the loop that opened them, and Streamlit
+and tornado reruns may run on a new loop), so nodes don't each open their
+own connections and TLS sessions. ``warm_up()`` pre-opens sync pool
+connections at startup so the first real request skips the handshake.
+``capture_responses()`` / ``abort_response()`` let another thread cut off a
+sync streaming response that has stalled.
+"""
+
+import os
+import socket
+import sys
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Lock, local
+from typing import Any, Dict, List, Optional
+
+
+# tuned for a handful of parallel graph branches per process
+POOL_LIMITS = {
+    "max_connections": 64,
+    "max_keepalive_connections": 16,
+    "keepalive_expiry": 120.0,
+}
+TIMEOUT = 60.0
+
+_models: Dict[tuple, Any] = {}
+_http_client = None
+_http_async_client = None
+_lock = Lock()
+# one module, whichever of the two names imported it first
+for _name in ("model_registry", "chatbot.model_registry"):
+    sys.modules.setdefault(_name, sys.modules[__name__])
+# per thread: where to record the responses it opens, see capture_responses
+_capture = local()
+
+
+def base_url() -> str:
+    return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+
+def http_clients():
+    """The shared ``(httpx.Client, httpx.AsyncClient)`` pair, created on first use."""
+    global _http_client, _http_async_client
+    with _lock:
+        if _http_client is None:
+            import httpx
+
+            limits = httpx.Limits(**POOL_LIMITS)
+            _http_client = httpx.Client(
+                limits=limits,
+                timeout=TIMEOUT,
+                event_hooks={"response": [_record_response]},
+            )
+            _http_async_client = httpx.AsyncClient(
+                transport=_per_loop_transport(httpx, limits), timeout=TIMEOUT
+            )
+        return _http_client, _http_async_client
+
+
+def _per_loop_transport(httpx, limits):
+    import asyncio
+
+    class PerLoopTransport(httpx.AsyncBaseTransport):
+        """Sends each request through a connection pool of the running loop."""
+
+        def __init__(self):
+            self.transports = weakref.WeakKeyDictionary()
+
+        def _transport(self):
+            loop = asyncio.get_running_loop()
+            with _lock:
+                transport = self.transports.get(loop)
+                if transport is None:
+                    transport = httpx.AsyncHTTPTransport(limits=limits)
+                    self.transports[loop] = transport
+                return transport
+
+        async def handle_async_request(self, request):
+            return await self._transport().handle_async_request(request)
+
+        async def aclose(self):
+            loop = asyncio.get_running_loop()
+            with _lock:
+                transport = self.transports.pop(loop, None)
+            if transport is not None:
+                await transport.aclose()
+
+    return PerLoopTransport()
+
+
+def _record_response(response) -> None:
+    # runs in the requesting thread once the headers are in, before the body
+    sink = getattr(_capture, "sink", None)
+    if sink is not None:
+        sink.append(response)
+
+
+@contextmanager
+def capture_responses(sink: List[Any]):
+    """Append the responses of the sync client's requests made by this thread
+    (inside the ``with``) to ``sink``, so another thread can abort them."""
+    _capture.sink = sink
+    try:
+        yield sink
+    finally:
+        _capture.sink = None
+
+
+def abort_response(response) -> None:
+    """
+    Cut off a streaming response from another thread.
+
+    Closing the response would not wake a thread blocked reading it, so the
+    socket is shut down instead: the pending read returns right away and the
+    reader's own cleanup closes the response.
+    """
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # already closed
+
+
+def _key(model: Optional[str], kwargs: Dict[str, Any]) -> tuple:
+    return (model, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+
+def get_chat_model(model: Optional[str] = None, **kwargs: Any):
+    """
+    Shared ``ChatOpenAI`` for this model config.
+
+    Args:
+        model: Model name; ``None`` uses the ``ChatOpenAI`` default.
+        **kwargs: Any other ``ChatOpenAI`` argument (temperature, ...). Part
+            of the cache key, so different settings get different instances.
+    """
+    key = _key(model, kwargs)
+    if key in _models:
+        return _models[key]
+    http_client, http_async_client = http_clients()
+    with _lock:
+        if key not in _models:
+            from langchain_openai.chat_models import ChatOpenAI
+
+            if model is not None:
+                kwargs["model"] = model
+            _models[key] = ChatOpenAI(
+                http_client=http_client,
+                http_async_client=http_async_client,
+                **kwargs,
+            )
+        return _models[key]
+
+
+def warm_up(connections: int = 4, url: Optional[str] = None) -> int:
+    """
+    Open ``connections`` keep-alive connections to the provider up front.
+
+    Sends cheap concurrent ``HEAD`` requests so TCP and TLS setup happen at
+    startup instead of on the first user request. Failures are ignored: a
+    cold pool is slower, not broken.
+
+    Returns:
+        int: Number of requests that reached the server.
+    """
+    http_client, _ = http_clients()
+    url = url or base_url()
+
+    def ping(_):
+        try:
+            http_client.head(url, timeout=5.0)
+            return 1
+        except Exception:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        return sum(pool.map(ping, range(connections)))
@@ -0,0 +1,246 @@
+"""Full-text search over chatbot conversations (SQLite FTS5).
+
+``IndexedSqliteSaver`` is a ``SqliteSaver`` that also indexes every new
+message into an FTS5 table in the same database as checkpoints are written.
+Only messages not indexed yet are added, so a write costs O(new messages),
+not O(conversation).
+
+    python chatbot/search.py backfill chatbot.db    # index existing threads
+    python chatbot/search.py search chatbot.db "login freeze"
+"""
+
+import argparse
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+    content,
+    thread_id UNINDEXED,
+    message_id UNINDEXED,
+    role UNINDEXED,
+    tokenize = 'porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS message_fts_indexed (
+    thread_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    -- ts of the checkpoint the message first appeared in (NULL if unknown)
+    first_seen TEXT,
+    PRIMARY KEY (thread_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS message_fts_indexed_message
+    ON message_fts_indexed (message_id);
+"""
+
+
+def setup(conn: sqlite3.Connection) -> None:
+    conn.executescript(SCHEMA)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(message_fts_indexed)")}
+    if "first_seen" not in columns:
+        # index from before first_seen
+        conn.execute("ALTER TABLE message_fts_indexed ADD COLUMN first_seen TEXT")
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    # multi-part content: keep the text parts
+    return " ".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content or []
+    )
+
+
+def index_messages(
+    cur: sqlite3.Cursor, thread_id: str, messages: list, ts: Optional[str] = None
+) -> int:
+    """
+    Index the messages of ``thread_id`` that are not in the index yet.
+
+    Messages are appended to a thread, so walking backwards stops at the
+    first message that is already indexed. ``ts`` is the timestamp of the
+    checkpoint being written, recorded as the new messages' ``first_seen``.
+    """
+    new = []
+    for msg in reversed(messages or []):
+        if msg.id is None:
+            continue
+        # message ids are global, so messages a forked thread shares with its
+        # parent are only indexed once (under the parent)
+        cur.execute(
+            "SELECT 1 FROM message_fts_indexed WHERE message_id = ? LIMIT 1",
+            (msg.id,),
+        )
+        if cur.fetchone():
+            break
+        new.append(msg)
+    for msg in reversed(new):
+        content = _text(msg.content)
+        cur.execute(
+            "INSERT INTO message_fts_indexed (thread_id, message_id, first_seen) VALUES (?, ?, ?)",
+            (thread_id, msg.id, ts),
+        )
+        if content:
+            cur.execute(
+                "INSERT INTO message_fts (content, thread_id, message_id, role) VALUES (?, ?, ?, ?)",
+                (
+                    content,
+                    thread_id,
+                    msg.id,
+                    "user" if isinstance(msg, HumanMessage) else "assistant",
+                ),
+            )
+    return len(new)
+
+
+class IndexedSqliteSaver(SqliteSaver):
+    """``SqliteSaver`` that keeps the ``message_fts`` index up to date."""
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        setup(self.conn)
+
+    def _indexable(self, thread_id: str, messages: list) -> list:
+        """The messages of a checkpoint being written that may be indexed."""
+        return messages
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        if "messages" in new_versions and not config["configurable"].get(
+            "checkpoint_ns"
+        ):
+            thread_id = str(config["configurable"]["thread_id"])
+            messages = self._indexable(
+                thread_id, checkpoint["channel_values"].get("messages")
+            )
+            with self.cursor() as cur:
+                index_messages(cur, thread_id, messages, checkpoint["ts"])
+        return next_config
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """``search()`` over this saver's database, under its lock."""
+        with self.cursor(transaction=False):
+            return search(self.conn, query, limit=limit)
+
+
+def _match_query(query: str) -> str:
+    # quote every term so user input can't break the FTS5 query syntax
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    return " ".join(terms)
+
+
+def search(
+    conn: sqlite3.Connection, query: str, limit: int = 20, max_hits: int = 1000
+) -> List[Dict[str, Any]]:
+    """
+    Ranked thread ids matching ``query``, best match first.
+
+    Returns:
+        list: ``{"thread_id", "snippet", "score"}`` dicts, one per thread, where
+        ``snippet`` is the best matching message with hits wrapped in ``[...]``.
+    """
+    match = _match_query(query)
+    if not match:
+        return []
+    rows = conn.execute(
+        """
+        WITH hits AS (
+            SELECT thread_id,
+                   snippet(message_fts, 0, '[', ']', '...', 12) AS snippet,
+                   rank
+            FROM message_fts
+            WHERE message_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        )
+        SELECT thread_id, snippet, MIN(rank) AS score
+        FROM hits
+        GROUP BY thread_id
+        ORDER BY score
+        LIMIT ?
+        """,
+        (match, max_hits, limit),
+    ).fetchall()
+    return [
+        {"thread_id": thread_id, "snippet": snippet, "score": score}
+        for thread_id, snippet, score in rows
+    ]
+
+
+def backfill(
+    checkpointer: SqliteSaver, batch_size: int = 200, verbose: bool = False
+) -> int:
+    """
+    Index the latest checkpoint of every thread, committing per batch.
+
+    Backfilled messages get no ``first_seen``: the latest checkpoint doesn't
+    say when each message arrived.
+    """
+    checkpointer.setup()
+    setup(checkpointer.conn)
+    thread_ids = [
+        row[0]
+        for row in checkpointer.conn.execute(
+            "SELECT DISTINCT thread_id FROM checkpoints WHERE checkpoint_ns = ''"
+        )
+    ]
+    indexed = 0
+    for start in range(0, len(thread_ids), batch_size):
+        batch = []
+        for thread_id in thread_ids[start : start + batch_size]:
+            latest = checkpointer.get_tuple({"configurable": {"thread_id": thread_id}})
+            if latest is not None:
+                batch.append(
+                    (thread_id, latest.checkpoint["channel_values"].get("messages"))
+                )
+        with checkpointer.cursor() as cur:
+            for thread_id, messages in batch:
+                indexed += index_messages(cur, thread_id, messages)
+        if verbose:
+            done = min(start + batch_size, len(thread_ids))
+            print(f"{done}/{len(thread_ids)} threads")
+    return indexed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="full-text search over chatbot.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill_cmd = commands.add_parser("backfill", help="index existing threads")
+    backfill_cmd.add_argument("db")
+    backfill_cmd.add_argument("--batch-size", type=int, default=200)
+
+    search_cmd = commands.add_parser("search", help="search conversations")
+    search_cmd.add_argument("db")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db, check_same_thread=False)
+    if args.command == "backfill":
+        from compact_serde import CompactSerializer
+
+        saver = IndexedSqliteSaver(conn, serde=CompactSerializer())
+        print(f"indexed {backfill(saver, args.batch_size, verbose=True)} messages")
+    else:
+        start = time.perf_counter()
+        results = search(conn, args.query, limit=args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        for result in results:
+            print(f"{result['thread_id']}  {result['snippet']}")
+        print(f"{len(results)} threads in {elapsed:.1f} ms")
@@ -0,0 +1,200 @@
+"""Async HTTP chat service over the SQLite-backed chatbot graph.
+
+    python chatbot/service.py --port 8000 --workers 4
+
+Endpoints (JSON unless noted):
+
+    POST /threads                       -> {"thread_id": ...}
+    GET  /threads                       -> [{"id": ..., "title": ...}, ...]
+    GET  /threads/<id>/messages?limit=N -> [{"role": ..., "content": ...}, ...]
+    POST /threads/<id>/messages         {"content": "..."} -> text/event-stream
+
+The send-message endpoint streams ``token`` events (``{"content": ...}``)
+followed by a single ``done`` event, or an ``error`` event. If the client
+disconnects mid-reply the generation is cancelled and the partial reply is
+kept in the thread, exactly as with the stop button in ``frontend_db.py``.
+
+With ``--workers`` > 1 the listening socket is bound once and the process is
+forked; the heavy imports happen once in the parent (see
+``backend_db.preload``) and each worker opens its own connection to
+``chatbot.db`` on its first request.
+
+Each open stream holds a thread of its own pool (``--stream-threads``) while
+the model writes; streams beyond that wait for a free thread instead of
+starving the other handlers, which use the loop's default executor.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+
+import tornado.ioloop
+import tornado.iostream
+import tornado.netutil
+import tornado.process
+import tornado.web
+from tornado.httpserver import HTTPServer
+
+
+_DONE = object()
+# concurrent streams per worker process
+STREAM_THREADS = int(os.getenv("CHATBOT_STREAM_THREADS", "64"))
+_stream_executor = None
+
+
+def backend():
+    # importing backend_db does not open the database (that happens on first
+    # use), so forked workers still get their own sqlite connection
+    import backend_db
+
+    return backend_db
+
+
+def stream_executor() -> ThreadPoolExecutor:
+    # created on first use, so every forked worker gets its own threads
+    global _stream_executor
+    if _stream_executor is None:
+        _stream_executor = ThreadPoolExecutor(
+            STREAM_THREADS, thread_name_prefix="stream"
+        )
+    return _stream_executor
+
+
+async def iterate_in_thread(iterator, executor: ThreadPoolExecutor):
+    """
+    Drive a blocking iterator from the event loop without blocking it.
+
+    Every ``next()`` runs on ``executor``, and so does ``close()`` when the
+    iteration ends early: closing ``stream_cancellable`` waits for the graph
+    to checkpoint the partial reply, which must not happen on the loop.
+    """
+    future = None
+    try:
+        while True:
+            future = executor.submit(next, iterator, _DONE)
+            item = await asyncio.wrap_future(future)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        # a generator can't be closed while a next() is still running it
+        if future is not None and not future.done():
+            await asyncio.wait([asyncio.wrap_future(future)])
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await asyncio.wrap_future(executor.submit(close))
+
+
+class ThreadsHandler(tornado.web.RequestHandler):
+    def post(self):
+        self.write({"thread_id": str(uuid.uuid4())})
+
+    async def get(self):
+        loop = asyncio.get_running_loop()
+        threads = await loop.run_in_executor(None, backend().retrieve_all_threads)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(threads))
+
+
+class MessagesHandler(tornado.web.RequestHandler):
+    async def get(self, thread_id):
+        limit = int(self.get_query_argument("limit", "0")) or None
+        loop = asyncio.get_running_loop()
+        messages = await loop.run_in_executor(None, load_messages, thread_id)
+        if limit is not None:
+            messages = messages[-limit:]
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(messages))
+
+    async def post(self, thread_id):
+        try:
+            content = json.loads(self.request.body)["content"]
+        except (ValueError, KeyError, TypeError):
+            raise tornado.web.HTTPError(400, reason='expected {"content": "..."}')
+
+        from streaming import coalesce_stream
+
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.cancel_event = threading.Event()
+        stream = coalesce_stream(
+            backend().stream_cancellable(content, thread_id, self.cancel_event)
+        )
+        try:
+            async with aclosing(iterate_in_thread(stream, stream_executor())) as frames:
+                async for frame in frames:
+                    await self.send_event("token", {"content": frame})
+            await self.send_event("done", {"thread_id": thread_id})
+        except tornado.iostream.StreamClosedError:
+            self.cancel_event.set()
+        except Exception as exc:
+            self.cancel_event.set()
+            await self.send_event("error", {"error": str(exc)})
+
+    async def send_event(self, event, data):
+        self.write(f"event: {event}\ndata: {json.dumps(data)}\n\n")
+        await self.flush()
+
+    def on_connection_close(self):
+        # stops the model and persists what was generated so far
+        if getattr(self, "cancel_event", None) is not None:
+            self.cancel_event.set()
+
+
+def load_messages(thread_id):
+    from langchain_core.messages import HumanMessage
+
+    chatbot = backend().get_chatbot()
+    state = chatbot.get_state(config={"configurable": {"thread_id": thread_id}})
+    return [
+        {
+            "role": "user" if isinstance(msg, HumanMessage) else "assistant",
+            "content": msg.content,
+        }
+        for msg in state.values.get("messages", [])
+    ]
+
+
+def make_app():
+    return tornado.web.Application(
+        [
+            (r"/threads", ThreadsHandler),
+            (r"/threads/([^/]+)/messages", MessagesHandler),
+        ]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="chatbot HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes (0 = one per CPU)"
+    )
+    parser.add_argument(
+        "--stream-threads",
+        type=int,
+        default=STREAM_THREADS,
+        help="concurrent reply streams per worker",
+    )
+    args = parser.parse_args()
+    STREAM_THREADS = args.stream_threads
+
+    sockets = tornado.netutil.bind_sockets(args.port, address=args.host)
+    backend().preload()
+    if args.workers != 1:
+        tornado.process.fork_processes(args.workers)
+    # open provider connections in the background so the first request
+    # in each worker doesn't pay for the TLS handshake
+    from model_registry import warm_up
+
+    threading.Thread(target=warm_up, daemon=True).start()
+    server = HTTPServer(make_app())
+    server.add_sockets(sockets)
+    print(f"chatbot service listening on http://{args.host}:{args.port}")
+    tornado.ioloop.IOLoop.current().start()
@@ -0,0 +1,53 @@
+"""Thin client for chatbot/service.py, used by frontend_client.py."""
+
+import json
+import os
+
+import requests
+
+
+SERVICE_URL = os.getenv("CHATBOT_SERVICE_URL", "http://127.0.0.1:8000")
+
+# keep-alive connections shared by every call from this process
+session = requests.Session()
+
+
+def create_thread():
+    response = session.post(f"{SERVICE_URL}/threads")
+    response.raise_for_status()
+    return response.json()["thread_id"]
+
+
+def list_threads():
+    response = session.get(f"{SERVICE_URL}/threads")
+    response.raise_for_status()
+    return response.json()
+
+
+def get_history(thread_id, limit=None):
+    params = {"limit": limit} if limit else None
+    response = session.get(f"{SERVICE_URL}/threads/{thread_id}/messages", params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+def send_message(thread_id, content):
+    """Yield reply text as it streams in; closing the generator cancels the reply."""
+    with session.post(
+        f"{SERVICE_URL}/threads/{thread_id}/messages",
+        json={"content": content},
+        stream=True,
+    ) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: ") :]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: ") :])
+                if event == "token":
+                    yield data["content"]
+                elif event == "error":
+                    raise RuntimeError(data["error"])
+                elif event == "done":
+                    return
@@ -0,0 +1,352 @@
+"""Hash-sharded SQLite checkpointer: one database file, connection and writer per shard.
+
+SQLite allows one writer per database file, so with a single ``chatbot.db``
+every checkpoint write in the process queues behind the same lock.
+``ShardedSqliteSaver`` spreads threads over N files by hashing the thread
+id; writes to different shards run in parallel (sqlite releases the GIL
+while it executes and syncs).
+
+    checkpointer = ShardedSqliteSaver.from_path("chatbot.db", 4, serde=CompactSerializer())
+    # -> chatbot-0.db, chatbot-1.db, chatbot-2.db, chatbot-3.db
+
+    python chatbot/sharded_saver.py reshard chatbot.db chatbot.db --from 1 --to 4
+    python chatbot/sharded_saver.py bench --shards 1 2 4 8
+
+Every shard is a full ``ForkableSqliteSaver`` (search index, forks). A fork's
+row lives on the fork's own shard and its parent is looked up on the
+parent's shard. ``list(None)``, ``list_forks()`` and ``search()`` visit all
+shards and merge lazily. A one-shard saver uses the plain path, so
+``chatbot.db`` is shard 0 of 1.
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+
+from forks import ForkableSqliteSaver
+
+
+# tables copied by reshard(), all keyed by thread_id
+TABLES = [
+    "checkpoints",
+    "writes",
+    "thread_forks",
+    "fork_deltas",
+    "message_fts",
+    "message_fts_indexed",
+]
+
+
+def shard_index(thread_id: str, shards: int) -> int:
+    # stable across processes and Python versions, unlike hash()
+    digest = hashlib.sha1(str(thread_id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+def shard_paths(path: str, shards: int) -> List[str]:
+    if shards == 1:
+        return [path]
+    root, ext = os.path.splitext(path)
+    return [f"{root}-{i}{ext}" for i in range(shards)]
+
+
+class _Shard(ForkableSqliteSaver):
+    def __init__(self, conn: sqlite3.Connection, router: "ShardedSqliteSaver", serde):
+        super().__init__(conn, serde=serde)
+        self.router = router
+
+    def saver_for(self, thread_id: str) -> ForkableSqliteSaver:
+        return self.router.shard_for(thread_id)
+
+
+class ShardedSqliteSaver(BaseCheckpointSaver):
+    """Checkpointer over several SQLite files, one per shard of the thread ids."""
+
+    def __init__(self, conns: Sequence[sqlite3.Connection], serde=None):
+        super().__init__(serde=serde)
+        self.shards = [_Shard(conn, self, serde) for conn in conns]
+
+    @classmethod
+    def from_path(
+        cls, path: str, shards: int, serde=None, timeout: float = 5.0
+    ) -> "ShardedSqliteSaver":
+        """Open (or create) the ``shards`` files derived from ``path``."""
+        conns = [
+            sqlite3.connect(p, check_same_thread=False, timeout=timeout)
+            for p in shard_paths(path, shards)
+        ]
+        return cls(conns, serde=serde)
+
+    def shard_for(self, thread_id: str) -> ForkableSqliteSaver:
+        return self.shards[shard_index(thread_id, len(self.shards))]
+
+    def _route(self, config: RunnableConfig) -> ForkableSqliteSaver:
+        return self.shard_for(config["configurable"]["thread_id"])
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self._route(config).get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is not None:
+            yield from self._route(config).list(
+                config, filter=filter, before=before, limit=limit
+            )
+            return
+        # checkpoint ids are time ordered, so merging the per-shard streams
+        # (each newest first) gives the same order as one database would;
+        # like SqliteSaver.list, don't call into the saver while iterating
+        merged = heapq.merge(
+            *(
+                shard.list(None, filter=filter, before=before, limit=limit)
+                for shard in self.shards
+            ),
+            key=lambda t: t.config["configurable"]["checkpoint_id"],
+            reverse=True,
+        )
+        yield from itertools.islice(merged, limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self._route(config).put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._route(config).put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.shard_for(thread_id).delete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.shards[0].get_next_version(current, channel)
+
+    # ************************** forks, search, lookups ***************************
+    def fork(
+        self,
+        thread_id: str,
+        checkpoint_id: Optional[str] = None,
+        new_thread_id: Optional[str] = None,
+    ) -> str:
+        new_thread_id = str(new_thread_id or uuid.uuid4())
+        return self.shard_for(new_thread_id).fork(
+            thread_id, checkpoint_id, new_thread_id
+        )
+
+    def fork_parent(self, thread_id: str) -> Optional[tuple]:
+        return self.shard_for(thread_id).fork_parent(thread_id)
+
+    def list_forks(self) -> Dict[str, Dict[str, Any]]:
+        forks = {}
+        for shard in self.shards:
+            forks.update(shard.list_forks())
+        return forks
+
+    def latest_checkpoint_id(self, thread_id: str) -> Optional[str]:
+        return self.shard_for(thread_id).latest_checkpoint_id(thread_id)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        # bm25 ranks are per database, but close enough to merge on
+        hits = [shard.search(query, limit=limit) for shard in self.shards]
+        return heapq.nsmallest(
+            limit, itertools.chain.from_iterable(hits), key=lambda h: h["score"]
+        )
+
+
+def _tables(conn: sqlite3.Connection) -> set:
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"
+        )
+    }
+
+
+def reshard(
+    src: str,
+    src_shards: int,
+    dst: str,
+    dst_shards: int,
+    batch_size: int = 1000,
+    verbose: bool = False,
+) -> Dict[str, int]:
+    """
+    Copy every thread from ``src`` (``src_shards`` files) to ``dst`` (``dst_shards`` files).
+
+    Rows are streamed ``batch_size`` at a time and written to the shard their
+    thread id hashes to, one transaction per batch and shard. The source is
+    opened read-only and must not share files with the destination.
+
+    Returns:
+        dict: Number of copied rows per table.
+    """
+    src_paths = shard_paths(src, src_shards)
+    dst_paths = shard_paths(dst, dst_shards)
+    overlap = {os.path.abspath(p) for p in src_paths} & {
+        os.path.abspath(p) for p in dst_paths
+    }
+    if overlap:
+        raise ValueError(f"source and destination share files: {sorted(overlap)}")
+
+    target = ShardedSqliteSaver.from_path(dst, dst_shards)
+    for shard in target.shards:
+        shard.setup()
+    copied = dict.fromkeys(TABLES, 0)
+    for path in src_paths:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        existing = _tables(conn)
+        for table in TABLES:
+            if table not in existing:
+                continue
+            rows = conn.execute(f"SELECT * FROM {table}")
+            columns = [d[0] for d in rows.description]
+            thread_col = columns.index("thread_id")
+            insert = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            if table == "message_fts":
+                # FTS5 tables have no unique key to replace on
+                insert = insert.replace("INSERT OR REPLACE", "INSERT")
+            while batch := rows.fetchmany(batch_size):
+                by_shard = [[] for _ in target.shards]
+                for row in batch:
+                    by_shard[shard_index(row[thread_col], dst_shards)].append(row)
+                for shard, shard_rows in zip(target.shards, by_shard):
+                    if shard_rows:
+                        with shard.cursor() as cur:
+                            cur.executemany(insert, shard_rows)
+                copied[table] += len(batch)
+            if verbose:
+                print(f"{path}: {table} done ({copied[table]} rows so far)")
+        conn.close()
+    for shard in target.shards:
+        shard.conn.close()
+    return copied
+
+
+def _bench_writer(path: str, shards: int, worker: int, writes: int, message_chars: int):
+    from langchain_core.messages import AIMessage
+    from langgraph.checkpoint.base import empty_checkpoint
+
+    from compact_serde import CompactSerializer
+
+    # every process opens its own connections, like forked service workers
+    # a long busy timeout: single-file runs queue on the write lock a lot
+    saver = ShardedSqliteSaver.from_path(
+        path, shards, serde=CompactSerializer(), timeout=60.0
+    )
+    for i in range(writes):
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {
+            "messages": [AIMessage("x" * message_chars, id=str(uuid.uuid4()))]
+        }
+        config = {
+            "configurable": {"thread_id": f"w{worker}-t{i % 50}", "checkpoint_ns": ""}
+        }
+        saver.put(config, checkpoint, {"step": i}, {})
+    for shard in saver.shards:
+        shard.conn.close()
+
+
+def benchmark(
+    shard_counts: Sequence[int] = (1, 2, 4, 8),
+    writers: int = 8,
+    writes: int = 4000,
+    message_chars: int = 2000,
+) -> Dict[int, float]:
+    """
+    Checkpoint writes per second for each shard count.
+
+    ``writers`` processes (think service workers) each put checkpoints for
+    their own thread ids, one new message per write, into the same fresh
+    set of shard files in a temp dir.
+    """
+    import multiprocessing
+
+    results = {}
+    for shards in shard_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            setup = ShardedSqliteSaver.from_path(path, shards)
+            for shard in setup.shards:
+                shard.setup()
+                shard.conn.close()
+            per_writer = writes // writers
+            processes = [
+                multiprocessing.Process(
+                    target=_bench_writer,
+                    args=(path, shards, w, per_writer, message_chars),
+                )
+                for w in range(writers)
+            ]
+            start = time.perf_counter()
+            for p in processes:
+                p.start()
+            for p in processes:
+                p.join()
+            results[shards] = per_writer * writers / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="sharded chatbot checkpoints")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reshard_cmd = commands.add_parser("reshard", help="copy threads to a new layout")
+    reshard_cmd.add_argument("src", help="base path, e.g. chatbot.db")
+    reshard_cmd.add_argument("dst", help="base path of the new shards")
+    reshard_cmd.add_argument("--from", dest="src_shards", type=int, default=1)
+    reshard_cmd.add_argument("--to", dest="dst_shards", type=int, required=True)
+    reshard_cmd.add_argument("--batch-size", type=int, default=1000)
+
+    bench_cmd = commands.add_parser("bench", help="write throughput per shard count")
+    bench_cmd.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    bench_cmd.add_argument("--writers", type=int, default=8)
+    bench_cmd.add_argument("--writes", type=int, default=4000)
+
+    args = parser.parse_args()
+    if args.command == "reshard":
+        start = time.perf_counter()
+        copied = reshard(
+            args.src,
+            args.src_shards,
+            args.dst,
+            args.dst_shards,
+            args.batch_size,
+            verbose=True,
+        )
+        print(f"copied {copied} in {time.perf_counter() - start:.1f}s")
+    else:
+        results = benchmark(args.shards, args.writers, args.writes)
+        base = results[args.shards[0]]
+        for shards, rate in results.items():
+            print(f"{shards:>3} shards: {rate:8.0f} writes/s  ({rate / base:.2f}x)")
@@ -0,0 +1,56 @@
+"""Helpers for feeding graph token streams into the Streamlit frontends."""
+
+import time
+from typing import Iterable, Iterator, Tuple
+
+
+def coalesce_stream(
+    stream: Iterable[Tuple[object, dict]],
+    node: str = "chat_node",
+    interval: float = 0.04,
+    max_chars: int = 512,
+) -> Iterator[str]:
+    """
+    Merge per-token chunks from ``chatbot.stream(..., stream_mode="messages")``
+    into larger frames for ``st.write_stream``.
+
+    Every item handed to ``st.write_stream`` is a websocket delta and a
+    re-render, so instead of one per token a frame is emitted once
+    ``interval`` seconds have passed since the previous one (40 ms by default)
+    or ``max_chars`` characters are buffered, whichever comes first.
+
+    Args:
+        stream: ``(message_chunk, metadata)`` pairs.
+        node: Only chunks produced by this graph node are kept.
+        interval: Minimum seconds between frames.
+        max_chars: Flush early once this many characters are buffered.
+
+    Yields:
+        str: Coalesced text frames. Empty and non-text chunks are dropped.
+    """
+    buffer = []
+    buffered = 0
+    last_flush = time.monotonic()
+    try:
+        for message_chunk, metadata in stream:
+            if node is not None and metadata.get("langgraph_node") != node:
+                continue
+            content = message_chunk.content
+            if not content or not isinstance(content, str):
+                continue
+            buffer.append(content)
+            buffered += len(content)
+            now = time.monotonic()
+            if buffered >= max_chars or now - last_flush >= interval:
+                yield "".join(buffer)
+                buffer.clear()
+                buffered = 0
+                last_flush = now
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # closing the frames closes the source now, in this thread (e.g. to
+        # cancel stream_cancellable), not whenever it is garbage collected
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,46 @@
+"""streamlit run essay_frontend.py"""
+
+import importlib
+
+import streamlit as st
+
+
+# module names can't start with a digit in an import statement
+essay_workflow = importlib.import_module("5_upsc_essay_workflow")
+
+
+st.title("UPSC Essay Evaluation")
+essay = st.text_area("Essay", essay_workflow.ESSAY, height=300)
+
+if st.button("Evaluate"):
+    # one column per evaluator, filled in the order the branches finish
+    columns = dict(
+        zip(
+            [dimension for dimension, _ in essay_workflow.BRANCHES.values()],
+            st.columns(len(essay_workflow.BRANCHES)),
+        )
+    )
+    for dimension, column in columns.items():
+        column.subheader(dimension.title())
+    placeholders = {dimension: col.empty() for dimension, col in columns.items()}
+    for placeholder in placeholders.values():
+        placeholder.caption("evaluating...")
+
+    st.subheader("Summary")
+    events = essay_workflow.stream_evaluation(essay)
+    final = {}
+
+    def summary_tokens():
+        for event in events:
+            if event["type"] == "branch":
+                with placeholders[event["dimension"]].container():
+                    st.metric("Score", f"{event['score']}/10")
+                    st.write(event["feedback"])
+            elif event["type"] == "token":
+                yield event["content"]
+            else:
+                final.update(event)
+
+    st.write_stream(summary_tokens())
+    if final:
+        st.metric("Average score", f"{final['avg_score']:.2f}/10")
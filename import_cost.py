@@ -0,0 +1,179 @@
+"""Per-module import cost report for the workflow scripts and chatbot modules.
+
+    python import_cost.py                              # every entry point vs. its budget
+    python import_cost.py chatbot/backend_db.py --top 15
+    python import_cost.py 5_upsc_essay_workflow.py --json
+
+Each target is imported as a library (so ``__main__`` blocks don't run) in a
+fresh interpreter started with ``-X importtime``, and the timings are grouped
+by top-level package. ``--repeat`` reports the median of several runs, the
+first of which also warms the disk cache. The exit status is 1 when a
+target is over budget, so the report can gate CI.
+
+Importing a module should only define things. Graphs are compiled by the
+cached ``get_workflow()`` / ``get_chatbot()`` factories, and langgraph's
+builder, dotenv, the OpenAI client and the SQLite checkpointer are imported
+on first use.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# import-time budget per entry point, in milliseconds: about 1.5x the median
+# of `--repeat 9` on a dev machine, rounded up to 50 ms and at least 100 ms,
+# so run-to-run noise stays well inside the budget and only a real
+# regression (a heavy import moved back to module level) trips it. Re-derive
+# them the same way when an entry point legitimately gets heavier.
+BUDGETS = {
+    "1_bmi_workflow.py": 100,  # median 29 ms
+    "2_simple_llm_workflow.py": 100,  # 52 ms
+    "3_prompt_chaining.py": 100,  # 49 ms
+    "4_batsman_workflow.py": 100,  # 24 ms
+    "5_upsc_essay_workflow.py": 350,  # 233 ms
+    "6_quadratic_equation_workflow.py": 100,  # 24 ms
+    "7_review_reply_workflow.py": 350,  # 203 ms
+    "8_X_post_generator_iterative_workflow.py": 450,  # 285 ms
+    "9_basic_chatbot.py": 1300,  # 837 ms
+    "10_persistence.py": 100,  # 45 ms
+    "chatbot/backend.py": 1300,  # 844 ms
+    "chatbot/backend_db.py": 1250,  # 801 ms
+    "chatbot/service.py": 350,  # 212 ms
+}
+
+# imports the target by file path, with its directory on sys.path the way
+# `python <file>` / `streamlit run <file>` would have it
+_LOADER = """
+import importlib.util, sys
+path = sys.argv[1]
+sys.path.insert(0, sys.argv[2])
+spec = importlib.util.spec_from_file_location("_import_cost_target", path)
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+"""
+
+
+def _parse(stderr: str) -> List[dict]:
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header
+        modules.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+    return modules
+
+
+def measure(target: str, repeat: int = 1) -> dict:
+    """
+    Import ``target`` (a .py path, relative to the repo root) in a fresh
+    interpreter and break down where the time went.
+
+    Returns:
+        dict: ``total_ms``, ``modules`` (count), ``packages`` (top-level
+        package -> ms, sorted) and the raw per-module ``timings`` of the
+        median run.
+    """
+    path = os.path.join(ROOT, target)
+    runs = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                _LOADER,
+                path,
+                os.path.dirname(path),
+            ],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"importing {target} failed:\n{result.stderr[-2000:]}")
+        timings = _parse(result.stderr)
+        runs.append(
+            {"total_ms": sum(m["self_ms"] for m in timings), "timings": timings}
+        )
+    runs.sort(key=lambda run: run["total_ms"])
+    best = runs[len(runs) // 2]
+
+    packages: Dict[str, float] = defaultdict(float)
+    for m in best["timings"]:
+        packages[m["module"].split(".")[0]] += m["self_ms"]
+    return {
+        "target": target,
+        "total_ms": round(best["total_ms"], 1),
+        "budget_ms": BUDGETS.get(target),
+        "modules": len(best["timings"]),
+        "packages": dict(
+            sorted(
+                ((k, round(v, 1)) for k, v in packages.items()),
+                key=lambda kv: kv[1],
+                reverse=True,
+            )
+        ),
+        "timings": best["timings"],
+    }
+
+
+def over_budget(report: dict) -> bool:
+    return report["budget_ms"] is not None and report["total_ms"] > report["budget_ms"]
+
+
+def print_report(report: dict, top: int = 10) -> None:
+    budget = report["budget_ms"]
+    status = "" if budget is None else f" / {budget} ms budget"
+    if over_budget(report):
+        status += "  OVER BUDGET"
+    print(
+        f"{report['target']}: {report['total_ms']:.1f} ms, "
+        f"{report['modules']} modules{status}"
+    )
+    for package, ms in list(report["packages"].items())[:top]:
+        print(f"    {ms:9.1f} ms  {package}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="per-module import cost report")
+    parser.add_argument(
+        "targets", nargs="*", help=".py files (default: every entry point)"
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="packages listed per target"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="report the median run")
+    parser.add_argument("--json", action="store_true", help="machine-readable output")
+    args = parser.parse_args(argv)
+
+    reports = [measure(t, args.repeat) for t in args.targets or BUDGETS]
+    if args.json:
+        for report in reports:
+            report["packages"] = dict(list(report["packages"].items())[: args.top])
+            del report["timings"]
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report, args.top)
+    return 1 if any(over_budget(r) for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""Durable SQLite job queue for batch graph runs, with worker processes.
+
+    python job_queue.py submit upsc --input '{"essay": "..."}'
+    python job_queue.py submit review --input-file reviews.jsonl   # one input per line
+    python job_queue.py work --workers 4 --until-empty
+    python job_queue.py status
+    python job_queue.py results --graph review > replies.jsonl
+
+A job is (graph, input). Workers lease jobs from ``jobs.db``: a leased job
+is invisible to other workers until its lease expires (``--visibility``
+seconds, renewed while the job runs), so a worker that crashes or is killed
+simply loses its lease and the job is picked up again. Failed jobs are
+retried with exponential backoff, up to ``--max-attempts`` runs.
+
+Every job runs with a SQLite checkpointer (same file, thread ``job-<id>``),
+so a job that is picked up again resumes after its last completed node:
+LLM calls that finished before the crash are not made again. Only the node
+that was running at the time is redone. Checkpoints of a finished job are
+deleted once its result is stored.
+
+Workers are processes and the nodes wait on the network, so throughput grows
+with ``--workers`` until the provider's rate limits are reached.
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+
+# graph name -> module with a get_workflow()
+GRAPHS = {
+    "upsc": "5_upsc_essay_workflow",
+    "review": "7_review_reply_workflow",
+    "tweet": "8_X_post_generator_iterative_workflow",
+}
+DATABASE = "jobs.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    graph TEXT NOT NULL,
+    input TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after);
+"""
+
+
+def connect(path: str = DATABASE) -> sqlite3.Connection:
+    # long busy timeout: every worker writes to this file
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def backoff(attempt: int, base: float = 5.0, cap: float = 300.0) -> float:
+    """Seconds before retry number ``attempt`` (1-based), with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def submit(
+    conn: sqlite3.Connection,
+    graph: str,
+    inputs: Iterable[Dict[str, Any]],
+    max_attempts: int = 3,
+) -> List[int]:
+    """Queue one job per input, in one transaction; returns the job ids."""
+    if graph not in GRAPHS:
+        raise ValueError(f"unknown graph {graph!r}, expected one of {sorted(GRAPHS)}")
+    now = time.time()
+    ids = []
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for input in inputs:
+            cur = conn.execute(
+                "INSERT INTO jobs (graph, input, max_attempts, run_after, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (graph, json.dumps(input), max_attempts, now, now),
+            )
+            ids.append(cur.lastrowid)
+    return ids
+
+
+def lease(conn: sqlite3.Connection, owner: str, visibility: float) -> Optional[tuple]:
+    """
+    Take the oldest runnable job: queued and due, or running with an expired lease.
+
+    Returns:
+        tuple: ``(id, graph, input, attempts)``, or ``None`` if nothing is runnable.
+    """
+    now = time.time()
+    # a job whose worker died on its last allowed attempt is not retried
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', error = 'lease expired', finished_at = ?, "
+        "lease_owner = NULL, lease_expires = NULL "
+        "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+        (now, now),
+    )
+    return conn.execute(
+        """
+        UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?,
+            attempts = attempts + 1
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE (status = 'queued' AND run_after <= ?)
+               OR (status = 'running' AND lease_expires < ?)
+            ORDER BY id LIMIT 1
+        )
+        RETURNING id, graph, input, attempts
+        """,
+        (owner, now + visibility, now, now),
+    ).fetchone()
+
+
+def _finish(conn, job_id, owner, **columns) -> bool:
+    # only the current lease holder may settle the job; False if it lost it
+    sets = ", ".join(f"{name} = ?" for name in columns)
+    cur = conn.execute(
+        f"UPDATE jobs SET {sets}, lease_owner = NULL, lease_expires = NULL "
+        "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+        (*columns.values(), job_id, owner),
+    )
+    return cur.rowcount == 1
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps renewing a job's lease while the worker is running it."""
+
+    def __init__(self, path, job_id, owner, visibility):
+        super().__init__(daemon=True)
+        self.path, self.job_id, self.owner = path, job_id, owner
+        self.visibility = visibility
+        self.stopped = threading.Event()
+
+    def run(self):
+        conn = connect(self.path)
+        while not self.stopped.wait(self.visibility / 3):
+            conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ?",
+                (time.time() + self.visibility, self.job_id, self.owner),
+            )
+        conn.close()
+
+
+@lru_cache(maxsize=None)
+def _compiled(graph: str, checkpointer):
+    module = importlib.import_module(GRAPHS[graph])
+    # the module's graph is compiled without a checkpointer; reuse its builder
+    return module.get_workflow().builder.compile(checkpointer=checkpointer)
+
+
+def run_job(checkpointer, graph: str, input: dict, job_id: int) -> dict:
+    """Run (or resume) a job's graph and return its final state."""
+    workflow = _compiled(graph, checkpointer)
+    config = {"configurable": {"thread_id": f"job-{job_id}"}}
+    state = workflow.get_state(config)
+    if state.values and not state.next:
+        # finished, but the worker died before storing the result
+        return state.values
+    # state.next: an earlier attempt got part of the way, continue from there
+    # (None input); durability="sync" writes each step's checkpoint before the
+    # next step starts, so a crash never loses a completed node
+    return workflow.invoke(None if state.next else input, config, durability="sync")
+
+
+def worker(path: str, visibility: float, poll: float, until_empty: bool) -> None:
+    """Lease and run jobs until stopped (or, with ``until_empty``, none are left)."""
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
+    from chatbot.compact_serde import CompactSerializer
+
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    conn = connect(path)
+    checkpointer = SqliteSaver(
+        sqlite3.connect(path, timeout=30.0, check_same_thread=False),
+        serde=CompactSerializer(),
+    )
+    while True:
+        job = lease(conn, owner, visibility)
+        if job is None:
+            if (
+                until_empty
+                and not conn.execute(
+                    "SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1"
+                ).fetchone()
+            ):
+                return
+            time.sleep(poll)
+            continue
+        job_id, graph, input, attempts = job
+        heartbeat = _Heartbeat(path, job_id, owner, visibility)
+        heartbeat.start()
+        try:
+            result = run_job(checkpointer, graph, json.loads(input), job_id)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            max_attempts = conn.execute(
+                "SELECT max_attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()[0]
+            if attempts < max_attempts:
+                _finish(
+                    conn,
+                    job_id,
+                    owner,
+                    status="queued",
+                    error=error,
+                    run_after=time.time() + backoff(attempts),
+                )
+            else:
+                _finish(
+                    conn,
+                    job_id,
+                    owner,
+                    status="failed",
+                    error=error,
+                    finished_at=time.time(),
+                )
+            print(f"[{owner}] job {job_id} attempt {attempts} failed: {error}")
+            continue
+        finally:
+            heartbeat.stopped.set()
+        if _finish(
+            conn,
+            job_id,
+            owner,
+            status="done",
+            result=json.dumps(result, default=str),
+            error=None,
+            finished_at=time.time(),
+        ):
+            checkpointer.delete_thread(f"job-{job_id}")
+        print(f"[{owner}] job {job_id} done")
+
+
+def work(
+    path: str = DATABASE,
+    workers: int = 4,
+    visibility: float = 120.0,
+    poll: float = 1.0,
+    until_empty: bool = False,
+) -> None:
+    """Run ``workers`` worker processes and wait for them."""
+    connect(path).close()
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(path, visibility, poll, until_empty)
+        )
+        for _ in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        # leases of interrupted jobs expire and they resume elsewhere
+        for p in processes:
+            p.terminate()
+
+
+def status(conn: sqlite3.Connection) -> Dict[str, Dict[str, int]]:
+    """``{graph: {status: count}}``."""
+    counts: Dict[str, Dict[str, int]] = {}
+    for graph, job_status, count in conn.execute(
+        "SELECT graph, status, COUNT(*) FROM jobs GROUP BY graph, status"
+    ):
+        counts.setdefault(graph, {})[job_status] = count
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="durable batch queue for the graphs")
+    parser.add_argument("--db", default=DATABASE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_cmd = commands.add_parser("submit", help="queue jobs")
+    submit_cmd.add_argument("graph", choices=sorted(GRAPHS))
+    source = submit_cmd.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="one input state as JSON")
+    source.add_argument("--input-file", help="JSONL file, one input state per line")
+    submit_cmd.add_argument("--max-attempts", type=int, default=3)
+
+    work_cmd = commands.add_parser("work", help="run worker processes")
+    work_cmd.add_argument("--workers", type=int, default=4)
+    work_cmd.add_argument("--visibility", type=float, default=120.0)
+    work_cmd.add_argument("--poll", type=float, default=1.0)
+    work_cmd.add_argument("--until-empty", action="store_true")
+
+    commands.add_parser("status", help="job counts per graph and status")
+
+    results_cmd = commands.add_parser("results", help="finished jobs as JSONL")
+    results_cmd.add_argument("--graph", choices=sorted(GRAPHS))
+    results_cmd.add_argument(
+        "--failed", action="store_true", help="failed jobs instead"
+    )
+
+    args = parser.parse_args()
+    if args.command == "submit":
+        if args.input:
+            inputs = [json.loads(args.input)]
+        else:
+            with open(args.input_file, encoding="utf-8") as f:
+                inputs = [json.loads(line) for line in f if line.strip()]
+        ids = submit(connect(args.db), args.graph, inputs, args.max_attempts)
+        print(f"queued {len(ids)} {args.graph} jobs ({ids[0]}..{ids[-1]})")
+    elif args.command == "work":
+        work(args.db, args.workers, args.visibility, args.poll, args.until_empty)
+    elif args.command == "status":
+        for graph, counts in status(connect(args.db)).items():
+            print(f"{graph:<8} " + "  ".join(f"{s}: {n}" for s, n in counts.items()))
+    else:
+        query = "SELECT id, graph, input, result, error, attempts FROM jobs WHERE status = ?"
+        params = ["failed" if args.failed else "done"]
+        if args.graph:
+            query += " AND graph = ?"
+            params.append(args.graph)
+        for job_id, graph, input, result, error, attempts in connect(args.db).execute(
+            query + " ORDER BY id", params
+        ):
+            record = {"id": job_id, "graph": graph, "input": json.loads(input)}
+            if args.failed:
+                record.update(error=error, attempts=attempts)
+            else:
+                record["result"] = json.loads(result)
+            print(json.dumps(record))
@@ -0,0 +1,422 @@
+"""Per-node model routing with latency budgets, fallbacks and cost accounting.
+
+Each node declares which model it uses, how long one call may take, and what
+to fall back to when that budget is blown:
+
+    ROUTES = {
+        "find_sentiment": Route("gpt-4o-mini", timeout=4.0, fallback="gpt-4.1-nano"),
+        "negative_response": Route("gpt-4o-mini", timeout=30.0, fallback="gpt-4.1-nano"),
+    }
+    router = ModelRouter(ROUTES)
+
+    def find_sentiment(state):
+        return {"sentiment": router.invoke("find_sentiment", prompt, schema=SentimentSchema).sentiment}
+
+The timeout is passed to the HTTP client, so a slow request is cancelled,
+not just abandoned, and the primary model is called without retries so the
+budget means what it says. Every call records latency, token usage and cost
+per node, including how many prompt tokens the provider served from its
+prompt cache (see prompt_cache.py); ``router.report()`` prints them so routes
+can be tuned from data.
+
+A caller with an overall time budget passes an absolute ``deadline``
+(``time.monotonic()`` based, see ``deadline_in``); each call's timeout is then
+also capped by the time left, and ``DeadlineExceeded`` is raised instead of
+starting (or falling back to) a call there is no time for:
+
+    try:
+        reply = router.invoke("negative_response", prompt, deadline=deadline)
+    except DeadlineExceeded:
+        reply = GENERIC_REPLY
+
+Graphs run with ``{"configurable": {"batch": True}}`` don't call the model at
+all: each call becomes a batch API request and the node is interrupted until
+its response is passed back in on resume (see batch_api.py). Batch calls are
+charged at ``BATCH_DISCOUNT`` of the listed prices.
+"""
+
+from collections import defaultdict, deque
+from statistics import median
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Any, Dict, NamedTuple, Optional
+
+from chatbot.model_registry import get_chat_model
+
+
+# USD per 1M (input, cached input, output) tokens
+PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+}
+# batch API requests cost this share of the prices above
+BATCH_DISCOUNT = 0.5
+# run config key that turns on deferred (batch API) calls
+BATCH_KEY = "batch"
+
+
+# a call isn't started with less time than this left before the deadline
+MIN_CALL_SECONDS = 0.5
+
+
+class DeadlineExceeded(Exception):
+    """Not enough time left before the caller's deadline for a model call."""
+
+
+def deadline_in(seconds: Optional[float]) -> Optional[float]:
+    """Absolute deadline ``seconds`` from now, for ``ModelRouter.invoke``."""
+    return None if seconds is None else monotonic() + seconds
+
+
+def time_left(deadline: Optional[float]) -> float:
+    """Seconds until ``deadline``; infinite without one."""
+    return float("inf") if deadline is None else deadline - monotonic()
+
+
+class BatchRequestError(Exception):
+    """A deferred call came back from the batch API as an error."""
+
+
+def batch_mode() -> bool:
+    """Whether the graph run this is called from defers its model calls."""
+    from langgraph.config import get_config
+
+    try:
+        return bool(get_config().get("configurable", {}).get(BATCH_KEY))
+    except RuntimeError:
+        # not called from inside a graph run
+        return False
+
+
+def batch_request_body(model: str, input: Any, schema=None) -> Dict[str, Any]:
+    """The ``/v1/chat/completions`` body for one call, as the batch file needs it."""
+    from langchain_core.messages import convert_to_openai_messages
+
+    if isinstance(input, str):
+        input = [("human", input)]
+    body = {"model": model, "messages": convert_to_openai_messages(input)}
+    if schema is not None:
+        # not strict: strict mode puts constraints on the schema (every field
+        # required, no extra keys) that not every pydantic model meets; the
+        # reply is validated against the pydantic schema itself, see _deferred
+        body["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": schema.__name__,
+                "schema": schema.model_json_schema(),
+            },
+        }
+    return body
+
+
+class Route(NamedTuple):
+    model: str
+    timeout: float = 30.0
+    fallback: Optional[str] = None
+
+
+def cost(
+    model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0
+) -> Optional[float]:
+    """
+    USD cost of one call, or ``None`` for a model missing from ``PRICES``.
+
+    ``cached_tokens`` are the part of ``input_tokens`` read from the prompt cache.
+    """
+    if model not in PRICES:
+        return None
+    input_price, cached_price, output_price = PRICES[model]
+    return (
+        (input_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + output_tokens * output_price
+    ) / 1_000_000
+
+
+def _is_timeout(exc: Exception) -> bool:
+    import httpx
+    import openai
+
+    return isinstance(exc, (openai.APITimeoutError, httpx.TimeoutException))
+
+
+def _is_transient(exc: Exception) -> bool:
+    import httpx
+    import openai
+
+    return isinstance(
+        exc,
+        (
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+            httpx.TransportError,
+        ),
+    )
+
+
+def _p95(values):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+# latencies kept per node for the percentiles; the totals cover every call
+LATENCY_WINDOW = 1000
+
+
+class _NodeStats:
+    """Running totals for one node, plus its most recent latencies."""
+
+    def __init__(self):
+        self.calls = self.timeouts = self.over_budget = 0
+        self.input_tokens = self.output_tokens = self.cached_tokens = 0
+        self.cost = None
+        self.models = defaultdict(int)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def add(
+        self,
+        model: str,
+        latency: Optional[float] = None,
+        over_budget: bool = False,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cached_tokens: int = 0,
+        cost: Optional[float] = None,
+        timed_out: bool = False,
+        batched: bool = False,
+    ) -> None:
+        if timed_out:
+            self.timeouts += 1
+            return
+        self.calls += 1
+        self.over_budget += over_budget
+        self.models[model + (" (batch)" if batched else "")] += 1
+        # batched calls have no latency of their own
+        if latency is not None:
+            self.latencies.append(latency * 1000)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cached_tokens += cached_tokens
+        if cost is not None:
+            self.cost = (self.cost or 0.0) + cost
+
+
+class ModelRouter:
+    """Route each node's model calls according to its ``Route``."""
+
+    def __init__(self, routes: Dict[str, Route], default: Optional[Route] = None):
+        self.routes = routes
+        self.default = default or Route("gpt-4o-mini")
+        self._stats = defaultdict(_NodeStats)
+        self._lock = Lock()
+
+    def route(self, node: str) -> Route:
+        return self.routes.get(node, self.default)
+
+    def _model(self, model: str, timeout: float, schema, retries: bool):
+        # stream_usage: token counts are reported for streamed calls too
+        kwargs = {"timeout": timeout, "stream_usage": True}
+        if not retries:
+            kwargs["max_retries"] = 0
+        llm = get_chat_model(model, **kwargs)
+        if schema is not None:
+            # include_raw keeps the AIMessage around for its token usage
+            llm = llm.with_structured_output(schema, include_raw=True)
+        return llm
+
+    def _call(self, node: str, model: str, timeout: float, input, schema, retries):
+        start = perf_counter()
+        output = self._model(model, timeout, schema, retries).invoke(input)
+        latency = perf_counter() - start
+        raw = output["raw"] if schema is not None else output
+        usage = getattr(raw, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        self._record(
+            node,
+            model=model,
+            latency=latency,
+            over_budget=latency > timeout,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=cached_tokens,
+            cost=cost(model, input_tokens, output_tokens, cached_tokens),
+        )
+        if schema is None:
+            return output
+        if output["parsing_error"] is not None:
+            raise output["parsing_error"]
+        return output["parsed"]
+
+    def _timeout(self, node: str, route_timeout: float, deadline: Optional[float]):
+        left = time_left(deadline)
+        if left < MIN_CALL_SECONDS:
+            raise DeadlineExceeded(f"{node}: {max(left, 0):.2f}s left")
+        if left >= route_timeout:
+            return route_timeout
+        # rounded down to MIN_CALL_SECONDS steps: the timeout is part of the
+        # model's cache key in model_registry, so keep the set of values small
+        return max(MIN_CALL_SECONDS, left // MIN_CALL_SECONDS * MIN_CALL_SECONDS)
+
+    def invoke(
+        self, node: str, input: Any, schema=None, deadline: Optional[float] = None
+    ):
+        """
+        Call the model routed for ``node``.
+
+        Args:
+            node: Node name, the key into the routes.
+            input: Prompt string or list of messages.
+            schema: Optional pydantic schema for structured output.
+            deadline: Optional ``time.monotonic()`` time the call (including
+                any fallback) must be done by.
+
+        Returns:
+            The parsed ``schema`` instance, or the ``AIMessage``.
+
+        Raises:
+            DeadlineExceeded: With a ``deadline``, when there is no time left
+                for the call, or when the model and its fallback both time
+                out or fail with a rate limit, connection or server error.
+        """
+        route = self.route(node)
+        if batch_mode():
+            return self._deferred(node, route.model, input, schema)
+        timeout = self._timeout(node, route.timeout, deadline)
+        try:
+            return self._call(node, route.model, timeout, input, schema, retries=False)
+        except Exception as exc:
+            if not self._recoverable(node, route.model, exc, deadline):
+                raise
+            if deadline is not None and (
+                route.fallback is None or time_left(deadline) < MIN_CALL_SECONDS
+            ):
+                raise DeadlineExceeded(f"{node}: {route.model} failed: {exc}") from exc
+            if route.fallback is None:
+                raise
+        # retries would multiply the time a deadline has to cover
+        try:
+            return self._call(
+                node,
+                route.fallback,
+                self._timeout(node, route.timeout, deadline),
+                input,
+                schema,
+                retries=deadline is None,
+            )
+        except Exception as exc:
+            if deadline is None or not self._recoverable(
+                node, route.fallback, exc, deadline
+            ):
+                raise
+            raise DeadlineExceeded(f"{node}: {route.fallback} failed: {exc}") from exc
+
+    def _recoverable(self, node: str, model: str, exc: Exception, deadline) -> bool:
+        # timeouts always are (recorded per node); under a deadline, so are
+        # rate limits, connection and 5xx errors, which would otherwise be
+        # retried: a degraded answer beats a crashed graph there
+        if _is_timeout(exc):
+            self._record(node, model=model, timed_out=True)
+            return True
+        return deadline is not None and _is_transient(exc)
+
+    def _deferred(self, node: str, model: str, input, schema):
+        from langchain_core.messages import AIMessage
+        from langgraph.types import interrupt
+
+        # first run: pauses the graph with the request; on resume: the
+        # batch output line's "response" (or "error") for it
+        result = interrupt(
+            {"node": node, "body": batch_request_body(model, input, schema)}
+        )
+        response = result.get("response") or {}
+        if result.get("error") or response.get("status_code") != 200:
+            raise BatchRequestError(
+                f"{node}: {result.get('error') or response.get('body')}"
+            )
+        body = response["body"]
+        message = body["choices"][0]["message"]
+        usage = body.get("usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0)
+        output_tokens = usage.get("completion_tokens", 0)
+        cached_tokens = (usage.get("prompt_tokens_details") or {}).get(
+            "cached_tokens", 0
+        )
+        price = cost(model, input_tokens, output_tokens, cached_tokens)
+        self._record(
+            node,
+            model=model,
+            batched=True,
+            latency=None,
+            over_budget=False,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_tokens=cached_tokens,
+            cost=None if price is None else price * BATCH_DISCOUNT,
+        )
+        if schema is None:
+            return AIMessage(
+                message.get("content") or "",
+                usage_metadata={
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                    "input_token_details": {"cache_read": cached_tokens},
+                },
+            )
+        if message.get("refusal"):
+            raise BatchRequestError(f"{node}: refused: {message['refusal']}")
+        return schema.model_validate_json(message["content"])
+
+    def _record(self, node: str, **call):
+        with self._lock:
+            self._stats[node].add(**call)
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Per-node latency, fallback and cost figures for the calls so far.
+
+        Counts, tokens and cost cover every call; p50/p95 cover the last
+        ``LATENCY_WINDOW`` calls of each node.
+        """
+        stats = {}
+        with self._lock:
+            nodes = [(node, s, list(s.latencies)) for node, s in self._stats.items()]
+            for node, s, latencies in nodes:
+                stats[node] = {
+                    "calls": s.calls,
+                    "timeouts": s.timeouts,
+                    "over_budget": s.over_budget,
+                    "models": dict(s.models),
+                    "input_tokens": s.input_tokens,
+                    "output_tokens": s.output_tokens,
+                    "cached_tokens": s.cached_tokens,
+                    "cost_usd": None if s.cost is None else round(s.cost, 6),
+                }
+        # percentiles of the copied windows, outside the lock
+        for node, _, latencies in nodes:
+            stats[node]["p50_ms"] = round(median(latencies), 1) if latencies else None
+            stats[node]["p95_ms"] = round(_p95(latencies), 1) if latencies else None
+        return stats
+
+    def report(self) -> None:
+        """Print ``stats()`` as a table, one row per node."""
+        print(
+            f"{'node':<22} {'calls':>5} {'timeouts':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'tokens in/out':>15} {'cached':>8} {'cost $':>10}  models"
+        )
+        for node, s in self.stats().items():
+            p50 = "-" if s["p50_ms"] is None else f"{s['p50_ms']:.0f}"
+            p95 = "-" if s["p95_ms"] is None else f"{s['p95_ms']:.0f}"
+            spent = "-" if s["cost_usd"] is None else f"{s['cost_usd']:.6f}"
+            tokens = f"{s['input_tokens']}/{s['output_tokens']}"
+            models = ", ".join(f"{m} x{n}" for m, n in s["models"].items())
+            print(
+                f"{node:<22} {s['calls']:>5} {s['timeouts']:>8} {p50:>8} "
+                f"{p95:>8} {tokens:>15} {s['cached_tokens']:>8} {spent:>10}  {models}"
+            )
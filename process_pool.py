@@ -0,0 +1,127 @@
+"""Run CPU-heavy graph nodes in a persistent pool of worker processes.
+
+LangGraph runs parallel branches of a sync graph on threads, so pure-python
+number crunching in those branches is serialized by the GIL. Wrapping a node
+with ``process_node`` ships only the state keys it reads to a worker process
+and returns the worker's update dict to the graph, where it is merged through
+the normal channel reducers like any other node update.
+
+    graph.add_node("project", process_node(project_innings, keys=["runs", "balls"]))
+
+Each call pays for a round trip to the worker (~0.2 ms, plus pickling the
+keys it reads), so only wrap nodes that do a millisecond or more of
+pure-python work per call; cheap arithmetic nodes are faster in-process.
+
+The wrapped function must be defined at module level (so it can be pickled)
+and the script must keep its demo run behind ``if __name__ == "__main__":``
+so worker processes started with ``spawn`` don't re-run it. A node that takes
+``config`` gets its tags, metadata and user ``configurable`` entries, not the
+in-process runtime objects (checkpointer, stream writer...), which can't
+cross the process boundary.
+"""
+
+import atexit
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = Lock()
+
+# node parameters LangGraph fills with objects that live in this process
+_IN_PROCESS_PARAMS = ("writer", "store", "runtime")
+
+
+def get_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Return the shared worker pool, starting it on first use.
+
+    Raises:
+        ValueError: If the pool is already running with a different
+            ``max_workers``; call ``shutdown_pool()`` first to resize it.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None:
+            _pool_workers = max_workers or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=_pool_workers)
+            atexit.register(shutdown_pool)
+        elif max_workers is not None and max_workers != _pool_workers:
+            raise ValueError(
+                f"process pool already running with {_pool_workers} workers, not {max_workers}"
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _worker_config(config: dict) -> dict:
+    configurable = config.get("configurable") or {}
+    return {
+        "tags": list(config.get("tags") or ()),
+        "metadata": dict(config.get("metadata") or {}),
+        "configurable": {
+            key: value
+            for key, value in configurable.items()
+            if not key.startswith("__pregel_")
+        },
+    }
+
+
+def _run_node(func: Callable, state: dict, config: Optional[dict] = None) -> dict:
+    update = func(state) if config is None else func(state, config=config)
+    if update is not None and not isinstance(update, dict):
+        raise TypeError(
+            f"process node {func.__name__} must return a dict update, got {type(update).__name__}"
+        )
+    return update
+
+
+def process_node(func: Callable, keys: Optional[Iterable[str]] = None) -> Callable:
+    """
+    Wrap a node so it executes in the shared process pool.
+
+    Args:
+        func: A picklable node function ``state -> dict``.
+        keys: State keys the node reads. Only these are pickled and sent to the
+            worker; by default the whole state is sent.
+
+    Returns:
+        A node function to pass to ``graph.add_node``.
+
+    Raises:
+        TypeError: If ``func`` takes ``writer``, ``store`` or ``runtime``.
+    """
+    keys = tuple(keys) if keys is not None else None
+    params = inspect.signature(func).parameters
+    in_process = [name for name in _IN_PROCESS_PARAMS if name in params]
+    if in_process:
+        raise TypeError(
+            f"{func.__name__} takes {', '.join(in_process)}, which can't be sent to a worker process"
+        )
+    takes_config = "config" in params
+
+    # no functools.wraps: LangGraph follows __wrapped__ to decide which
+    # arguments to pass, and this wrapper always wants (state, config)
+    def node(state: dict, config):
+        if keys is not None:
+            state = {key: state[key] for key in keys if key in state}
+        else:
+            state = dict(state)
+        worker_config = _worker_config(config) if takes_config else None
+        return get_pool().submit(_run_node, func, state, worker_config).result()
+
+    node.__name__ = func.__name__
+    node.__qualname__ = func.__qualname__
+    node.__doc__ = func.__doc__
+    return node
@@ -0,0 +1,315 @@
+"""Prompt layouts that keep provider-side prompt caching effective, and a check.
+
+OpenAI caches prompt prefixes automatically: once a prompt of 1024+ tokens
+has been seen, a later request starting with the same tokens is billed the
+cached rate for the shared part (in 128-token steps) and starts faster. It
+only works if the shared content comes first and is byte-for-byte the same,
+so put large shared content (an essay, the conversation so far) before
+anything call-specific:
+
+    prompt = shared_prefix_prompt(EXAMINER_PROMPT, essay, "Evaluate the language ...")
+
+A prefix is only cached once a request carrying it has been processed, so
+calls fanned out in parallel all miss on their first run. Send the prefix
+once first when several calls share it (see ``warm_prompt_cache`` in
+5_upsc_essay_workflow.py); ``prompt_tokens()`` tells whether a prompt is
+long enough to be cached at all.
+
+How much was cached is reported per response in
+``usage_metadata["input_token_details"]["cache_read"]``, see
+``cached_tokens()``; ``ModelRouter.report()`` shows it per node.
+
+    python prompt_cache.py      # offline benchmark with a prefix-caching fake model
+
+The benchmark fans the three essay evaluators out in parallel with the
+instruction-first layout they used to have, with the shared-prefix layout,
+and with the shared-prefix layout after a warm-up call, runs the essay
+graph, and runs a multi-turn chatbot conversation, all against
+``PrefixCachingFakeModel``, which caches like the provider does.
+"""
+
+import hashlib
+import json
+import re
+import time
+from threading import Lock
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+# prompts shorter than this are never cached
+CACHE_MIN_TOKENS = 1024
+
+
+def shared_prefix_prompt(
+    system: Optional[str], shared: str, instruction: str
+) -> List[Tuple[str, str]]:
+    """
+    Messages with the cacheable part first: ``system``, then ``shared``, then ``instruction``.
+
+    Calls that differ only in ``instruction`` send identical leading tokens.
+    """
+    messages = [("system", system)] if system else []
+    return messages + [("human", shared), ("human", instruction)]
+
+
+def prompt_tokens(input: Any) -> int:
+    """Approximate token count of a prompt string or list of ``(role, content)`` messages."""
+    if isinstance(input, str):
+        return len(_tokens(input))
+    return sum(len(_tokens(content)) for _, content in input)
+
+
+def cached_tokens(message: Any) -> int:
+    """Prompt tokens the provider served from its cache for this ``AIMessage``."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return (usage.get("input_token_details") or {}).get("cache_read", 0)
+
+
+# ******************************** fake model *****************************************
+def _tokens(text: str) -> List[str]:
+    # close enough to BPE counts for English prose, and needs no download
+    return re.findall(r"\w+|[^\w\s]", text)
+
+
+def _placeholder(annotation):
+    args = getattr(annotation, "__args__", None)
+    if args and getattr(annotation, "__origin__", None) is not None:
+        # Literal[...] and Annotated[...]: first option / underlying type
+        return args[0] if not isinstance(args[0], type) else _placeholder(args[0])
+    return {int: 5, float: 5.0, bool: True}.get(annotation, "ok")
+
+
+class PrefixCachingFakeModel:
+    """
+    Offline stand-in for ``ChatOpenAI`` that caches prompt prefixes like OpenAI.
+
+    A request's cached tokens are the longest previously seen prefix, counted
+    in ``block``-token steps, if it is at least ``min_tokens`` long. A request
+    takes ``latency`` seconds and its prefix is only cached once it is done,
+    so requests in flight at the same time miss. Structured output calls put
+    the schema ahead of the messages, as tool definitions are. Supports
+    ``invoke``, ``stream`` and ``with_structured_output``.
+    """
+
+    def __init__(
+        self,
+        min_tokens: int = CACHE_MIN_TOKENS,
+        block: int = 128,
+        reply: str = "ok",
+        latency: float = 0.0,
+    ):
+        self.min_tokens = min_tokens
+        self.block = block
+        self.reply = reply
+        self.latency = latency
+        self._seen = set()
+        self._lock = Lock()
+
+    def _prompt_tokens(self, input, schema=None) -> List[str]:
+        from langchain_core.messages import convert_to_messages
+
+        if isinstance(input, str):
+            input = [("human", input)]
+        text = json.dumps(schema.model_json_schema()) if schema is not None else ""
+        for message in convert_to_messages(input):
+            text += f"\n<{message.type}>\n{message.content}"
+        return _tokens(text)
+
+    def _cache(self, tokens: Sequence[str]) -> int:
+        digest = hashlib.sha1()
+        prefixes = []
+        for i, token in enumerate(tokens, 1):
+            digest.update(token.encode() + b"\0")
+            if i % self.block == 0 and i >= self.min_tokens:
+                prefixes.append((i, digest.digest()))
+        with self._lock:
+            cached = max((i for i, d in prefixes if d in self._seen), default=0)
+        time.sleep(self.latency)
+        with self._lock:
+            self._seen.update(d for _, d in prefixes)
+        return cached
+
+    def _message(self, input, schema=None, chunk=False):
+        from langchain_core.messages import AIMessage, AIMessageChunk
+
+        tokens = self._prompt_tokens(input, schema)
+        output_tokens = len(_tokens(self.reply))
+        usage = {
+            "input_tokens": len(tokens),
+            "output_tokens": output_tokens,
+            "total_tokens": len(tokens) + output_tokens,
+            "input_token_details": {"cache_read": self._cache(tokens)},
+        }
+        cls = AIMessageChunk if chunk else AIMessage
+        return cls(self.reply, usage_metadata=usage)
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._message(input)
+
+    def stream(self, input, config=None, **kwargs):
+        yield self._message(input, chunk=True)
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs):
+        model = self
+
+        class Structured:
+            def invoke(self, input, config=None, **kwargs):
+                raw = model._message(input, schema)
+                parsed = schema.model_construct(
+                    **{
+                        name: _placeholder(field.annotation)
+                        for name, field in schema.model_fields.items()
+                    }
+                )
+                if not include_raw:
+                    return parsed
+                return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+        return Structured()
+
+
+# ******************************** benchmark ******************************************
+def _essay_module():
+    import importlib
+
+    return importlib.import_module("5_upsc_essay_workflow")
+
+
+def _fan_out(model, prompts: list) -> List[dict]:
+    # like the graph's parallel branches: all requests in flight at once
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        return list(
+            pool.map(lambda prompt: model.invoke(prompt)["raw"].usage_metadata, prompts)
+        )
+
+
+def benchmark_layouts(essay: str, latency: float = 0.05) -> dict:
+    """
+    Cached share of the three evaluator prompts sent in parallel:
+    instruction-first, shared-prefix, and shared-prefix after a warm-up call
+    (whose tokens are counted too).
+    """
+    upsc = _essay_module()
+    instructions = list(upsc.INSTRUCTIONS.values())
+    layouts = {
+        # what the evaluators sent before: instruction, then the essay
+        "instruction first": (
+            None,
+            [f"{instruction}\n{essay}" for instruction in instructions],
+        ),
+        "shared prefix": (
+            None,
+            [
+                shared_prefix_prompt(upsc.EXAMINER_PROMPT, essay, instruction)
+                for instruction in instructions
+            ],
+        ),
+        "shared prefix, warmed": (
+            shared_prefix_prompt(upsc.EXAMINER_PROMPT, essay, upsc.WARM_UP_INSTRUCTION),
+            [
+                shared_prefix_prompt(upsc.EXAMINER_PROMPT, essay, instruction)
+                for instruction in instructions
+            ],
+        ),
+    }
+    results = {}
+    for name, (warm_up, prompts) in layouts.items():
+        model = PrefixCachingFakeModel(latency=latency).with_structured_output(
+            upsc.EvaluationSchema, include_raw=True
+        )
+        usages = [model.invoke(warm_up)["raw"].usage_metadata] if warm_up else []
+        usages += _fan_out(model, prompts)
+        results[name] = {
+            "input_tokens": sum(u["input_tokens"] for u in usages),
+            "cached_tokens": sum(
+                u["input_token_details"]["cache_read"] for u in usages
+            ),
+        }
+    return results
+
+
+def benchmark_graph(essay: str, latency: float = 0.05) -> dict:
+    """Run the essay graph on the fake model; per-node router stats."""
+    import model_routing
+
+    upsc = _essay_module()
+    fake = PrefixCachingFakeModel(latency=latency)
+    get_chat_model = model_routing.get_chat_model
+    model_routing.get_chat_model = lambda *args, **kwargs: fake
+    try:
+        upsc.get_workflow().invoke({"essay": essay})
+    finally:
+        model_routing.get_chat_model = get_chat_model
+    return upsc.router.stats()
+
+
+def benchmark_chatbot(turns: int = 8) -> List[dict]:
+    """Per-turn input and cached tokens of a conversation through the chatbot node."""
+    import os
+    import sys
+
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.graph import END, START, StateGraph
+
+    sys.path.insert(
+        0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "chatbot")
+    )
+    import backend_db
+
+    fake = PrefixCachingFakeModel(reply="Here is a detailed answer. " * 40)
+    get_chat_model = backend_db.get_chat_model
+    backend_db.get_chat_model = lambda *args, **kwargs: fake
+    graph = StateGraph(backend_db.ChatState)
+    graph.add_node("chat_node", backend_db.chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    chatbot = graph.compile(checkpointer=InMemorySaver())
+    config = {"configurable": {"thread_id": "benchmark"}}
+    rows = []
+    try:
+        for turn in range(1, turns + 1):
+            question = f"Question {turn}: explain the trade-offs once more. " * 10
+            state = chatbot.invoke({"messages": [HumanMessage(question)]}, config)
+            reply = state["messages"][-1]
+            rows.append(
+                {
+                    "turn": turn,
+                    "input_tokens": reply.usage_metadata["input_tokens"],
+                    "cached_tokens": cached_tokens(reply),
+                }
+            )
+    finally:
+        backend_db.get_chat_model = get_chat_model
+    return rows
+
+
+if __name__ == "__main__":
+    upsc = _essay_module()
+    # UPSC essays run 1000-1200 words; the demo essay is about half that
+    essay = upsc.ESSAY + "\n\n" + upsc.ESSAY
+
+    print("essay evaluators, three parallel calls:")
+    for name, r in benchmark_layouts(essay).items():
+        share = r["cached_tokens"] / r["input_tokens"]
+        print(
+            f"  {name:<23} {r['input_tokens']:>6} prompt tokens, "
+            f"{r['cached_tokens']:>6} cached ({share:.0%})"
+        )
+
+    print("\nessay graph:")
+    for node, s in benchmark_graph(essay).items():
+        print(
+            f"  {node:<23} {s['input_tokens']:>6} prompt tokens, "
+            f"{s['cached_tokens']:>6} cached"
+        )
+
+    print("\nchatbot conversation:")
+    for row in benchmark_chatbot():
+        share = row["cached_tokens"] / row["input_tokens"]
+        print(
+            f"  turn {row['turn']:<2} {row['input_tokens']:>6} prompt tokens, "
+            f"{row['cached_tokens']:>6} cached ({share:.0%})"
+        )
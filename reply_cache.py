@@ -0,0 +1,212 @@
+"""Near-duplicate reuse of review diagnoses and replies.
+
+Many reviews are the same complaint in different words ("app freezes on
+login", "login screen hangs", "stuck logging in!!"). ``ReplyCache`` embeds
+each review locally, finds the most similar review it has already answered,
+and when the cosine similarity clears ``threshold`` hands back that review's
+diagnosis and reply instead of paying for two model calls:
+
+    reply_cache = ReplyCache(threshold=0.8, capacity=2048)
+
+    hit = reply_cache.lookup(review)
+    if hit is None:
+        ...  # diagnose and reply as usual
+        reply_cache.store(review, diagnosis, reply, seconds=model_time)
+
+Embeddings are hashed word and character n-grams (no model, no extra
+dependency beyond NumPy): they catch rephrasings, typos and word order, not
+synonyms. The index is a fixed-size matrix, searched with one matrix-vector
+product, and evicts the least recently used entry when full.
+
+``stats()`` / ``report()`` show the hit rate, the model time saved, and the
+hit rate every other threshold would have had on the same lookups, so the
+threshold can be tuned from data.
+"""
+
+import re
+import zlib
+from collections import deque
+from threading import Lock
+from typing import Any, Dict, List, NamedTuple, Optional
+
+
+# thresholds report() shows the would-be hit rate for
+TUNING_THRESHOLDS = [0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+
+
+class HashedVectorizer:
+    """
+    Text -> L2-normalised ``dim``-dim vector of hashed n-gram counts.
+
+    Features are words, word bigrams and character 3/4-grams of each word;
+    each is hashed (crc32, stable across processes) to a bucket and a sign.
+    """
+
+    def __init__(self, dim: int = 4096, char_ngrams=(3, 4)):
+        if dim & (dim - 1):
+            raise ValueError("dim must be a power of two")
+        self.dim = dim
+        self.char_ngrams = char_ngrams
+
+    def features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        features = [f"w {w}" for w in words]
+        features += [f"b {a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            for n in self.char_ngrams:
+                features += [padded[i : i + n] for i in range(len(padded) - n + 1)]
+        return features
+
+    def __call__(self, text: str):
+        import numpy as np
+
+        hashes = np.fromiter(
+            (zlib.crc32(f.encode()) for f in self.features(text)), dtype=np.uint32
+        )
+        vector = np.zeros(self.dim, dtype=np.float32)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes & (self.dim - 1), signs)
+        # long reviews shouldn't win on repeated words alone
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SimilarityIndex:
+    """Bounded nearest-neighbour index over unit vectors, LRU eviction."""
+
+    def __init__(self, dim: int, capacity: int):
+        import numpy as np
+
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.payloads: List[Any] = [None] * capacity
+        self.size = 0
+        self._clock = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def nearest(self, vector):
+        """``(score, slot)`` of the most similar entry, or ``(0.0, None)``."""
+        if not self.size:
+            return 0.0, None
+        scores = self.vectors[: self.size] @ vector
+        slot = int(scores.argmax())
+        return float(scores[slot]), slot
+
+    def touch(self, slot: int) -> None:
+        self._clock += 1
+        self.last_used[slot] = self._clock
+
+    def add(self, vector, payload) -> int:
+        if self.size < len(self.payloads):
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(self.last_used.argmin())
+        self.vectors[slot] = vector
+        self.payloads[slot] = payload
+        self.touch(slot)
+        return slot
+
+
+class CachedReply(NamedTuple):
+    review: str
+    diagnosis: dict
+    reply: str
+    seconds: float
+    score: float = 1.0
+
+
+class ReplyCache:
+    """
+    Reuse the diagnosis and reply of a near-identical earlier review.
+
+    Args:
+        threshold: Minimum cosine similarity to reuse an answer.
+        capacity: Reviews kept; the least recently used one is replaced.
+        vectorizer: Text -> unit vector, ``HashedVectorizer()`` by default.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        capacity: int = 2048,
+        vectorizer: Optional[HashedVectorizer] = None,
+    ):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.vectorizer = vectorizer or HashedVectorizer()
+        self._index = None
+        self._lock = Lock()
+        self.lookups = self.hits = 0
+        self.seconds_saved = 0.0
+        # best score of recent lookups (None: nothing cached yet), for tuning
+        self._scores: deque = deque(maxlen=10_000)
+
+    @property
+    def index(self) -> SimilarityIndex:
+        # allocated on first use, so importing the workflow stays cheap
+        if self._index is None:
+            self._index = SimilarityIndex(self.vectorizer.dim, self.capacity)
+        return self._index
+
+    def lookup(self, review: str) -> Optional[CachedReply]:
+        """The cached answer for the closest review above ``threshold``, if any."""
+        vector = self.vectorizer(review)
+        with self._lock:
+            score, slot = self.index.nearest(vector)
+            self.lookups += 1
+            self._scores.append(score if slot is not None else None)
+            if slot is None or score < self.threshold:
+                return None
+            entry = self.index.payloads[slot]
+            self.index.touch(slot)
+            self.hits += 1
+            self.seconds_saved += entry.seconds
+        return entry._replace(score=score)
+
+    def store(self, review: str, diagnosis: dict, reply: str, seconds: float) -> None:
+        """Remember an answer; ``seconds`` is the model time it cost."""
+        vector = self.vectorizer(review)
+        with self._lock:
+            self.index.add(vector, CachedReply(review, diagnosis, reply, seconds))
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and model time saved so far, plus the hit rate per threshold."""
+        with self._lock:
+            scores = [s for s in self._scores if s is not None]
+            recent = len(self._scores)
+            stats = {
+                "threshold": self.threshold,
+                "entries": len(self._index) if self._index is not None else 0,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": (
+                    round(self.hits / self.lookups, 3) if self.lookups else None
+                ),
+                "seconds_saved": round(self.seconds_saved, 3),
+            }
+        # what the last lookups would have hit with another threshold
+        stats["hit_rate_at"] = {
+            t: round(sum(s >= t for s in scores) / recent, 3) if recent else None
+            for t in TUNING_THRESHOLDS
+        }
+        return stats
+
+    def report(self) -> None:
+        """Print ``stats()``."""
+        s = self.stats()
+        rate = "-" if s["hit_rate"] is None else f"{s['hit_rate']:.1%}"
+        print(
+            f"reply cache: {s['hits']}/{s['lookups']} hits ({rate}) at threshold "
+            f"{s['threshold']}, {s['seconds_saved']:.1f}s of model time saved, "
+            f"{s['entries']} entries"
+        )
+        if s["lookups"]:
+            print(
+                "hit rate by threshold: "
+                + ", ".join(f"{t}: {r:.0%}" for t, r in s["hit_rate_at"].items())
+            )
@@ -0,0 +1,11 @@
+"""Put the root scripts and the chatbot modules on sys.path, the way
+``python <script>`` / ``streamlit run chatbot/<module>`` would."""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for path in (os.path.join(ROOT, "chatbot"), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
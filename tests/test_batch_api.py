@@ -0,0 +1,144 @@
+import json
+import threading
+
+import pytest
+
+import batch_api
+
+ESSAY = "A short essay on the age of AI. " * 20
+
+
+class FlakyBatchServer(batch_api.StubBatchServer):
+    """Fails the first ``failed_batches`` batches whole, and errors every
+    request whose essay contains ``bad_word``."""
+
+    failed_batches = 0
+    bad_word = None
+
+    def _complete(self, batch_id):
+        if self.failed_batches:
+            self.failed_batches -= 1
+            with self.lock:
+                self.batches[batch_id]["status"] = "failed"
+            return
+        super()._complete(batch_id)
+        if self.bad_word is None:
+            return
+        with self.lock:
+            batch = self.batches[batch_id]
+            requests = {
+                r["custom_id"]: r
+                for r in map(
+                    json.loads, self.files[batch["input_file_id"]].splitlines()
+                )
+            }
+            lines = self.files[batch["output_file_id"]].decode().splitlines()
+            output = []
+            for line in map(json.loads, lines):
+                if self.bad_word in json.dumps(requests[line["custom_id"]]["body"]):
+                    line["response"] = None
+                    line["error"] = {"code": "server_error", "message": "boom"}
+                output.append(json.dumps(line) + "\n")
+            self.files[batch["output_file_id"]] = "".join(output).encode()
+
+
+@pytest.fixture
+def server():
+    server = FlakyBatchServer(("127.0.0.1", 0), delay=0.05)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    return batch_api.BatchClient(
+        base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="test"
+    )
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "batch.db")
+
+
+def items(db):
+    return {
+        item_id: (status, result, error)
+        for item_id, status, result, error in batch_api.connect(db).execute(
+            "SELECT id, status, result, error FROM items ORDER BY id"
+        )
+    }
+
+
+def batches(db):
+    return [
+        status
+        for (status,) in batch_api.connect(db).execute(
+            "SELECT status FROM batches ORDER BY submitted_at"
+        )
+    ]
+
+
+def test_submit_poll_and_resume_every_item(server, client, db):
+    batch_api.submit(
+        batch_api.connect(db), "upsc", [{"essay": ESSAY} for _ in range(3)]
+    )
+
+    batch_api.run(db, poll=0.01, client=client)
+
+    assert len(items(db)) == 3
+    for status, result, _ in items(db).values():
+        assert status == "done"
+        assert json.loads(result)["avg_score"] == 7
+    # one batch per graph step (the evaluators, then the summary) for all items
+    assert batches(db) == ["applied", "applied"]
+    assert len(server.batches) == 2
+
+
+def test_failed_batch_is_resubmitted_and_request_errors_fail_their_item(
+    server, client, db
+):
+    server.failed_batches = 1
+    server.bad_word = "unlucky"
+    good, bad = batch_api.submit(
+        batch_api.connect(db),
+        "upsc",
+        [{"essay": ESSAY}, {"essay": ESSAY + " unlucky"}],
+    )
+
+    batch_api.run(db, poll=0.01, client=client)
+
+    assert batches(db) == ["failed", "applied", "applied"]
+    status = items(db)
+    assert status[good][0] == "done"
+    assert status[bad][0] == "failed"
+    assert "boom" in status[bad][2]
+
+
+def test_restarted_run_polls_the_batch_in_flight(server, client, db):
+    batch_api.submit(batch_api.connect(db), "upsc", [{"essay": ESSAY}])
+
+    class Crash(Exception):
+        pass
+
+    class CrashingClient:
+        # the process dies while waiting on the first batch
+        def create(self, requests):
+            return client.create(requests)
+
+        def status(self, batch_id):
+            raise Crash
+
+    with pytest.raises(Crash):
+        batch_api.run(db, poll=0.01, client=CrashingClient())
+    assert batches(db) == ["submitted"]
+
+    batch_api.run(db, poll=0.01, client=client)
+
+    [(status, result, _)] = items(db).values()
+    assert status == "done"
+    # the first round's batch was picked up again, not submitted twice
+    assert batches(db) == ["applied", "applied"]
+    assert len(server.batches) == 2
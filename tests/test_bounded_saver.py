@@ -0,0 +1,75 @@
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, START, END, add_messages
+
+from bounded_saver import BoundedInMemorySaver
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def bot(state: State):
+    return {"messages": [AIMessage("x" * 500)]}
+
+
+def chat(saver, threads=3, turns=5):
+    graph = StateGraph(State)
+    graph.add_node("bot", bot)
+    graph.add_edge(START, "bot")
+    graph.add_edge("bot", END)
+    app = graph.compile(checkpointer=saver)
+    for turn in range(turns):
+        for thread in range(threads):
+            app.invoke(
+                {"messages": [HumanMessage("q" * 300)]},
+                {"configurable": {"thread_id": f"t{thread}"}},
+            )
+
+
+def held_bytes(saver):
+    held = {}
+    for thread_id, namespaces in saver.storage.items():
+        held[thread_id] = sum(
+            len(checkpoint[1]) + len(metadata[1])
+            for checkpoints in namespaces.values()
+            for checkpoint, metadata, _ in checkpoints.values()
+        )
+    for key, blob in saver.blobs.items():
+        held[key[0]] += len(blob[1])
+    for key, writes in saver.writes.items():
+        held[key[0]] += sum(len(write[2][1]) for write in writes.values())
+    return held
+
+
+def test_resident_bytes_match_what_is_held():
+    saver = BoundedInMemorySaver(max_bytes=10**9)
+    chat(saver)
+
+    tuple_ = saver.get_tuple({"configurable": {"thread_id": "t0"}})
+    # putting the same checkpoint again must not count it twice
+    saver.put(
+        {**tuple_.parent_config},
+        tuple_.checkpoint,
+        tuple_.metadata,
+        {},
+    )
+
+    assert saver.resident_bytes() == held_bytes(saver)
+
+
+def test_list_all_threads_across_spills(tmp_path):
+    saver = BoundedInMemorySaver(max_bytes=20_000, spill_dir=str(tmp_path))
+    chat(saver)
+    assert saver.spilled_threads()
+
+    listed = list(saver.list(None))
+
+    assert {t.config["configurable"]["thread_id"] for t in listed} == {
+        "t0",
+        "t1",
+        "t2",
+    }
+    assert len(listed) == 3 * 5 * 3
+    assert len(list(saver.list(None, limit=7))) == 7
@@ -0,0 +1,100 @@
+import json
+import sqlite3
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import StateGraph, START, END, add_messages
+
+import bulk
+from compact_serde import CompactSerializer
+from forks import ForkableSqliteSaver
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def bot(state: State):
+    return {"messages": [AIMessage(f"reply {len(state['messages'])}")]}
+
+
+class CountingSerializer(CompactSerializer):
+    def __init__(self):
+        super().__init__()
+        self.decoded = 0
+
+    def loads_typed(self, data):
+        self.decoded += 1
+        return super().loads_typed(data)
+
+
+def make_db(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    saver = ForkableSqliteSaver(conn, serde=CompactSerializer())
+    graph = StateGraph(State)
+    graph.add_node("bot", bot)
+    graph.add_edge(START, "bot")
+    graph.add_edge("bot", END)
+    app = graph.compile(checkpointer=saver)
+
+    def say(thread_id, text):
+        app.invoke(
+            {"messages": [HumanMessage(text)]},
+            {"configurable": {"thread_id": thread_id}},
+        )
+
+    for turn in range(3):
+        say("parent", f"question {turn}")
+    fork_point = list(saver.list({"configurable": {"thread_id": "parent"}}))[2]
+    fork_id = saver.fork("parent", fork_point.config["configurable"]["checkpoint_id"])
+    say(fork_id, "edited question")
+    conn.close()
+    return fork_id
+
+
+def export(path, tmp_path, **kwargs):
+    out = tmp_path / "out.jsonl"
+    bulk.export(path, str(out), message_timestamps=True, **kwargs)
+    return {
+        record["thread_id"]: record
+        for record in map(json.loads, out.read_text().splitlines())
+    }
+
+
+def test_fork_inherits_the_parents_message_timestamps(tmp_path):
+    path = str(tmp_path / "chat.db")
+    fork_id = make_db(path)
+
+    records = export(path, tmp_path)
+
+    parent = {m["id"]: m["timestamp"] for m in records["parent"]["messages"]}
+    fork = records[fork_id]["messages"]
+    assert len(fork) == 6  # 2 turns inherited + the edited question and reply
+    assert all(m["timestamp"] for m in fork)
+    assert [m["timestamp"] for m in fork[:4]] == [parent[m["id"]] for m in fork[:4]]
+    assert fork[4]["timestamp"] > fork[3]["timestamp"]
+
+
+def test_timestamps_read_only_the_latest_checkpoints(tmp_path):
+    path = str(tmp_path / "chat.db")
+    make_db(path)
+    serde = CountingSerializer()
+
+    for _ in bulk.iter_conversations(path, message_timestamps=True, serde=serde):
+        pass
+
+    # the latest checkpoint of each thread, plus the fork point for the fork
+    assert serde.decoded == 3
+
+
+def test_unindexed_timestamps_fall_back_to_the_history(tmp_path):
+    path = str(tmp_path / "chat.db")
+    fork_id = make_db(path)
+    indexed = export(path, tmp_path)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE message_fts_indexed SET first_seen = NULL")
+
+    walked = export(path, tmp_path)
+
+    assert walked == indexed
+    assert all(m["timestamp"] for m in walked[fork_id]["messages"])
@@ -0,0 +1,138 @@
+import json
+import socket
+import threading
+import time
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+
+import backend_db
+import model_registry
+
+
+class StalledModel(BaseChatModel):
+    """Streams one token, then hangs like a provider that stopped sending."""
+
+    release: threading.Event
+
+    @property
+    def _llm_type(self):
+        return "stalled"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in ("Hel", "lo"):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+            self.release.wait()
+
+
+@pytest.fixture
+def chatbot(monkeypatch):
+    graph = StateGraph(backend_db.ChatState)
+    graph.add_node("chat_node", backend_db.chat_node)
+    graph.add_edge(START, "chat_node")
+    graph.add_edge("chat_node", END)
+    app = graph.compile(checkpointer=InMemorySaver())
+    monkeypatch.setattr(backend_db, "get_chatbot", lambda: app)
+    return app
+
+
+def stop_after_first_token(thread_id):
+    cancel_event = threading.Event()
+    stream = backend_db.stream_cancellable("hi", thread_id, cancel_event)
+    chunk, _ = next(stream)
+    assert chunk.content == "Hel"
+    start = time.perf_counter()
+    stream.close()
+    return time.perf_counter() - start
+
+
+def test_stop_does_not_wait_for_a_stalled_stream(chatbot, monkeypatch):
+    model = StalledModel(release=threading.Event())
+    monkeypatch.setattr(backend_db, "get_chat_model", lambda **kwargs: model)
+    try:
+        elapsed = stop_after_first_token("stalled")
+    finally:
+        model.release.set()
+
+    assert elapsed < 1.0
+    reply = chatbot.get_state({"configurable": {"thread_id": "stalled"}}).values[
+        "messages"
+    ][-1]
+    assert reply.content == "Hel"
+    assert reply.response_metadata["finish_reason"] == "cancelled"
+
+
+def stalled_sse_server():
+    """One-shot OpenAI-compatible endpoint: sends a token, then goes silent."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    closed = threading.Event()
+    chunk = {
+        "id": "c1",
+        "object": "chat.completion.chunk",
+        "created": 1,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": "Hel"}}],
+    }
+
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                request += conn.recv(65536)
+            head, _, body = request.partition(b"\r\n\r\n")
+            length = int(
+                next(
+                    line.split(b":")[1]
+                    for line in head.split(b"\r\n")
+                    if line.lower().startswith(b"content-length")
+                )
+            )
+            while len(body) < length:
+                body += conn.recv(65536)
+            event = f"data: {json.dumps(chunk)}\n\n".encode()
+            conn.sendall(
+                b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+                b"transfer-encoding: chunked\r\n\r\n"
+                + f"{len(event):x}\r\n".encode()
+                + event
+                + b"\r\n"
+            )
+            # stall until the client hangs up
+            while conn.recv(65536):
+                pass
+            closed.set()
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/v1", closed
+
+
+def test_stop_cuts_off_the_provider_connection(chatbot, monkeypatch):
+    url, closed = stalled_sse_server()
+    get_chat_model = model_registry.get_chat_model
+    monkeypatch.setattr(
+        backend_db,
+        "get_chat_model",
+        lambda **kwargs: get_chat_model(
+            "gpt-4o-mini", base_url=url, api_key="test", max_retries=0, **kwargs
+        ),
+    )
+
+    elapsed = stop_after_first_token("http")
+
+    assert elapsed < 1.0
+    # the socket was shut down, not left for the 60 s read timeout
+    assert closed.wait(2.0)
@@ -0,0 +1,93 @@
+import threading
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import StateGraph, START, END, add_messages
+
+from bounded_saver import BoundedInMemorySaver
+from checkpoint_daemon import CheckpointDaemon, DaemonCheckpointSaver, sqlite_stores
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def bot(state: State):
+    return {"messages": [AIMessage("reply")]}
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def daemon(request, tmp_path):
+    if request.param == "sqlite":
+        store, reader = sqlite_stores(str(tmp_path / "chat.db"))
+    else:
+        store, reader = BoundedInMemorySaver(max_bytes=10**9), None
+    daemon = CheckpointDaemon(store, reader=reader)
+    server = daemon.server(str(tmp_path / "daemon.sock"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    daemon.socket_path = server.server_address
+    yield daemon
+    server.shutdown()
+    server.server_close()
+
+
+def chat(saver, threads=10, turns=3):
+    graph = StateGraph(State)
+    graph.add_node("bot", bot)
+    graph.add_edge(START, "bot")
+    graph.add_edge("bot", END)
+    app = graph.compile(checkpointer=saver)
+    for turn in range(turns):
+        for thread in range(threads):
+            app.invoke(
+                {"messages": [HumanMessage(f"question {turn}")]},
+                {"configurable": {"thread_id": f"t{thread}"}},
+            )
+
+
+def ids(tuples):
+    return [
+        (
+            t.config["configurable"]["thread_id"],
+            t.config["configurable"]["checkpoint_id"],
+        )
+        for t in tuples
+    ]
+
+
+def test_list_all_threads_matches_the_store(daemon):
+    # pages smaller than a thread's history, so they cut across threads
+    client = DaemonCheckpointSaver(daemon.socket_path, page_size=7)
+    chat(client)
+
+    listed = ids(client.list(None))
+
+    assert listed == ids(daemon.store.list(None))
+    assert len(listed) == len(set(listed)) == 10 * 3 * 3
+    assert ids(client.list(None, limit=20)) == listed[:20]
+
+
+def test_stopping_early_closes_the_cursor(daemon):
+    client = DaemonCheckpointSaver(daemon.socket_path, page_size=2)
+    chat(client, threads=2, turns=2)
+
+    items = client.list(None)
+    next(items)
+    items.close()
+
+    assert not daemon._cursors
+
+
+def test_reads_do_not_see_an_uncommitted_batch(daemon):
+    if not hasattr(daemon.store, "group"):
+        pytest.skip("the memory store has no transactions")
+    client = DaemonCheckpointSaver(daemon.socket_path)
+    config = {"configurable": {"thread_id": "pending", "checkpoint_ns": ""}}
+
+    with daemon.store.group():
+        daemon.store.put(config, empty_checkpoint(), {"step": -1}, {})
+        assert client.get_tuple(config) is None
+
+    assert client.get_tuple(config) is not None
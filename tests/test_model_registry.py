@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import model_registry
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_both_import_paths_are_one_module():
+    from chatbot import model_registry as packaged
+
+    assert packaged is model_registry
+    assert packaged.get_chat_model("gpt-4o-mini", api_key="test") is (
+        model_registry.get_chat_model("gpt-4o-mini", api_key="test")
+    )
+
+
+def test_async_client_survives_a_new_event_loop(url):
+    _, client = model_registry.http_clients()
+
+    async def get():
+        return (await client.get(url)).text
+
+    # a Streamlit / tornado rerun: same shared client, fresh loop, while the
+    # first loop's keep-alive connection is still pooled
+    assert asyncio.run(get()) == "ok"
+    assert asyncio.run(get()) == "ok"
@@ -0,0 +1,101 @@
+import importlib
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage
+
+persistence = importlib.import_module("10_persistence")
+
+
+class FlakyModel:
+    """Fake chat model; the first explanation call raises like an outage."""
+
+    def __init__(self, fail_explanation: bool = True):
+        self.fail_explanation = fail_explanation
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if prompt.startswith("write an explanation") and self.fail_explanation:
+            self.fail_explanation = False
+            raise ConnectionError("provider down")
+        return AIMessage(f"reply {len(self.prompts)}")
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FlakyModel()
+    monkeypatch.setattr(persistence, "get_chat_model", lambda: model)
+    return model
+
+
+def thread():
+    return {"configurable": {"thread_id": str(uuid.uuid4())}}
+
+
+def joke_calls(model):
+    return sum(prompt.startswith("generate a joke") for prompt in model.prompts)
+
+
+def test_resume_after_a_failed_node_skips_finished_ones(model):
+    workflow = persistence.get_workflow()
+    config = thread()
+
+    with pytest.raises(ConnectionError):
+        workflow.invoke({"topic": "pizza"}, config)
+    assert workflow.get_state(config).next == ("generate_explanation",)
+
+    final_state = persistence.resume(workflow, config)
+
+    assert final_state == {
+        "topic": "pizza",
+        "joke": "reply 1",
+        "explanation": "reply 3",
+    }
+    assert joke_calls(model) == 1
+
+
+def test_resume_from_a_chosen_checkpoint(model):
+    workflow = persistence.get_workflow()
+    config = thread()
+    with pytest.raises(ConnectionError):
+        workflow.invoke({"topic": "pasta"}, config)
+    after_joke = next(
+        snapshot
+        for snapshot in persistence.iter_state_history(workflow, config)
+        if "joke" in snapshot["values"]
+    )
+
+    final_state = persistence.resume(workflow, config, after_joke["checkpoint_id"])
+
+    assert final_state["joke"] == "reply 1"
+    assert final_state["explanation"] == "reply 3"
+    assert joke_calls(model) == 1
+
+
+def test_history_pages_and_projection(model):
+    model.fail_explanation = False
+    workflow = persistence.get_workflow()
+    config = thread()
+    for topic in ("pizza", "pasta", "tea"):
+        workflow.invoke({"topic": topic}, config)
+
+    full = [
+        {
+            "checkpoint_id": s.config["configurable"]["checkpoint_id"],
+            "joke": s.values.get("joke"),
+        }
+        for s in workflow.get_state_history(config)
+    ]
+    projected = list(
+        persistence.iter_state_history(workflow, config, page_size=2, channels=["joke"])
+    )
+
+    assert [
+        {"checkpoint_id": s["checkpoint_id"], "joke": s["values"].get("joke")}
+        for s in projected
+    ] == full
+    assert all(set(s["values"]) <= {"joke"} for s in projected)
+    assert list(persistence.iter_state_history(workflow, config, page_size=3)) == (
+        list(persistence.iter_state_history(workflow, config, page_size=50))
+    )
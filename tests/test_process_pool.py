@@ -0,0 +1,66 @@
+import importlib
+import os
+from typing import TypedDict
+
+import pytest
+from langgraph.graph import StateGraph, START, END
+
+from process_pool import get_pool, process_node, shutdown_pool
+
+batsman = importlib.import_module("4_batsman_workflow")
+
+
+class State(TypedDict, total=False):
+    user: str
+    pid: int
+
+
+def whoami(state: State, config):
+    return {"user": config["configurable"]["user"], "pid": os.getpid()}
+
+
+def streams(state: State, writer):
+    return {}
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    shutdown_pool()
+    yield
+    shutdown_pool()
+
+
+def test_node_taking_config_runs_in_a_worker():
+    graph = StateGraph(State)
+    graph.add_node("whoami", process_node(whoami))
+    graph.add_edge(START, "whoami")
+    graph.add_edge("whoami", END)
+
+    result = graph.compile().invoke({}, {"configurable": {"user": "rohit"}})
+
+    assert result["user"] == "rohit"
+    assert result["pid"] != os.getpid()
+
+
+def test_rejects_nodes_needing_in_process_objects():
+    with pytest.raises(TypeError, match="writer"):
+        process_node(streams)
+
+
+def test_get_pool_rejects_a_conflicting_size():
+    pool = get_pool(2)
+    assert get_pool() is pool
+    assert get_pool(2) is pool
+    with pytest.raises(ValueError):
+        get_pool(3)
+
+
+def test_batsman_projection_runs_in_the_pool():
+    state = {"runs": 100, "balls": 50, "fours": 6, "sixes": 4, "remaining_balls": 30}
+
+    result = batsman.get_workflow().invoke(state)
+
+    projection = result["projection"]
+    assert projection == batsman.project_innings(state)["projection"]
+    assert 100 <= projection["p10"] <= projection["p50"] <= projection["p90"]
+    assert result["sr"] == 200.0
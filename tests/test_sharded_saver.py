@@ -0,0 +1,59 @@
+from typing import Annotated, TypedDict
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage
+from langgraph.graph import StateGraph, START, END, add_messages
+
+from compact_serde import CompactSerializer
+from sharded_saver import ShardedSqliteSaver, shard_index
+
+SHARDS = 2
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def bot(state: State):
+    return {"messages": [AIMessage(f"about {state['messages'][-1].content}")]}
+
+
+@pytest.fixture
+def app(tmp_path):
+    saver = ShardedSqliteSaver.from_path(
+        str(tmp_path / "chat.db"), SHARDS, serde=CompactSerializer()
+    )
+    graph = StateGraph(State)
+    graph.add_node("bot", bot)
+    graph.add_edge(START, "bot")
+    graph.add_edge("bot", END)
+    return graph.compile(checkpointer=saver)
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def fork_elsewhere(saver, parent):
+    # a fork id that hashes to another shard than its parent
+    fork_id = next(
+        f"fork-{i}"
+        for i in range(100)
+        if shard_index(f"fork-{i}", SHARDS) != shard_index(parent, SHARDS)
+    )
+    return saver.fork(parent, new_thread_id=fork_id)
+
+
+def test_fork_on_another_shard_does_not_duplicate_search_hits(app):
+    saver = app.checkpointer
+    app.invoke({"messages": [HumanMessage("tell me about giraffes")]}, config("p"))
+    fork_id = fork_elsewhere(saver, "p")
+
+    # dropping the first inherited message makes the fork store a full
+    # checkpoint, the inherited reply included
+    first = app.get_state(config(fork_id)).values["messages"][0]
+    app.update_state(config(fork_id), {"messages": [RemoveMessage(id=first.id)]})
+    app.invoke({"messages": [HumanMessage("and penguins")]}, config(fork_id))
+
+    assert [hit["thread_id"] for hit in saver.search("giraffes")] == ["p"]
+    assert [hit["thread_id"] for hit in saver.search("penguins")] == [fork_id]